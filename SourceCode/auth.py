@@ -0,0 +1,218 @@
+"""
+Băm / xác thực mật khẩu bằng PBKDF2-SHA256, thread pool xác thực có giới hạn và phiên đăng nhập.
+
+Định dạng hash: "pbkdf2_sha256$<số vòng lặp>$<salt hex>$<hash hex>". Hash SHA-256 cũ
+(64 ký tự hex, không salt) vẫn đăng nhập được và được băm lại bằng PBKDF2 ngay lần
+đăng nhập đúng tiếp theo.
+"""
+import hashlib
+import hmac
+import os
+import secrets
+import string
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+SCHEME = "pbkdf2_sha256"
+# Hệ số công việc (số vòng lặp PBKDF2); hash có ít vòng hơn sẽ được băm lại khi đăng nhập
+PBKDF2_ITERATIONS = int(os.environ.get("PHONEBOOK_PBKDF2_ITERATIONS", 600000))
+SALT_BYTES = 16
+AUTH_WORKERS = 2          # Số luồng tính hash song song
+AUTH_MAX_PENDING = 32     # Số yêu cầu xác thực tối đa đang chờ + đang chạy
+AUTH_QUEUE_WAIT = 5.0     # Thời gian tối đa (giây) chờ chỗ trong hàng đợi trước khi báo bận
+SESSION_TTL = 15 * 60     # Thời gian sống của phiên đăng nhập (giây)
+
+
+class AuthBusyError(Exception):
+    """Hàng đợi xác thực đã đầy (backpressure), cần thử lại sau."""
+
+# ==========================================
+# 1. HASH MẬT KHẨU
+# ==========================================
+def hash_password(password, iterations=None, salt=None):
+    """
+    Băm mật khẩu bằng PBKDF2-SHA256 với salt ngẫu nhiên.
+
+    Args:
+        password (str): Mật khẩu gốc.
+        iterations (int, optional): Số vòng lặp, mặc định PBKDF2_ITERATIONS.
+        salt (bytes, optional): Salt, mặc định sinh ngẫu nhiên.
+
+    Returns:
+        str: Chuỗi hash dạng "pbkdf2_sha256$<vòng>$<salt>$<hash>".
+    """
+    iterations = iterations or PBKDF2_ITERATIONS
+    salt = salt or secrets.token_bytes(SALT_BYTES)
+    digest = hashlib.pbkdf2_hmac("sha256", password.encode(), salt, iterations)
+    return f"{SCHEME}${iterations}${salt.hex()}${digest.hex()}"
+
+
+def is_legacy_hash(value):
+    """Hash SHA-256 kiểu cũ: 64 ký tự hex."""
+    return len(value) == 64 and all(ch in string.hexdigits for ch in value)
+
+
+def is_password_hash(value):
+    """Chuỗi đã là hash (PBKDF2 hoặc SHA-256 cũ) chứ không phải mật khẩu gốc."""
+    return value.startswith(SCHEME + "$") or is_legacy_hash(value)
+
+
+def verify_password(password, stored):
+    """
+    Kiểm tra mật khẩu với hash đã lưu (so sánh thời gian hằng).
+
+    Returns:
+        tuple[bool, bool]: (khớp, cần băm lại) — cần băm lại khi hash là SHA-256 cũ
+            hoặc có ít vòng lặp hơn PBKDF2_ITERATIONS hiện tại.
+    """
+    if is_legacy_hash(stored):
+        ok = hmac.compare_digest(hashlib.sha256(password.encode()).hexdigest(), stored)
+        return ok, ok
+    try:
+        scheme, iterations, salt, digest = stored.split("$")
+        iterations, salt = int(iterations), bytes.fromhex(salt)
+    except ValueError:
+        return False, False
+    if scheme != SCHEME: return False, False
+    computed = hashlib.pbkdf2_hmac("sha256", password.encode(), salt, iterations).hex()
+    ok = hmac.compare_digest(computed, digest)
+    return ok, ok and iterations < PBKDF2_ITERATIONS
+
+# ==========================================
+# 2. PHIÊN ĐĂNG NHẬP
+# ==========================================
+class SessionStore:
+    """
+    Token phiên ngắn hạn: sau khi đăng nhập đúng, các lần gọi tiếp theo chỉ cần
+    trình token (tra dict O(1)) thay vì tính lại hash mật khẩu.
+    """
+    def __init__(self, ttl=SESSION_TTL):
+        self.ttl = ttl
+        self.sessions = {}  # Dict[str, (tài khoản, thời điểm hết hạn theo time.monotonic)]
+        self.lock = threading.Lock()
+
+    def issue(self, account):
+        """Tạo token mới cho tài khoản."""
+        token = secrets.token_urlsafe(32)
+        with self.lock:
+            self.sessions[token] = (account, time.monotonic() + self.ttl)
+        return token
+
+    def validate(self, token):
+        """Trả về tài khoản của token còn hạn, None nếu token không hợp lệ hoặc đã hết hạn."""
+        with self.lock:
+            entry = self.sessions.get(token)
+            if entry is None: return None
+            account, expires = entry
+            if expires < time.monotonic():
+                del self.sessions[token]
+                return None
+            return account
+
+    def revoke(self, token):
+        """Hủy một token (đăng xuất)."""
+        with self.lock: self.sessions.pop(token, None)
+
+    def revoke_account(self, account):
+        """Hủy mọi token của một tài khoản (ví dụ khi tài khoản bị xóa)."""
+        with self.lock:
+            for token in [t for t, (acc, _) in self.sessions.items() if acc == account]:
+                del self.sessions[token]
+
+    def purge(self):
+        """Dọn các token đã hết hạn."""
+        now = time.monotonic()
+        with self.lock:
+            for token in [t for t, (_, exp) in self.sessions.items() if exp < now]:
+                del self.sessions[token]
+
+# ==========================================
+# 3. DỊCH VỤ XÁC THỰC (THREAD POOL)
+# ==========================================
+class AuthService:
+    """
+    Chạy việc tính hash mật khẩu trên một thread pool giới hạn, ngoài luồng gọi.
+
+    hashlib.pbkdf2_hmac nhả GIL khi tính nên các lần đăng nhập chạy song song được.
+    Số yêu cầu đang chờ + đang chạy bị giới hạn bởi max_pending: khi đầy, yêu cầu
+    mới chờ tối đa queue_wait giây rồi báo AuthBusyError thay vì xếp hàng vô hạn.
+    """
+    def __init__(self, workers=AUTH_WORKERS, max_pending=AUTH_MAX_PENDING,
+                 queue_wait=AUTH_QUEUE_WAIT, session_ttl=SESSION_TTL, on_upgrade=None):
+        """
+        Args:
+            workers (int): Số luồng tính hash.
+            max_pending (int): Số yêu cầu tối đa đang chờ + đang chạy.
+            queue_wait (float): Số giây chờ chỗ trống khi hàng đợi đầy.
+            session_ttl (float): Thời gian sống của token phiên (giây).
+            on_upgrade (callable, optional): on_upgrade(tài khoản) khi hash mật khẩu được băm lại.
+        """
+        self.pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="auth")
+        self.slots = threading.BoundedSemaphore(max_pending)
+        self.queue_wait = queue_wait
+        self.sessions = SessionStore(session_ttl)
+        self.on_upgrade = on_upgrade
+        self.dummy_hash = None  # Dùng khi không có tài khoản, để thời gian phản hồi như nhau
+
+    def submit(self, fn, *args):
+        """
+        Đưa một việc vào pool.
+
+        Returns:
+            Future: Kết quả của fn(*args).
+
+        Raises:
+            AuthBusyError: Hàng đợi vẫn đầy sau queue_wait giây.
+        """
+        if not self.slots.acquire(timeout=self.queue_wait):
+            raise AuthBusyError("Hệ thống đang bận xác thực, vui lòng thử lại.")
+        try:
+            future = self.pool.submit(fn, *args)
+        except BaseException:
+            self.slots.release()
+            raise
+        future.add_done_callback(lambda _: self.slots.release())
+        return future
+
+    def hash_password(self, password):
+        """Băm mật khẩu trên pool. Trả về Future[str]."""
+        return self.submit(hash_password, password)
+
+    def _login(self, account, password):
+        if account is None:
+            if self.dummy_hash is None: self.dummy_hash = hash_password(secrets.token_hex(8))
+            verify_password(password, self.dummy_hash)
+            return None
+        before = account.password
+        if not account.login(password): return None
+        if account.password != before and self.on_upgrade: self.on_upgrade(account)
+        return self.sessions.issue(account)
+
+    def login_async(self, account, password):
+        """
+        Xác thực trên pool.
+
+        Args:
+            account (Member | Admin | None): Tài khoản tìm theo username (None nếu không có).
+            password (str): Mật khẩu nhập vào.
+
+        Returns:
+            Future: Token phiên nếu đúng, None nếu sai.
+        """
+        return self.submit(self._login, account, password)
+
+    def login(self, account, password, timeout=None):
+        """Như login_async nhưng đợi kết quả. Trả về token hoặc None."""
+        return self.login_async(account, password).result(timeout)
+
+    def authenticate(self, token):
+        """Tài khoản của token phiên còn hạn (không tính hash), None nếu không hợp lệ."""
+        return self.sessions.validate(token)
+
+    def logout(self, token):
+        self.sessions.revoke(token)
+
+    def close(self):
+        """Đợi các yêu cầu đang chạy rồi dừng pool."""
+        self.pool.shutdown(wait=True)
@@ -0,0 +1,245 @@
+"""
+Đo hiệu năng các thao tác trên danh bạ lớn.
+
+Cách chạy:
+    python benchmark.py search --size 1000000
+    python benchmark.py snapshot --size 10000 100000 1000000
+    python benchmark.py cluster --size 100000
+"""
+import argparse
+import datetime
+import json
+import os
+import random
+import tempfile
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+from models import Member, Contact, Group, ContactGroupMembership
+from indexes import fold_text, edit_distance
+from data import DataManager, JsonBackend, BinaryBackend
+
+HO = ["Nguyễn", "Trần", "Lê", "Phạm", "Hoàng", "Huỳnh", "Phan", "Vũ", "Võ", "Đặng", "Bùi", "Đỗ"]
+DEM = ["Văn", "Thị", "Hữu", "Đức", "Minh", "Ngọc", "Thanh", "Quốc", "Gia", "Bảo"]
+TEN = ["An", "Bình", "Cường", "Dũng", "Hà", "Hải", "Hạnh", "Hoa", "Hùng", "Khánh", "Lan", "Linh",
+       "Long", "Mai", "Nam", "Nga", "Phúc", "Quân", "Sơn", "Tâm", "Thảo", "Trang", "Tuấn", "Vy"]
+
+
+def make_member(size, seed=42):
+    """Tạo một Member với `size` liên hệ ngẫu nhiên (không in ra màn hình)."""
+    rnd = random.Random(seed)
+    mem = Member(1, "bench", "bench", "bench@email.com")
+    mem.contacts = [Contact(i, f"{rnd.choice(HO)} {rnd.choice(DEM)} {rnd.choice(TEN)} {i}", f"09{rnd.randrange(10**8):08d}")
+                    for i in range(1, size + 1)]
+    mem.rebuild_indexes()
+    return mem
+
+
+def timeit(fn, repeat=5):
+    """Trả về thời gian chạy tốt nhất (giây) của fn sau `repeat` lần."""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def bench_search(size):
+    """So sánh tìm kiếm quét tuyến tính (trên khóa đã bỏ dấu sẵn) với chỉ mục trigram."""
+    t0 = time.perf_counter()
+    mem = make_member(size)
+    print(f"Tạo {size} liên hệ + chỉ mục: {time.perf_counter() - t0:.2f}s")
+    contacts = mem.contacts
+    for kw in ["Hùng 12", "hạnh 9999", "thị", "Trần Quốc Vy 5"]:
+        q = fold_text(kw.strip())
+        scan = timeit(lambda: [c for c in contacts if q in c.search_key])
+        idx = timeit(lambda: mem.search_contact_by_name(kw))
+        n = len(mem.search_contact_by_name(kw))
+        print(f"{kw!r:<20} {n:>8} kết quả | quét: {scan * 1000:9.2f} ms | "
+              f"trigram: {idx * 1000:9.2f} ms | x{scan / max(idx, 1e-9):.1f}")
+
+
+def bench_fuzzy(size):
+    """So sánh tìm gần đúng bằng BK-tree với tính Levenshtein cho mọi tên."""
+    mem = make_member(size)
+    t0 = time.perf_counter()
+    mem.build_fuzzy_index(background=False)
+    print(f"Dựng BK-tree cho {size} liên hệ: {time.perf_counter() - t0:.2f}s")
+    # Lấy tên có thật rồi gõ sai 1-2 ký tự
+    contacts = mem.contacts
+    names = [contacts[i].search_key for i in (size // 7, size // 3, size // 2)]
+    typos = [names[0][:3] + names[0][4:], names[1].replace("a", "e", 1), names[2][1:] + "x"]
+    for kw, k in zip(typos, (1, 1, 2)):
+        q = fold_text(kw)
+        brute = timeit(lambda: sorted((d, c.contact_id) for c in contacts
+                                      if (d := edit_distance(q, c.search_key)) <= k), repeat=1)
+        tree = timeit(lambda: mem.fuzzy_search_contacts(kw, k), repeat=3)
+        n = len(mem.fuzzy_search_contacts(kw, k, limit=size))
+        print(f"{kw!r:<26} k={k} {n:>5} kết quả | brute force: {brute * 1000:9.1f} ms | "
+              f"BK-tree: {tree * 1000:9.1f} ms | x{brute / max(tree, 1e-9):.1f}")
+
+
+class LegacyContact:
+    """Contact kiểu cũ (__dict__ + datetime + search_key) để so sánh bộ nhớ."""
+    def __init__(self, contact_id, name, phone, email="", address="", notes=""):
+        self.contact_id = contact_id
+        self.name = name
+        self.phone = phone
+        self.email = email
+        self.address = address
+        self.notes = notes
+        self.created_at = datetime.datetime.now()
+        self.last_viewed_at = None
+        self.search_key = fold_text(name)
+
+
+def bench_memory(size):
+    """Báo cáo số byte trên mỗi liên hệ: Contact kiểu cũ so với Contact hiện tại."""
+    rnd = random.Random(42)
+    rows = [(i, f"{rnd.choice(HO)} {rnd.choice(DEM)} {rnd.choice(TEN)} {i}",
+             f"09{rnd.randrange(10**8):08d}", f"user{i}@email.com", "Hà Nội", "Bạn bè")
+            for i in range(1, size + 1)]
+
+    def measure(build):
+        tracemalloc.start()
+        objs = build()
+        used = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        del objs
+        return used / size
+
+    # Chuỗi gốc (tên, sđt, email) đã tồn tại trong rows nên không bị tính: chỉ đo phần đối tượng
+    legacy = measure(lambda: [LegacyContact(*r) for r in rows])
+    legacy_viewed = measure(lambda: [setattr(c, "last_viewed_at", datetime.datetime.now()) or c
+                                     for c in (LegacyContact(*r) for r in rows)])
+    compact = measure(lambda: [Contact(*r) for r in rows])
+    compact_viewed = measure(lambda: [c.view() or c for c in (Contact(*r) for r in rows)])
+    print(f"{size} liên hệ (byte/liên hệ, không tính chuỗi dữ liệu gốc):")
+    print(f"  Contact cũ (__dict__, datetime)     : {legacy:7.0f} | đã xem: {legacy_viewed:7.0f}")
+    print(f"  Contact mới (__slots__, epoch)      : {compact:7.0f} | đã xem: {compact_viewed:7.0f}")
+
+    t0 = time.perf_counter()
+    tracemalloc.start()
+    mem = make_member(size)
+    used = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    print(f"  Member đầy đủ (liên hệ + chỉ mục)  : {used / size:7.0f} "
+          f"({time.perf_counter() - t0:.1f}s)")
+    del mem
+
+
+def bench_load(size):
+    """So sánh json.load cả file với đọc theo luồng: thời gian và bộ nhớ đỉnh."""
+    members = [make_member(size // 10, seed=i) for i in range(10)]
+    for i, mem in enumerate(members): mem.member_id, mem.username = 101 + i, f"bench{i}"
+    path = os.path.join(tempfile.mkdtemp(), "bench.json")
+    DataManager.write_snapshot(DataManager.build_snapshot([], members, [], 111), path)
+    del members
+    print(f"File {size} liên hệ: {os.path.getsize(path) / 2**20:.1f} MB")
+
+    def whole():
+        with open(path, "r", encoding="utf-8") as f:
+            return DataManager.from_snapshot(json.load(f))
+
+    for label, load in (("json.load", whole), ("stream", lambda: DataManager.stream_snapshot(path))):
+        tracemalloc.start()
+        t0 = time.perf_counter()
+        loaded = load()
+        elapsed = time.perf_counter() - t0
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        del loaded
+        print(f"  {label:<10}: {elapsed:6.2f}s | bộ nhớ đỉnh {peak / 2**20:8.1f} MB")
+    os.remove(path)
+
+
+def bench_snapshot(size):
+    """So sánh ghi/đọc snapshot JSON với snapshot nhị phân (kích thước file, thời gian)."""
+    members = []
+    for i in range(10):
+        mem = make_member(size // 10, seed=i)
+        mem.member_id, mem.username = 101 + i, f"bench{i}"
+        mem.groups = [Group(g, name) for g, name in enumerate(["Gia đình", "Bạn bè", "Công ty", "Lớp", "Khác"], 1)]
+        for c in mem.contacts:
+            c.email = f"user{c.contact_id}@{'gmail.com' if c.contact_id % 3 else 'email.com'}"
+            if c.contact_id % 4 == 0: c.view()
+        mem.memberships = [ContactGroupMembership(c.contact_id, 1 + c.contact_id % 5) for c in mem.contacts]
+        members.append(mem)
+    root = tempfile.mkdtemp()
+    print(f"{size} liên hệ, {size} liên kết nhóm:")
+    for label, backend in (("JSON", JsonBackend(os.path.join(root, "bench.json"))),
+                           ("binary", BinaryBackend(os.path.join(root, "bench.bin")))):
+        t0 = time.perf_counter()
+        backend.save([], members, [], 111)
+        saved = time.perf_counter() - t0
+        load = timeit(backend.load, repeat=1 if size >= 1000000 else 3)
+        print(f"  {label:<7}: {os.path.getsize(backend.path) / 2**20:8.1f} MB | ghi {saved:6.2f}s | "
+              f"đọc {load:6.2f}s")
+        os.remove(backend.path)
+
+
+def bench_cluster(size, members=8, clients=16, requests=400):
+    """
+    Thông lượng tìm gần đúng (nặng CPU) khi `clients` luồng cùng gửi yêu cầu tới `members`
+    member: một tiến trình nhiều luồng (bị GIL giới hạn) so với ShardRouter N tiến trình.
+    """
+    from cluster import ShardRouter
+    rnd = random.Random(42)
+    per_member = size // members
+    rows = [[(f"{rnd.choice(HO)} {rnd.choice(DEM)} {rnd.choice(TEN)} {i}", f"09{rnd.randrange(10**8):08d}",
+              "", "", "") for i in range(per_member)] for _ in range(members)]
+    queries = [(k % members, fold_text(rows[k % members][rnd.randrange(per_member)][0])[1:] + "x")
+               for k in range(requests)]
+    print(f"{members} member x {per_member} liên hệ, {clients} client, {requests} yêu cầu tìm gần đúng "
+          f"({os.cpu_count()} nhân CPU):")
+
+    def measure(search):
+        with ThreadPoolExecutor(clients) as pool:
+            t0 = time.perf_counter()
+            list(pool.map(lambda q: search(*q), queries))
+            return requests / (time.perf_counter() - t0)
+
+    local = []
+    for i, member_rows in enumerate(rows):
+        mem = Member(101 + i, f"bench{i}", "bench", "")
+        mem.contacts = [Contact(cid, *row[:2]) for cid, row in enumerate(member_rows, 1)]
+        mem.rebuild_indexes()
+        mem.build_fuzzy_index(background=False)  # Dựng BK-tree trước khi đo
+        local.append(mem)
+    base = measure(lambda i, kw: local[i].fuzzy_search_contacts(kw))
+    print(f"  1 tiến trình, {clients} luồng : {base:8.1f} yêu cầu/s")
+    del local
+
+    for shards in sorted({1, 2, os.cpu_count() or 1}):
+        root = tempfile.mkdtemp()
+        router = ShardRouter(shards, root)
+        try:
+            ids = []
+            for i, member_rows in enumerate(rows):
+                account = router.create_member(f"bench{i}", "bench")
+                router.add_contacts(account["member_id"], member_rows)
+                router.call(account["member_id"], "build_fuzzy_index", False)
+                ids.append(account["member_id"])
+            rate = measure(lambda i, kw: router.call(ids[i], "fuzzy_search_contacts", kw))
+            print(f"  {shards} shard (tiến trình)  : {rate:8.1f} yêu cầu/s | x{rate / base:.2f}")
+        finally:
+            router.close()
+
+
+BENCHES = {
+    "cluster": bench_cluster,
+    "snapshot": bench_snapshot,
+    "load": bench_load,
+    "memory": bench_memory,
+    "search": bench_search,
+    "fuzzy": bench_fuzzy,
+}
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="PhoneBook benchmarks")
+    parser.add_argument("bench", choices=sorted(BENCHES))
+    parser.add_argument("--size", type=int, nargs="+", default=[100000])
+    args = parser.parse_args()
+    for size in args.size:
+        BENCHES[args.bench](size)
@@ -0,0 +1,251 @@
+"""
+Định dạng snapshot nhị phân gọn để khởi động nhanh (chế độ lưu "binary").
+
+Cấu trúc file (mọi số nguyên là little-endian):
+    Header  : MAGIC (4 byte) | VERSION (uint16) | dự phòng (uint16) | độ dài payload (uint64) | CRC32 payload (uint32)
+    Payload : dãy bản ghi TAG (uint8) | độ dài nội dung (uint64) | nội dung
+
+Mọi chuỗi được lưu một lần trong bảng chuỗi (bản ghi STRINGS, luôn đứng đầu) và được
+tham chiếu bằng chỉ số, nên tên nhóm, địa chỉ, ghi chú hay tên miền email lặp lại chỉ
+tốn 4 byte mỗi lần. Email được tách thành phần trước "@" và phần "@tên miền". Thời gian
+lưu dạng epoch nguyên (giây), NO_TIME nghĩa là không có. Danh bạ của mỗi member được lưu
+theo cột (array) nên đọc/ghi bằng tobytes/frombytes, không cần phân tích văn bản.
+"""
+import datetime
+import itertools
+import struct
+import sys
+import zlib
+from array import array
+from models import Member, Admin, Contact, Group, ContactGroupMembership
+
+MAGIC = b"PBSN"
+VERSION = 1
+NO_TIME = -1
+
+HEADER = struct.Struct("<4sHHQI")
+RECORD = struct.Struct("<BQ")
+COUNT = struct.Struct("<I")
+META = struct.Struct("<q")
+# member_id, is_active, next_contact_id, next_group_id, username, password, email (2 phần),
+# số liên hệ, số nhóm, số liên kết
+MEMBER = struct.Struct("<qBqqIIIIIII")
+
+TAG_STRINGS, TAG_ADMINS, TAG_MEMBER, TAG_LOGS, TAG_META = 1, 2, 3, 4, 5
+
+
+class SnapshotError(ValueError):
+    """File snapshot nhị phân hỏng, sai checksum hoặc không đúng phiên bản."""
+
+
+# --- MẢNG SỐ <-> BYTES ---
+
+def _pack(typecode, values):
+    arr = array(typecode, values)
+    if sys.byteorder == "big": arr.byteswap()
+    return arr.tobytes()
+
+def _unpack(typecode, data, offset, count):
+    """Đọc `count` phần tử kiểu typecode từ data[offset:]. Trả về (array, offset mới)."""
+    arr = array(typecode)
+    end = offset + count * arr.itemsize
+    if end > len(data): raise SnapshotError("Bản ghi bị cắt cụt.")
+    arr.frombytes(data[offset:end])
+    if sys.byteorder == "big": arr.byteswap()
+    return arr, end
+
+def _ts(value):
+    return NO_TIME if value is None else int(value)
+
+
+class StringTable:
+    """Bảng chuỗi dùng khi ghi: mỗi chuỗi khác nhau được cấp một chỉ số (0 luôn là "")."""
+    def __init__(self):
+        self.index = {"": 0}
+        self.strings = [""]
+
+    def ref(self, text):
+        i = self.index.get(text)
+        if i is None:
+            i = self.index[text] = len(self.strings)
+            self.strings.append(text)
+        return i
+
+    def refs(self, texts):
+        return _pack("I", map(self.ref, texts))
+
+    def email_refs(self, emails):
+        """Hai cột chỉ số (phần trước "@", phần "@tên miền") của một dãy email."""
+        locals_, domains = [], []
+        for email in emails:
+            at = email.rfind("@")
+            if at < 0: at = len(email)
+            locals_.append(self.ref(email[:at]))
+            domains.append(self.ref(email[at:]))
+        return _pack("I", locals_) + _pack("I", domains)
+
+    def encode(self):
+        return (COUNT.pack(len(self.strings)) + _pack("I", map(len, self.strings))
+                + "".join(self.strings).encode("utf-8", "surrogatepass"))
+
+
+def _record(tag, payload):
+    return RECORD.pack(tag, len(payload)) + payload
+
+# ==========================================
+# GHI
+# ==========================================
+def _encode_member(mem, strings):
+    contacts, groups, links = mem.contacts, mem.groups, mem.memberships
+    at = mem.email.rfind("@")
+    if at < 0: at = len(mem.email)
+    parts = [
+        MEMBER.pack(mem.member_id, bool(mem.is_active), mem.contact_ids.next_id, mem.group_ids.next_id,
+                    strings.ref(mem.username), strings.ref(mem.password),
+                    strings.ref(mem.email[:at]), strings.ref(mem.email[at:]),
+                    len(contacts), len(groups), len(links)),
+        _pack("I", [c.contact_id for c in contacts]),
+        strings.refs(c.name for c in contacts),
+        strings.refs(c.search_key for c in contacts),
+        strings.refs(c.phone for c in contacts),
+        strings.email_refs(c.email for c in contacts),
+        strings.refs(c.address for c in contacts),
+        strings.refs(c.notes for c in contacts),
+        _pack("q", [_ts(c.created_ts) for c in contacts]),
+        _pack("q", [_ts(c.viewed_ts) for c in contacts]),
+        _pack("q", [_ts(c.updated_ts) for c in contacts]),
+        _pack("I", [g.group_id for g in groups]),
+        strings.refs(g.group_name for g in groups),
+        _pack("I", [l.contact_id for l in links]),
+        _pack("I", [l.group_id for l in links]),
+        _pack("q", [_ts(l.added_at.timestamp()) for l in links]),
+    ]
+    return b"".join(parts)
+
+
+def dump(f, admins, members, logs, next_member_id=None):
+    """
+    Ghi toàn bộ dữ liệu ra file nhị phân.
+
+    Args:
+        f (BinaryIO): File mở ở chế độ "wb".
+        admins, members, logs, next_member_id: Giống DataManager.save_data.
+    """
+    strings = StringTable()
+    body = [_record(TAG_ADMINS, COUNT.pack(len(admins))
+                    + _pack("I", [a.admin_id for a in admins])
+                    + strings.refs(a.username for a in admins)
+                    + strings.refs(a.password for a in admins))]
+    for mem in members:
+        # Chụp từng member khi giữ lock của nó (member lazy được nạp trước)
+        mem.ensure_loaded()
+        with mem.lock.read():
+            body.append(_record(TAG_MEMBER, _encode_member(mem, strings)))
+    body.append(_record(TAG_LOGS, COUNT.pack(len(logs)) + strings.refs(logs)))
+    if next_member_id is not None:
+        body.append(_record(TAG_META, META.pack(next_member_id)))
+
+    payload = _record(TAG_STRINGS, strings.encode()) + b"".join(body)
+    f.write(HEADER.pack(MAGIC, VERSION, 0, len(payload), zlib.crc32(payload)))
+    f.write(payload)
+
+# ==========================================
+# ĐỌC
+# ==========================================
+def _decode_strings(data):
+    (count,) = COUNT.unpack_from(data, 0)
+    lengths, offset = _unpack("I", data, COUNT.size, count)
+    text = bytes(data[offset:]).decode("utf-8", "surrogatepass")
+    ends = list(itertools.accumulate(lengths))
+    if (ends[-1] if ends else 0) != len(text): raise SnapshotError("Bảng chuỗi không khớp độ dài.")
+    return [text[a:b] for a, b in zip([0] + ends, ends)]
+
+
+def _decode_member(data, S):
+    (mid, active, next_cid, next_gid, user, password, e_local, e_domain,
+     n_contacts, n_groups, n_links) = MEMBER.unpack_from(data, 0)
+    mem = Member(mid, S[user], S[password], S[e_local] + S[e_domain])
+    mem.is_active = bool(active)
+    mem.contact_ids.next_id, mem.group_ids.next_id = next_cid, next_gid
+
+    offset = MEMBER.size
+    cols = []
+    for typecode in "IIIIIIIIqqq":   # id, tên, khóa tìm kiếm, sđt, email (2), địa chỉ, ghi chú, 3 mốc thời gian
+        col, offset = _unpack(typecode, data, offset, n_contacts)
+        cols.append(col)
+    ids, names, keys, phones, e_locals, e_domains, addresses, notes, created, viewed, updated = cols
+    restore = Contact.restore
+    mem.contacts = [
+        restore(cid, S[n], S[p], S[el] + S[ed], S[a], S[nt], S[k], ct,
+                None if vt == NO_TIME else vt, None if ut == NO_TIME else ut)
+        for cid, n, k, p, el, ed, a, nt, ct, vt, ut in zip(
+            ids, names, keys, phones, e_locals, e_domains, addresses, notes, created, viewed, updated)
+    ]
+
+    group_ids, offset = _unpack("I", data, offset, n_groups)
+    group_names, offset = _unpack("I", data, offset, n_groups)
+    mem.groups = [Group(gid, S[name]) for gid, name in zip(group_ids, group_names)]
+
+    link_cids, offset = _unpack("I", data, offset, n_links)
+    link_gids, offset = _unpack("I", data, offset, n_links)
+    added, offset = _unpack("q", data, offset, n_links)
+    links = []
+    for cid, gid, ts in zip(link_cids, link_gids, added):
+        ms = ContactGroupMembership(cid, gid)
+        if ts != NO_TIME: ms.added_at = datetime.datetime.fromtimestamp(ts)
+        links.append(ms)
+    mem.memberships = links
+    mem.rebuild_indexes()
+    return mem
+
+
+def load(f):
+    """
+    Đọc file nhị phân.
+
+    Args:
+        f (BinaryIO): File mở ở chế độ "rb".
+
+    Returns:
+        tuple: (admins, members, logs, meta) giống DataManager.load_data.
+
+    Raises:
+        SnapshotError: Sai MAGIC/phiên bản, file bị cắt cụt hoặc sai checksum.
+    """
+    header = f.read(HEADER.size)
+    if len(header) < HEADER.size: raise SnapshotError("File quá ngắn.")
+    magic, version, _, length, crc = HEADER.unpack(header)
+    if magic != MAGIC: raise SnapshotError("Không phải file snapshot PhoneBook.")
+    if version != VERSION: raise SnapshotError(f"Phiên bản snapshot {version} không được hỗ trợ.")
+    payload = f.read(length)
+    if len(payload) != length: raise SnapshotError("File bị cắt cụt.")
+    if zlib.crc32(payload) != crc: raise SnapshotError("Sai checksum, file bị hỏng.")
+
+    data = memoryview(payload)
+    S, admins, members, logs, meta = None, [], [], [], {}
+    offset = 0
+    while offset < length:
+        tag, size = RECORD.unpack_from(data, offset)
+        offset += RECORD.size
+        body = data[offset:offset + size]
+        offset += size
+        if tag == TAG_STRINGS:
+            S = _decode_strings(body)
+        elif S is None:
+            raise SnapshotError("Thiếu bảng chuỗi.")
+        elif tag == TAG_ADMINS:
+            (count,) = COUNT.unpack_from(body, 0)
+            ids, pos = _unpack("I", body, COUNT.size, count)
+            names, pos = _unpack("I", body, pos, count)
+            passwords, _ = _unpack("I", body, pos, count)
+            admins = [Admin(i, S[u], S[p]) for i, u, p in zip(ids, names, passwords)]
+        elif tag == TAG_MEMBER:
+            members.append(_decode_member(body, S))
+        elif tag == TAG_LOGS:
+            (count,) = COUNT.unpack_from(body, 0)
+            refs, _ = _unpack("I", body, COUNT.size, count)
+            logs = [S[i] for i in refs]
+        elif tag == TAG_META:
+            meta["next_member_id"] = META.unpack_from(body, 0)[0]
+        # Bản ghi có TAG chưa biết (phiên bản sau thêm vào) được bỏ qua
+    return admins, members, logs, meta
@@ -0,0 +1,652 @@
+"""
+Chia member theo member_id ra nhiều tiến trình (shard) để tận dụng nhiều nhân CPU.
+
+Shard i sở hữu các member có member_id % N == i: giữ các object Member của chúng, tự
+lưu dữ liệu của mình (DataManager với chế độ lưu tùy chọn, trong thư mục shard_<i>) và
+xử lý tuần tự các yêu cầu gửi tới. Việc nặng CPU theo từng member (tìm kiếm, tìm gần
+đúng, băm mật khẩu, thêm hàng loạt) vì thế chạy song song trên N tiến trình, không bị GIL giới hạn.
+
+ShardRouter đứng trước các shard: chuyển mỗi yêu cầu tới shard sở hữu member, gom kết
+quả từ mọi shard cho các truy vấn toàn hệ thống (danh sách user), giữ bảng username ->
+member_id và phiên đăng nhập. Mỗi shard có một hàng đợi yêu cầu riêng nên nhiều yêu cầu
+tới các shard khác nhau được xử lý cùng lúc.
+
+Lần chạy đầu, nếu thư mục cụm chưa có mà dữ liệu một tiến trình (DataManager hiện tại)
+đã tồn tại, dữ liệu đó được chia vào các shard theo member_id.
+
+ClusterSystem là PhoneBookSystem chạy trên ShardRouter, để menu (main.py) và server.py chạy ở chế độ
+nhiều tiến trình: đặt PHONEBOOK_SHARDS=N hoặc chạy với --shards N (xem main.open_system).
+"""
+import io
+import itertools
+import json
+import multiprocessing
+import os
+import secrets
+import sys
+import threading
+from concurrent.futures import Future
+from auth import SessionStore, hash_password, verify_password
+from data import DataManager, WriteBehindFlusher, FLUSH_BATCH_SIZE
+from models import Member, Admin, Contact, Group, ContactGroupMembership, MemberSnapshot
+from system_log import SystemLog, LOG_FILE
+from main import PhoneBookSystem
+
+CLUSTER_DIR = "phonebook_cluster"
+CLUSTER_FILE = "cluster.json"  # Ghi số shard, để không mở nhầm với số shard khác
+EXPORT_PAGE = 1000  # Số liên hệ mỗi lần lấy từ shard khi xuất danh bạ
+
+# Các hàm của Member được gọi qua router. Hàm ghi làm dữ liệu shard được lưu lại.
+READ_METHODS = {
+    "get_contact", "snapshot", "search_contact_by_name", "suggest_contacts", "fuzzy_search_contacts",
+    "find_contacts_by_phone", "find_contacts_by_phone_suffix", "get_recent_contacts",
+    "get_groups_of_contact", "get_contacts_in_group", "is_in_group", "build_fuzzy_index", "get_group",
+}
+WRITE_METHODS = {
+    "add_contact", "edit_contact_details", "delete_contact", "view_contact_detail",
+    "create_group", "remove_group", "rename_group", "add_contact_to_group", "remove_contact_from_group",
+}
+# Các thao tác của Shard mà router được gửi tới
+SHARD_OPS = {"accounts", "create_member", "delete_member", "login", "admin_login", "call", "add_contacts",
+             "export_open", "export_next", "export_close"}
+
+
+class ShardError(Exception):
+    """Yêu cầu tới shard không hợp lệ (member không tồn tại, hàm không được phép...) hoặc shard đã dừng."""
+
+
+def _plain(value):
+    """Chuyển kết quả (Contact, Group, ...) sang dict/list để gửi giữa các tiến trình."""
+    if isinstance(value, Contact): return DataManager.contact_to_dict(value)
+    if isinstance(value, Group): return DataManager.group_to_dict(value)
+    if isinstance(value, ContactGroupMembership): return DataManager.membership_to_dict(value)
+    if isinstance(value, MemberSnapshot):
+        return {"contacts": _plain(value.contacts), "groups": _plain(value.groups),
+                "memberships": _plain(value.memberships)}
+    if isinstance(value, (list, tuple)): return [_plain(v) for v in value]
+    return value
+
+def _restore(value):
+    """Ngược lại với _plain (phía router): dựng lại Contact/Group/liên kết/bản chụp từ dict."""
+    if isinstance(value, list): return [_restore(v) for v in value]
+    if not isinstance(value, dict): return value
+    if "contacts" in value and "memberships" in value:
+        return MemberSnapshot(None, tuple(_restore(value["contacts"])), tuple(_restore(value["groups"])),
+                              tuple(_restore(value["memberships"])))
+    if "group_name" in value: return Group(value["group_id"], value["group_name"])
+    if "name" in value: return DataManager.contact_from_dict(value)
+    if "added_at" in value: return DataManager.membership_from_dict(value)
+    return value
+
+def _account(mem):
+    return {"member_id": mem.member_id, "username": mem.username, "email": mem.email,
+            "is_active": mem.is_active, "contact_count": mem.contact_count}
+
+# ==========================================
+# 1. SHARD (chạy trong tiến trình con)
+# ==========================================
+class Shard:
+    """
+    Phần dữ liệu của một tiến trình shard: các member có member_id % count == index
+    (shard 0 giữ thêm các tài khoản admin).
+    """
+    def __init__(self, index, count, storage="json", flush_interval=0):
+        """
+        Args:
+            index (int): Số thứ tự shard.
+            count (int): Tổng số shard.
+            storage (str): Chế độ lưu của shard (khóa của data.BACKENDS), trong thư mục hiện tại.
+            flush_interval (float): > 0 để bật ghi trễ như PhoneBookSystem.
+        """
+        self.index, self.count = index, count
+        DataManager.configure(storage)
+        admins, members, _, meta = DataManager.load_data()
+        self.admins = admins
+        self.members = {m.member_id: m for m in members}
+        self.next_id = meta.get("next_member_id", 101)
+        self.flusher = WriteBehindFlusher(self.flush, flush_interval, FLUSH_BATCH_SIZE) if flush_interval > 0 else None
+        self.dummy_hash = None  # Dùng khi không có tài khoản admin, để thời gian phản hồi như nhau
+        self.exports = {}  # export_id -> Member.iter_export() đang xuất dở
+        self.export_ids = itertools.count()
+        if index == 0 and not self.admins:
+            self.admins.append(Admin(1, "admin", "123456"))
+            self.save()
+
+    def save(self):
+        if self.flusher: self.flusher.mark_dirty()
+        else: self.flush()
+
+    def flush(self):
+        return DataManager.save_data(self.admins, list(self.members.values()), [], self.next_id)
+
+    def close(self):
+        if self.flusher: self.flusher.close()
+        else: self.flush()
+        DataManager.close()
+
+    def member(self, member_id):
+        mem = self.members.get(member_id)
+        if mem is None: raise ShardError(f"Không tìm thấy member ID {member_id}.")
+        return mem
+
+    # --- CÁC YÊU CẦU (tên hàm = tên op gửi từ router) ---
+
+    def accounts(self):
+        return [_account(m) for m in self.members.values()]
+
+    def create_member(self, username, password, email):
+        """Tạo member với ID tiếp theo thuộc shard này (ID % count == index)."""
+        mid = self.next_id + (self.index - self.next_id) % self.count
+        self.next_id = mid + 1
+        mem = self.members[mid] = Member(mid, username, password, email)
+        DataManager.record("member", member=DataManager.member_to_dict(mem))
+        self.save()
+        return _account(mem)
+
+    def delete_member(self, member_id):
+        self.member(member_id)
+        del self.members[member_id]
+        DataManager.record("member_del", member_id=member_id)
+        self.save()
+        return True
+
+    def login(self, member_id, password):
+        mem = self.member(member_id)
+        before = mem.password
+        ok = mem.login(password)
+        if mem.password != before: self.save()  # Hash cũ vừa được băm lại
+        return ok
+
+    def admin_login(self, username, password):
+        for admin in self.admins:
+            if admin.username == username:
+                before = admin.password
+                ok = admin.login(password)
+                if admin.password != before:
+                    DataManager.record("admin", admin={"admin_id": admin.admin_id, "username": admin.username,
+                                                       "password": admin.password})
+                    self.save()
+                return ok
+        if self.dummy_hash is None: self.dummy_hash = hash_password(secrets.token_hex(8))
+        verify_password(password, self.dummy_hash)
+        return False
+
+    def call(self, member_id, method, args, kwargs=None):
+        """Gọi một hàm của Member (nằm trong READ_METHODS/WRITE_METHODS)."""
+        if method not in READ_METHODS and method not in WRITE_METHODS:
+            raise ShardError(f"Không được gọi hàm '{method}'.")
+        result = getattr(self.member(member_id), method)(*args, **(kwargs or {}))
+        if method in WRITE_METHODS: self.save()
+        return _plain(result)
+
+    def add_contacts(self, member_id, rows):
+        """Thêm hàng loạt liên hệ (name, phone, email, address, notes) rồi lưu một lần."""
+        mem = self.member(member_id)
+        mem.add_contacts(rows)
+        self.save()
+        return mem.contact_count
+
+    def export_open(self, member_id):
+        """Bắt đầu xuất danh bạ (Member.iter_export, trên một snapshot()). Trả về export_id."""
+        export_id = next(self.export_ids)
+        self.exports[export_id] = self.member(member_id).iter_export()
+        return export_id
+
+    def export_next(self, export_id, count):
+        """Tối đa count dòng xuất tiếp theo [(liên hệ dạng dict, tên nhóm)]; rỗng khi đã hết (lần xuất được đóng)."""
+        items = self.exports.get(export_id)
+        if items is None: raise ShardError(f"Không có lần xuất {export_id}.")
+        page = [(DataManager.contact_to_dict(c), names) for c, names in itertools.islice(items, count)]
+        if not page: del self.exports[export_id]
+        return page
+
+    def export_close(self, export_id):
+        """Hủy lần xuất đang dở (người gọi dừng giữa chừng)."""
+        self.exports.pop(export_id, None)
+
+
+def shard_main(conn, index, count, path, storage, flush_interval):
+    """
+    Vòng lặp của tiến trình shard: nhận (id, op, args), trả về (id, thành công, kết quả/lỗi, dòng đã in).
+    Các dòng Member in ra (thông báo cho menu) được gom theo từng yêu cầu và gửi kèm kết quả.
+    """
+    os.makedirs(path, exist_ok=True)
+    os.chdir(path)  # DataManager dùng đường dẫn tương đối: mỗi shard lưu trong thư mục riêng
+    sys.stdout = output = io.StringIO()
+    try:
+        shard = Shard(index, count, storage, flush_interval)
+    except Exception as e:
+        conn.send((None, False, ShardError(f"Shard {index} không khởi động được: {e}"), ""))
+        return
+    conn.send((None, True, None, ""))  # Báo đã sẵn sàng
+    try:
+        while True:
+            try: message = conn.recv()
+            except EOFError: break
+            if message is None: break
+            rid, op, args = message
+            output.seek(0); output.truncate()
+            try:
+                if op not in SHARD_OPS:
+                    raise ShardError(f"Không có thao tác '{op}'.")
+                reply = (rid, True, getattr(shard, op)(*args), output.getvalue())
+            except Exception as e:
+                reply = (rid, False, e, output.getvalue())
+            try: conn.send(reply)
+            except Exception as e:  # Lỗi không pickle được
+                conn.send((rid, False, ShardError(f"{type(e).__name__}: {e}"), reply[3]))
+    finally:
+        shard.close()
+
+# ==========================================
+# 2. ROUTER (chạy trong tiến trình chính)
+# ==========================================
+class ShardClient:
+    """
+    Đầu nối tới một tiến trình shard. Nhiều luồng gửi yêu cầu cùng lúc được (các yêu cầu
+    xếp hàng trong pipe); một luồng nhận trả kết quả về đúng Future theo id yêu cầu.
+    """
+    def __init__(self, ctx, index, count, path, storage, flush_interval, echo=None):
+        self.index = index
+        self.echo = echo  # Nhận các dòng shard in ra khi xử lý yêu cầu, None để bỏ qua
+        self.conn, child = ctx.Pipe()
+        self.process = ctx.Process(target=shard_main, name=f"shard-{index}", daemon=True,
+                                   args=(child, index, count, path, storage, flush_interval))
+        self.process.start()
+        child.close()
+        try: _, ok, error, _ = self.conn.recv()
+        except EOFError:
+            ok, error = False, ShardError(f"Tiến trình shard {index} dừng khi đang khởi động.")
+        if not ok:
+            self.process.join()
+            raise error
+        self.pending = {}  # Dict[int, Future]
+        self.ids = itertools.count()
+        self.lock = threading.Lock()
+        self.closed = False
+        self.receiver = threading.Thread(target=self.receive, name=f"shard-{index}-recv", daemon=True)
+        self.receiver.start()
+
+    def submit(self, op, *args):
+        """Gửi yêu cầu. Trả về Future của kết quả."""
+        future = Future()
+        with self.lock:
+            if self.closed: raise ShardError(f"Shard {self.index} đã dừng.")
+            rid = next(self.ids)
+            self.pending[rid] = future
+            self.conn.send((rid, op, args))
+        return future
+
+    def receive(self):
+        while True:
+            try: rid, ok, value, printed = self.conn.recv()
+            except (EOFError, OSError): break
+            with self.lock: future = self.pending.pop(rid, None)
+            if future is None: continue
+            if printed and self.echo: self.echo(printed)  # In trước khi người gọi nhận kết quả
+            if ok: future.set_result(value)
+            else: future.set_exception(value)
+        with self.lock:
+            self.closed = True
+            pending, self.pending = self.pending, {}
+        for future in pending.values():
+            future.set_exception(ShardError(f"Shard {self.index} đã dừng."))
+
+    def close(self):
+        """Đợi shard xử lý hết yêu cầu đang chờ, lưu dữ liệu rồi dừng."""
+        with self.lock:
+            if self.closed: return
+            self.conn.send(None)
+        self.process.join()
+        self.receiver.join()
+        self.conn.close()
+
+
+class ShardRouter:
+    """
+    Chuyển yêu cầu tới shard sở hữu member (member_id % N) và gom kết quả từ mọi shard.
+    """
+    def __init__(self, shards=None, root=None, storage="json", flush_interval=0, echo=None):
+        """
+        Args:
+            shards (int, optional): Số tiến trình shard, mặc định bằng số nhân CPU.
+            root (str, optional): Thư mục chứa dữ liệu các shard, mặc định CLUSTER_DIR.
+            storage (str): Chế độ lưu của mỗi shard.
+            flush_interval (float): > 0 để bật ghi trễ trong mỗi shard.
+            echo (callable, optional): Nhận các dòng Member in ra trong shard (ví dụ để hiện lên menu
+                console), None để bỏ qua.
+
+        Raises:
+            ValueError: Thư mục cụm đã được tạo với số shard khác.
+        """
+        self.count = shards or os.cpu_count() or 1
+        self.root = os.path.abspath(root or CLUSTER_DIR)
+        self.prepare()
+        # spawn: tiến trình con không thừa hưởng các luồng/khóa của tiến trình chính
+        ctx = multiprocessing.get_context("spawn")
+        self.shards = []
+        try:
+            for i in range(self.count):
+                self.shards.append(ShardClient(ctx, i, self.count, self.shard_path(i), storage, flush_interval, echo))
+        except BaseException:
+            for shard in self.shards: shard.close()
+            raise
+        self.sessions = SessionStore()
+        self.system_log = SystemLog(os.path.join(self.root, LOG_FILE))
+        self.lock = threading.Lock()  # Giữ khi đổi bảng username / chọn shard cho member mới
+        self.dummy_hash = None  # Dùng khi username không tồn tại, để thời gian phản hồi như nhau
+        accounts = self.list_members()
+        self.directory = {a["username"]: a["member_id"] for a in accounts}
+        self.names = {a["member_id"]: a["username"] for a in accounts}  # member_id -> username
+        self.loads = [0] * self.count  # Số member của mỗi shard, member mới vào shard ít nhất
+        for a in accounts: self.loads[a["member_id"] % self.count] += 1
+
+    def shard_path(self, index):
+        return os.path.join(self.root, f"shard_{index}")
+
+    def prepare(self):
+        """Tạo thư mục cụm (chia dữ liệu một tiến trình nếu có) hoặc kiểm tra số shard."""
+        config = os.path.join(self.root, CLUSTER_FILE)
+        if os.path.exists(config):
+            with open(config, "r", encoding="utf-8") as f:
+                stored = json.load(f)["shards"]
+            if stored != self.count:
+                raise ValueError(f"Dữ liệu cụm được chia cho {stored} shard, không mở được với {self.count} shard.")
+            return
+        os.makedirs(self.root, exist_ok=True)
+        if DataManager.backend.exists():
+            admins, members, logs, meta = DataManager.load_data()
+            next_id = meta.get("next_member_id", max((m.member_id for m in members), default=100) + 1)
+            for i in range(self.count):
+                os.makedirs(self.shard_path(i), exist_ok=True)
+                part = [m for m in members if m.member_id % self.count == i]
+                snapshot = DataManager.build_snapshot(admins if i == 0 else [], part, [], next_id)
+                DataManager.write_snapshot(snapshot, os.path.join(self.shard_path(i), "phonebook_data.json"))
+        DataManager.write_snapshot({"shards": self.count}, config)
+
+    def shard_of(self, member_id):
+        return self.shards[member_id % self.count]
+
+    def close(self):
+        for shard in self.shards: shard.close()
+        self.system_log.close()
+
+    def write_log(self, message):
+        self.system_log.write(message)
+
+    # --- YÊU CẦU THEO MEMBER ---
+
+    def call_async(self, member_id, method, *args, **kwargs):
+        """Gọi hàm `method` của Member trên shard sở hữu. Trả về Future."""
+        return self.shard_of(member_id).submit("call", member_id, method, args, kwargs)
+
+    def call(self, member_id, method, *args, **kwargs):
+        """
+        Gọi hàm `method` của Member trên shard sở hữu và đợi kết quả.
+
+        Returns:
+            Kết quả của hàm, với Contact/Group/liên kết đã chuyển thành dict.
+
+        Raises:
+            ShardError: Member không tồn tại hoặc hàm không được phép gọi.
+        """
+        return self.call_async(member_id, method, *args, **kwargs).result()
+
+    def add_contacts(self, member_id, rows):
+        """Thêm hàng loạt liên hệ cho member, shard lưu một lần. Trả về số liên hệ sau khi thêm."""
+        return self.shard_of(member_id).submit("add_contacts", member_id, list(rows)).result()
+
+    def iter_export(self, member_id):
+        """
+        Duyệt danh bạ của member để xuất file, lấy từ shard sở hữu từng trang EXPORT_PAGE liên hệ.
+        Mọi trang đến từ cùng một snapshot() trong shard; tiến trình chính chỉ giữ một trang.
+
+        Yields:
+            tuple[Contact, list[str]]: Như Member.iter_export.
+        """
+        shard = self.shard_of(member_id)
+        export_id = shard.submit("export_open", member_id).result()
+        done = False
+        try:
+            while True:
+                page = shard.submit("export_next", export_id, EXPORT_PAGE).result()
+                if not page:
+                    done = True
+                    return
+                for contact, names in page: yield DataManager.contact_from_dict(contact), names
+        finally:
+            if not done:
+                try: shard.submit("export_close", export_id)
+                except ShardError: pass  # Shard đã dừng
+
+    # --- TÀI KHOẢN ---
+
+    def list_members(self):
+        """Danh sách tài khoản của mọi shard (gửi song song rồi gom), theo member_id."""
+        futures = [shard.submit("accounts") for shard in self.shards]
+        return sorted((a for f in futures for a in f.result()), key=lambda a: a["member_id"])
+
+    def find_member(self, username):
+        """member_id của username, None nếu không có."""
+        return self.directory.get(username)
+
+    def create_member(self, username, password, email=""):
+        """
+        Tạo member trên shard đang có ít member nhất; mật khẩu được băm trong tiến trình shard.
+
+        Returns:
+            dict | None: Thông tin tài khoản, None nếu username đã tồn tại.
+        """
+        with self.lock:
+            if username in self.directory: return None
+            self.directory[username] = None  # Giữ chỗ tên trong lúc shard tạo tài khoản
+            index = self.loads.index(min(self.loads))
+            self.loads[index] += 1
+        try:
+            account = self.shards[index].submit("create_member", username, password, email).result()
+        except BaseException:
+            with self.lock:
+                self.directory.pop(username, None)
+                self.loads[index] -= 1
+            raise
+        with self.lock:
+            self.directory[username] = account["member_id"]
+            self.names[account["member_id"]] = username
+        return account
+
+    def delete_member(self, member_id):
+        """Xóa member và hủy các phiên của nó."""
+        self.shard_of(member_id).submit("delete_member", member_id).result()
+        with self.lock:
+            name = self.names.pop(member_id, None)
+            self.directory.pop(name, None)
+            self.loads[member_id % self.count] -= 1
+        self.sessions.revoke_account(("member", member_id))
+
+    def login(self, username, password, role="member"):
+        """
+        Đăng nhập (mật khẩu được kiểm tra trong tiến trình shard).
+
+        Returns:
+            str | None: Token phiên nếu đúng.
+        """
+        if role == "admin":
+            ok = self.shards[0].submit("admin_login", username, password).result()
+            account = ("admin", username)
+        else:
+            member_id = self.directory.get(username)
+            if member_id is None:
+                # Vẫn tính hash như khi sai mật khẩu: không lộ username nào tồn tại qua thời gian phản hồi
+                if self.dummy_hash is None: self.dummy_hash = hash_password(secrets.token_hex(8))
+                verify_password(password, self.dummy_hash)
+                return None
+            ok = self.shard_of(member_id).submit("login", member_id, password).result()
+            account = ("member", member_id)
+        if not ok: return None
+        return self.sessions.issue(account)
+
+    def authenticate(self, token):
+        """("member", member_id) hoặc ("admin", username) của token còn hạn, None nếu không hợp lệ."""
+        return self.sessions.validate(token)
+
+    def logout(self, token):
+        self.sessions.revoke(token)
+
+# ==========================================
+# 4. HỆ THỐNG NHIỀU TIẾN TRÌNH (menu + server)
+# ==========================================
+class RemoteMember:
+    """
+    Member nằm trong một tiến trình shard, nhìn từ tiến trình chính: các hàm của Member
+    (READ_METHODS/WRITE_METHODS) được gửi qua ShardRouter, kết quả được dựng lại thành Contact/Group.
+    """
+    is_loaded = True  # Shard tự nạp danh bạ khi cần
+
+    def __init__(self, router, member_id, username, email="", is_active=True, contact_count=0):
+        self.router = router
+        self.member_id, self.username, self.email = member_id, username, email
+        self.is_active, self.contact_count = is_active, contact_count
+
+    def __getattr__(self, name):
+        if name not in READ_METHODS and name not in WRITE_METHODS: raise AttributeError(name)
+        return lambda *args, **kwargs: _restore(self.router.call(self.member_id, name, *args, **kwargs))
+
+    def __eq__(self, other):
+        return isinstance(other, RemoteMember) and other.member_id == self.member_id
+
+    def __hash__(self):
+        return hash(self.member_id)
+
+    @property
+    def groups(self):
+        return list(self.snapshot().groups)
+
+    def ensure_loaded(self):
+        pass
+
+    def add_contacts(self, rows):
+        """Thêm hàng loạt liên hệ, shard lưu một lần. Trả về số liên hệ sau khi thêm."""
+        self.contact_count = self.router.add_contacts(self.member_id, rows)
+        return self.contact_count
+
+    def iter_export(self):
+        """Như Member.iter_export, lấy từng trang từ shard (xem ShardRouter.iter_export)."""
+        return self.router.iter_export(self.member_id)
+
+    # Chạy ở tiến trình chính trên kết quả lấy từ shard
+    view_contacts_in_group = Member.view_contacts_in_group
+
+
+class RemoteAdmin:
+    """Tài khoản Admin (lưu trong shard 0) đã đăng nhập qua ShardRouter."""
+    def __init__(self, username):
+        self.username = username
+
+
+class ClusterSystem(PhoneBookSystem):
+    """
+    PhoneBookSystem chạy trên ShardRouter: cùng các hàm mà menu (main.py) và server.py dùng,
+    nhưng mỗi member nằm trong tiến trình shard sở hữu nó. Shard tự lưu sau mỗi thay đổi,
+    nên save_changes/flush_now ở đây không làm gì.
+
+    PhoneBookSystem.__init__ không được gọi: không có members/admins/auth/save_lock của chế độ một
+    tiến trình. Mọi hàm kế thừa dùng tới chúng đều được ghi đè bên dưới (chuyển cho router hoặc
+    báo NotImplementedError).
+    """
+    member_type, admin_type = RemoteMember, RemoteAdmin
+
+    def __init__(self, shards=None, storage=None, flush_interval=None, echo=True, root=None):
+        """
+        Args:
+            shards (int, optional): Số tiến trình shard, mặc định bằng số nhân CPU.
+            storage (str, optional): Chế độ lưu của mỗi shard, mặc định PHONEBOOK_STORAGE hoặc "json".
+            flush_interval (float, optional): > 0 để bật ghi trễ trong mỗi shard
+                (mặc định PHONEBOOK_FLUSH_INTERVAL hoặc 0).
+            echo (bool): In ra các dòng Member in trong shard (menu console), False để bỏ qua (server).
+            root (str, optional): Thư mục dữ liệu cụm, mặc định CLUSTER_DIR.
+
+        Raises:
+            ValueError: Thư mục cụm đã được tạo với số shard khác.
+            ShardError: Một shard không khởi động được.
+        """
+        storage = storage or os.environ.get("PHONEBOOK_STORAGE", "json")
+        if flush_interval is None: flush_interval = float(os.environ.get("PHONEBOOK_FLUSH_INTERVAL", 0))
+        DataManager.configure(storage)  # Dữ liệu một tiến trình (nếu có) được chia vào các shard lần đầu
+        first_run = not os.path.exists(os.path.join(root or CLUSTER_DIR, CLUSTER_FILE))
+        self.router = ShardRouter(shards, root, storage, flush_interval,
+                                  echo=(lambda text: print(text, end="", flush=True)) if echo else None)
+        self.system_log = self.router.system_log
+        self.logs = self.system_log.recent
+        self.lock = self.router.lock
+        self.current_user = None
+        self.session = None
+        self.flusher = None
+        self.echo = echo
+        self.load_percent = -1
+        if first_run and not self.router.directory:
+            print(">> Khởi tạo dữ liệu mẫu...")
+            self.load_dummy_data()
+
+    def load_dummy_data(self):
+        """Tạo member mẫu như PhoneBookSystem (tài khoản admin mẫu do shard 0 tạo)."""
+        mem = self.create_member("sinhvien", "123", "sv@email.com")
+        mem.add_contact("Bố", "090111", "dad@email.com", "Home", "Gia đình")
+        mem.create_group("Gia Đình")
+        self.write_log("System init with dummy data.")
+
+    # --- TÀI KHOẢN ---
+
+    def list_members(self):
+        return tuple(RemoteMember(self.router, **a) for a in self.router.list_members())
+
+    def find_member(self, username):
+        member_id = self.router.find_member(username)
+        return None if member_id is None else RemoteMember(self.router, member_id, username)
+
+    def get_member(self, member_id):
+        username = self.router.names.get(member_id)
+        return None if username is None else RemoteMember(self.router, member_id, username)
+
+    def create_member(self, username, password, email=""):
+        account = self.router.create_member(username, password, email)
+        return None if account is None else RemoteMember(self.router, **account)
+
+    def remove_member(self, mem):
+        self.router.delete_member(mem.member_id)
+
+    def login_account(self, username, password, role="member"):
+        token = self.router.login(username, password, role)
+        if not token: return None, None
+        return (RemoteAdmin(username) if role == "admin" else self.find_member(username)), token
+
+    def authenticate(self, token):
+        account = self.router.authenticate(token)
+        if account is None: return None
+        role, key = account
+        return RemoteAdmin(key) if role == "admin" else self.get_member(key)
+
+    def end_session(self, token):
+        self.router.logout(token)
+
+    # --- CHỈ CÓ Ở CHẾ ĐỘ MỘT TIẾN TRÌNH ---
+
+    def index_accounts(self):
+        pass  # Bảng username -> member_id nằm ở router (ShardRouter.directory), luôn đồng bộ
+
+    def find_admin(self, username):
+        raise NotImplementedError("Tài khoản admin nằm trong shard 0: đăng nhập bằng login_account(..., \"admin\").")
+
+    def add_member(self, mem):
+        raise NotImplementedError("Member được tạo trong shard sở hữu nó: dùng create_member.")
+
+    def on_password_upgrade(self, account):
+        raise NotImplementedError("Shard tự lưu hash mật khẩu được băm lại khi đăng nhập.")
+
+    # --- LƯU ---
+
+    def flush_now(self):
+        pass  # Mỗi shard tự lưu sau mỗi thay đổi
+
+    def shutdown(self):
+        """Dừng các shard (mỗi shard ghi nốt thay đổi còn chờ) và đóng file log."""
+        self.router.close()
\ No newline at end of file
@@ -0,0 +1,86 @@
+"""
+Khóa đọc/ghi cho dữ liệu của từng member.
+"""
+import threading
+from contextlib import contextmanager
+
+
+class RWLock:
+    """
+    Khóa đọc/ghi: nhiều luồng đọc cùng lúc, luồng ghi độc quyền.
+
+    - Ưu tiên luồng ghi: khi có luồng ghi đang chờ, luồng đọc mới phải đợi, nên luồng
+      đọc liên tục không làm luồng ghi chờ mãi.
+    - Reentrant: luồng đang giữ khóa ghi lấy lại được khóa ghi hoặc khóa đọc (ví dụ
+      listener lưu dữ liệu được gọi khi đang sửa); luồng đang đọc lấy lại được khóa đọc.
+    - Không nâng khóa đọc lên khóa ghi (hai luồng cùng nâng sẽ chờ nhau mãi): báo RuntimeError.
+
+    Dùng trực tiếp `with lock:` tương đương `with lock.write():`.
+    """
+    def __init__(self):
+        self.cond = threading.Condition(threading.Lock())
+        self.readers = 0          # Số luồng đang đọc (không tính luồng ghi đọc lồng)
+        self.writer = None        # ident của luồng đang giữ khóa ghi
+        self.waiting_writers = 0
+        self.held = {}            # ident -> list[bool]: các lần giữ lồng nhau (True = tính là ghi)
+
+    def acquire_read(self):
+        me = threading.get_ident()
+        with self.cond:
+            stack = self.held.setdefault(me, [])
+            if self.writer == me:
+                stack.append(True)
+                return
+            if not stack:
+                # Lần đọc đầu của luồng này: nhường luồng ghi đang giữ hoặc đang chờ
+                while self.writer is not None or self.waiting_writers: self.cond.wait()
+                self.readers += 1
+            stack.append(False)
+
+    def acquire_write(self):
+        me = threading.get_ident()
+        with self.cond:
+            stack = self.held.setdefault(me, [])
+            if self.writer == me:
+                stack.append(True)
+                return
+            if stack: raise RuntimeError("Không thể nâng khóa đọc lên khóa ghi.")
+            self.waiting_writers += 1
+            try:
+                while self.writer is not None or self.readers: self.cond.wait()
+            finally:
+                self.waiting_writers -= 1
+            self.writer = me
+            stack.append(True)
+
+    def release(self):
+        """Nhả lần giữ gần nhất (đọc hoặc ghi) của luồng hiện tại."""
+        me = threading.get_ident()
+        with self.cond:
+            stack = self.held.get(me)
+            if not stack: raise RuntimeError("Luồng không giữ khóa này.")
+            stack.pop()
+            if stack: return
+            del self.held[me]
+            if self.writer == me: self.writer = None
+            else: self.readers -= 1
+            if self.writer is None and not self.readers: self.cond.notify_all()
+
+    @contextmanager
+    def read(self):
+        self.acquire_read()
+        try: yield self
+        finally: self.release()
+
+    @contextmanager
+    def write(self):
+        self.acquire_write()
+        try: yield self
+        finally: self.release()
+
+    def __enter__(self):
+        self.acquire_write()
+        return self
+
+    def __exit__(self, *exc):
+        self.release()
@@ -0,0 +1,4 @@
+import os
+
+# Giảm hệ số công việc PBKDF2 khi chạy test để bộ test không chậm (phải đặt trước khi import auth)
+os.environ.setdefault("PHONEBOOK_PBKDF2_ITERATIONS", "1000")
\ No newline at end of file
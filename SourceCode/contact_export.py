@@ -0,0 +1,145 @@
+"""
+Xuất danh bạ của một Member ra file CSV, vCard (.vcf) hoặc JSON Lines (.jsonl).
+
+Liên hệ được duyệt qua Member.iter_export và ghi ra ngay từng dòng: văn bản xuất không được gom
+trong bộ nhớ, nhưng snapshot() của member (tuple tham chiếu tới mọi liên hệ) và bảng liên hệ -> nhóm
+vẫn tăng theo số liên hệ. Ở chế độ nhiều tiến trình, snapshot nằm trong shard và tiến trình chính chỉ
+nhận từng trang (cluster.ShardRouter.iter_export). File CSV/vCard xuất ra nhập lại được bằng contact_import.
+"""
+import csv
+import io
+import json
+import os
+from data import DataManager
+from contact_import import FIELDS
+
+EXPORT_EXTENSIONS = {".vcf": "vcard", ".vcard": "vcard", ".jsonl": "jsonl", ".ndjson": "jsonl"}
+
+
+def _vcard_escape(value):
+    """Thoát ký tự đặc biệt của vCard: "\\", ",", ";" và xuống dòng."""
+    return (value.replace("\\", "\\\\").replace(",", "\\,").replace(";", "\\;")
+            .replace("\r\n", "\\n").replace("\n", "\\n"))
+
+# ==========================================
+# 1. CÁC ĐỊNH DẠNG
+# ==========================================
+def csv_lines(items):
+    """
+    Sinh các dòng CSV: dòng tiêu đề (name, phone, email, address, notes, group) rồi mỗi liên hệ một dòng.
+
+    Args:
+        items (Iterable[tuple[Contact, list[str]]]): (liên hệ, tên các nhóm) từ Member.iter_export.
+
+    Yields:
+        str: Từng dòng CSV (kết thúc bằng "\\r\\n"); nhiều nhóm được nối bằng ",".
+    """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(FIELDS)
+    for contact, groups in items:
+        yield buffer.getvalue()
+        buffer.seek(0); buffer.truncate()
+        writer.writerow((contact.name, contact.phone, contact.email, contact.address, contact.notes, ",".join(groups)))
+    yield buffer.getvalue()
+
+
+def vcard_lines(items):
+    """
+    Sinh các thẻ vCard 3.0 (FN, TEL, EMAIL, ADR, NOTE, CATEGORIES), mỗi liên hệ một thẻ.
+
+    Args:
+        items (Iterable[tuple[Contact, list[str]]]): (liên hệ, tên các nhóm) từ Member.iter_export.
+
+    Yields:
+        str: Từng thẻ BEGIN:VCARD ... END:VCARD (dòng kết thúc bằng "\\r\\n").
+    """
+    for contact, groups in items:
+        lines = ["BEGIN:VCARD", "VERSION:3.0", f"FN:{_vcard_escape(contact.name)}",
+                 f"N:{_vcard_escape(contact.name)};;;;", f"TEL:{contact.phone}"]
+        if contact.email: lines.append(f"EMAIL:{_vcard_escape(contact.email)}")
+        if contact.address: lines.append(f"ADR:;;{_vcard_escape(contact.address)};;;;")
+        if contact.notes: lines.append(f"NOTE:{_vcard_escape(contact.notes)}")
+        if groups: lines.append("CATEGORIES:" + ",".join(_vcard_escape(g) for g in groups))
+        lines.append("END:VCARD")
+        yield "\r\n".join(lines) + "\r\n"
+
+
+def jsonl_lines(items):
+    """
+    Sinh JSON Lines: mỗi dòng là một liên hệ (như trong file dữ liệu) kèm "groups" là tên các nhóm.
+
+    Args:
+        items (Iterable[tuple[Contact, list[str]]]): (liên hệ, tên các nhóm) từ Member.iter_export.
+
+    Yields:
+        str: Từng dòng JSON (kết thúc bằng "\\n").
+    """
+    for contact, groups in items:
+        record = DataManager.contact_to_dict(contact)
+        record["groups"] = groups
+        yield json.dumps(record, ensure_ascii=False) + "\n"
+
+
+FORMATS = {"csv": csv_lines, "vcard": vcard_lines, "jsonl": jsonl_lines}
+
+# ==========================================
+# 2. XUẤT TỪ MEMBER
+# ==========================================
+def detect_format(path):
+    """Đoán định dạng theo phần mở rộng: ".vcf"/".vcard" là "vcard", ".jsonl"/".ndjson" là "jsonl", còn lại là "csv"."""
+    return EXPORT_EXTENSIONS.get(os.path.splitext(path)[1].lower(), "csv")
+
+
+def export_contacts(member, fmt="csv"):
+    """
+    Sinh nội dung file xuất của member theo từng đoạn văn bản (một lần duyệt danh bạ).
+
+    Args:
+        member (Member): Member cần xuất danh bạ.
+        fmt (str): "csv", "vcard" hoặc "jsonl".
+
+    Returns:
+        Iterator[str]: Các đoạn văn bản, ghi nối tiếp nhau thành file.
+
+    Raises:
+        ValueError: Định dạng không hỗ trợ.
+    """
+    if fmt not in FORMATS: raise ValueError(f"Định dạng không hỗ trợ: {fmt}")
+    return FORMATS[fmt](member.iter_export())
+
+
+def export_file(member, path, fmt=None):
+    """
+    Xuất danh bạ của member ra file (UTF-8). Ghi vào file tạm rồi đổi tên, nên file cũ
+    không bị hỏng nếu xuất lỗi giữa chừng.
+
+    Args:
+        member (Member): Member cần xuất danh bạ.
+        path (str): Đường dẫn file.
+        fmt (str, optional): "csv", "vcard" hoặc "jsonl", mặc định đoán theo phần mở rộng.
+
+    Returns:
+        int: Số liên hệ đã xuất.
+
+    Raises:
+        OSError: Không ghi được file.
+        ValueError: Định dạng không hỗ trợ.
+    """
+    fmt = fmt or detect_format(path)
+    if fmt not in FORMATS: raise ValueError(f"Định dạng không hỗ trợ: {fmt}")
+    count = 0
+    def counted():
+        nonlocal count
+        for item in member.iter_export():
+            count += 1
+            yield item
+    tmp = path + ".tmp"
+    try:
+        with open(tmp, "w", encoding="utf-8", newline="") as f:
+            for chunk in FORMATS[fmt](counted()): f.write(chunk)
+        os.replace(tmp, path)
+    except BaseException:
+        if os.path.exists(tmp): os.remove(tmp)
+        raise
+    return count
@@ -0,0 +1,265 @@
+"""
+Nhập danh bạ hàng loạt từ file CSV hoặc vCard (.vcf) vào một Member.
+
+File được đọc tuần tự từng dòng và thêm theo lô (Member.add_contacts cấp ID theo khối), nên
+bộ nhớ dùng chỉ tỉ lệ với kích thước một lô chứ không phải kích thước file.
+"""
+import csv
+import itertools
+import os
+import quopri
+import re
+from indexes import fold_text
+
+IMPORT_BATCH_SIZE = 5000   # Số liên hệ mỗi lô (mỗi lô lưu xuống file một lần)
+MAX_REPORTED_ERRORS = 100  # Số dòng lỗi tối đa giữ lại trong báo cáo
+FIELDS = ("name", "phone", "email", "address", "notes", "group")
+
+# Tên cột CSV được chấp nhận (so sánh sau khi bỏ dấu + chữ thường)
+CSV_ALIASES = {
+    "name": "name", "full name": "name", "fn": "name", "ten": "name", "ho ten": "name", "ho va ten": "name",
+    "phone": "phone", "tel": "phone", "mobile": "phone", "phone number": "phone",
+    "sdt": "phone", "so dien thoai": "phone", "dien thoai": "phone",
+    "email": "email", "e-mail": "email", "mail": "email",
+    "address": "address", "addr": "address", "adr": "address", "dia chi": "address",
+    "notes": "notes", "note": "notes", "ghi chu": "notes",
+    "group": "group", "groups": "group", "categories": "group", "nhom": "group",
+}
+PHONE_SEPARATORS = re.compile(r"[\s\-.()/]")
+VCARD_ESCAPES = re.compile(r"\\(.)")
+
+
+class ImportReport:
+    """Kết quả một lần nhập: số liên hệ đã thêm, số dòng bị bỏ và các lỗi đầu tiên."""
+    def __init__(self):
+        self.imported = 0
+        self.rejected = 0
+        self.batches = 0
+        self.errors = []  # list[(số dòng, lý do)], tối đa MAX_REPORTED_ERRORS phần tử
+
+    def reject(self, line, reason):
+        self.rejected += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS: self.errors.append((line, reason))
+
+
+def clean_phone(phone):
+    """
+    Bỏ khoảng trắng và dấu phân cách trong SĐT; "+" ở đầu được đổi thành "00".
+
+    Returns:
+        str | None: SĐT chỉ gồm chữ số (như kiểm tra isdigit ở màn hình thêm liên hệ), None nếu không hợp lệ.
+    """
+    phone = PHONE_SEPARATORS.sub("", phone or "")
+    if phone.startswith("+"): phone = "00" + phone[1:]
+    return phone if phone.isdigit() else None
+
+# ==========================================
+# 1. ĐỌC CSV
+# ==========================================
+def iter_csv(f):
+    """
+    Đọc từng dòng CSV thành bản ghi.
+
+    Dòng đầu là tiêu đề nếu có ít nhất một tên cột nhận ra được (xem CSV_ALIASES, cột lạ bị bỏ qua);
+    nếu không, các cột được hiểu theo thứ tự name, phone, email, address, notes, group.
+    Dấu phân cách ",", ";" hoặc tab được nhận từ dòng đầu.
+
+    Args:
+        f: File văn bản đã mở với newline="".
+
+    Yields:
+        tuple[int, dict]: (số dòng, bản ghi với các khóa trong FIELDS).
+
+    Raises:
+        csv.Error: File không đọc được theo định dạng CSV (ví dụ ô quá lớn); thông báo có số dòng.
+    """
+    first = f.readline()
+    if not first: return
+    try: dialect = csv.Sniffer().sniff(first, ",;\t")
+    except csv.Error: dialect = csv.excel
+    reader = csv.reader(itertools.chain([first], f), dialect)
+    try:
+        header = next(reader)
+        columns = [CSV_ALIASES.get(fold_text(cell).strip()) for cell in header]
+        rows = reader
+        if not any(columns):
+            columns = list(FIELDS)
+            rows = itertools.chain([header], reader)
+        for row in rows:
+            if not any(cell.strip() for cell in row): continue
+            record = {}
+            for key, value in zip(columns, row):
+                if key and key not in record: record[key] = value.strip()
+            yield reader.line_num, record
+    except csv.Error as e:
+        raise csv.Error(f"Dòng {reader.line_num}: {e}") from e
+
+# ==========================================
+# 2. ĐỌC VCARD
+# ==========================================
+def _unfold(f):
+    """Ghép các dòng vCard bị gấp (dòng tiếp theo bắt đầu bằng khoảng trắng, hoặc "=" cuối dòng quoted-printable)."""
+    current, start = None, 0
+    for number, line in enumerate(f, 1):
+        line = line.rstrip("\r\n")
+        if current is not None and line[:1] in (" ", "\t"):
+            current += line[1:]
+            continue
+        if current is not None and current.endswith("=") and "QUOTED-PRINTABLE" in current.split(":", 1)[0].upper():
+            current = current[:-1] + line
+            continue
+        if current is not None: yield start, current
+        current, start = line, number
+    if current is not None: yield start, current
+
+
+def _vcard_value(params, value):
+    """Giải mã giá trị vCard được ghi dạng quoted-printable (theo tham số CHARSET)."""
+    upper = [p.upper() for p in params]
+    if "ENCODING=QUOTED-PRINTABLE" in upper or "QUOTED-PRINTABLE" in upper:
+        charset = next((p.split("=", 1)[1] for p in params if p.upper().startswith("CHARSET=")), "utf-8")
+        try: value = quopri.decodestring(value.encode("latin-1", "replace")).decode(charset, "replace")
+        except LookupError: value = quopri.decodestring(value.encode("latin-1", "replace")).decode("utf-8", "replace")
+    return value
+
+
+def _unescape(value):
+    """Bỏ ký tự thoát của vCard: "\\n" thành xuống dòng, "\\," thành ","..."""
+    return VCARD_ESCAPES.sub(lambda m: "\n" if m.group(1) in "nN" else m.group(1), value).strip()
+
+
+def _split(value, sep):
+    """Tách giá trị vCard theo sep, bỏ qua sep đã được thoát bằng "\\"."""
+    return [_unescape(p) for p in re.split(r"(?<!\\)" + re.escape(sep), value)]
+
+
+def iter_vcard(f):
+    """
+    Đọc từng thẻ BEGIN:VCARD ... END:VCARD thành bản ghi.
+
+    Lấy FN (hoặc ghép từ N nếu thiếu), TEL và EMAIL đầu tiên, ADR, NOTE và CATEGORIES (làm nhóm).
+
+    Args:
+        f: File văn bản.
+
+    Yields:
+        tuple[int, dict]: (số dòng BEGIN:VCARD, bản ghi với các khóa trong FIELDS).
+    """
+    card, start = None, 0
+    for number, line in _unfold(f):
+        head, sep, raw = line.partition(":")
+        if not sep: continue
+        name, *params = head.split(";")
+        name = name.rsplit(".", 1)[-1].upper()  # Bỏ tiền tố nhóm dạng "item1.TEL"
+        if name == "BEGIN" and raw.strip().upper() == "VCARD":
+            card, start = {}, number
+            continue
+        if card is None: continue
+        if name == "END":
+            if "name" not in card and "n" in card:
+                family, given, additional = (card.pop("n") + ["", "", ""])[:3]
+                card["name"] = " ".join(p for p in (family, additional, given) if p)
+            card.pop("n", None)
+            yield start, card
+            card = None
+            continue
+        value = _vcard_value(params, raw)
+        if name == "FN" and value.strip(): card.setdefault("name", _unescape(value))
+        elif name == "N": card.setdefault("n", _split(value, ";"))
+        elif name == "TEL": card.setdefault("phone", value.strip())
+        elif name == "EMAIL": card.setdefault("email", _unescape(value))
+        elif name == "ADR": card.setdefault("address", ", ".join(p for p in _split(value, ";") if p))
+        elif name == "NOTE": card.setdefault("notes", _unescape(value))
+        elif name == "CATEGORIES": card.setdefault("group", ",".join(_split(value, ",")))
+
+# ==========================================
+# 3. NHẬP VÀO MEMBER
+# ==========================================
+def import_contacts(member, records, batch_size=IMPORT_BATCH_SIZE, group=None, on_batch=None):
+    """
+    Kiểm tra và thêm các bản ghi vào danh bạ theo lô.
+
+    Bản ghi thiếu tên hoặc có SĐT không hợp lệ bị bỏ qua và ghi vào báo cáo. Nhóm được tìm theo tên
+    (không phân biệt hoa thường), chưa có thì tạo mới.
+
+    Args:
+        member (Member): Member nhận danh bạ.
+        records (Iterable[tuple[int, dict]]): (số dòng, bản ghi) từ iter_csv / iter_vcard.
+        batch_size (int): Số liên hệ mỗi lô.
+        group (str, optional): Tên nhóm gán cho mọi liên hệ được nhập.
+        on_batch (callable, optional): Gọi on_batch(report) sau mỗi lô, ví dụ để lưu xuống file.
+
+    Returns:
+        ImportReport: Kết quả nhập.
+    """
+    report = ImportReport()
+    group_ids = {g.group_name.casefold(): g.group_id for g in member.snapshot().groups}
+
+    def resolve(names):
+        ids = []
+        for name in names:
+            name = name.strip()
+            if not name: continue
+            key = name.casefold()
+            if key not in group_ids: group_ids[key] = member.create_group(name).group_id
+            if group_ids[key] not in ids: ids.append(group_ids[key])
+        return ids
+
+    def flush(batch):
+        member.add_contacts(batch)
+        report.imported += len(batch)
+        report.batches += 1
+        if on_batch: on_batch(report)
+
+    batch = []
+    for line, record in records:
+        name = (record.get("name") or "").strip()
+        if not name:
+            report.reject(line, "Thiếu tên")
+            continue
+        phone = clean_phone(record.get("phone"))
+        if phone is None:
+            report.reject(line, f"SĐT không hợp lệ: {record.get('phone') or '(trống)'}")
+            continue
+        names = (record.get("group") or "").split(",") + ([group] if group else [])
+        batch.append((name, phone, record.get("email", ""), record.get("address", ""), record.get("notes", ""),
+                      resolve(names)))
+        if len(batch) >= batch_size:
+            flush(batch)
+            batch = []
+    if batch: flush(batch)
+    return report
+
+
+def detect_format(path):
+    """Đoán định dạng theo phần mở rộng: ".vcf"/".vcard" là "vcard", còn lại là "csv"."""
+    return "vcard" if os.path.splitext(path)[1].lower() in (".vcf", ".vcard") else "csv"
+
+
+READERS = {"csv": iter_csv, "vcard": iter_vcard}
+
+
+def import_file(member, path, fmt=None, group=None, batch_size=IMPORT_BATCH_SIZE, on_batch=None):
+    """
+    Nhập danh bạ từ file CSV hoặc vCard (UTF-8, có hoặc không có BOM).
+
+    Args:
+        member (Member): Member nhận danh bạ.
+        path (str): Đường dẫn file.
+        fmt (str, optional): "csv" hoặc "vcard", mặc định đoán theo phần mở rộng.
+        group (str, optional): Tên nhóm gán cho mọi liên hệ được nhập.
+        batch_size (int): Số liên hệ mỗi lô.
+        on_batch (callable, optional): Gọi sau mỗi lô (xem import_contacts).
+
+    Returns:
+        ImportReport: Kết quả nhập.
+
+    Raises:
+        OSError: Không mở được file.
+        csv.Error: File CSV hỏng (thông báo có số dòng); các lô trước đó đã được thêm.
+        ValueError: Định dạng không hỗ trợ.
+    """
+    fmt = fmt or detect_format(path)
+    if fmt not in READERS: raise ValueError(f"Định dạng không hỗ trợ: {fmt}")
+    with open(path, encoding="utf-8-sig", errors="replace", newline="") as f:
+        return import_contacts(member, READERS[fmt](f), batch_size, group, on_batch)
@@ -1,125 +1,1215 @@
+import codecs
 import json
 import os
+import re
 import datetime
+import sqlite3
+import threading
+import binary_snapshot
 from models import Member, Admin, Contact, Group, ContactGroupMembership
 
 DATA_FILE = "phonebook_data.json"
+JOURNAL_FILE = "phonebook_data.journal"
+DB_FILE = "phonebook_data.db"  # File của chế độ "sqlite"
+BINARY_FILE = "phonebook_data.bin"  # File của chế độ "binary"
+DATA_DIR = "phonebook_data"  # Thư mục của chế độ "sharded"
+TIME_FORMAT = "%Y-%m-%d %H:%M:%S"
+JOURNAL_COMPACT_BYTES = 4 * 1024 * 1024  # Journal lớn hơn ngưỡng này sẽ được nén vào snapshot
+FLUSH_BATCH_SIZE = 50  # Chế độ ghi trễ: số lần đánh dấu thay đổi tối đa trước khi ghi ngay
+STREAM_CHUNK_SIZE = 1024 * 1024  # Đọc file JSON theo từng khối 1MB
+
+
+class DataLoadError(Exception):
+    """Dữ liệu đã lưu tồn tại nhưng không đọc được (hỏng, sai định dạng...)."""
 
 class DataManager:
     """
-    Lớp chịu trách nhiệm đọc và ghi dữ liệu xuống file JSON.
+    Lớp chịu trách nhiệm đọc và ghi dữ liệu của hệ thống.
+
+    Việc lưu thật do một backend (StorageBackend) đảm nhận, chọn bằng DataManager.configure:
+    - "json": mỗi lần lưu ghi lại toàn bộ file JSON (mặc định).
+    - "journal": mỗi thay đổi được ghi nối vào file journal; journal được nén
+      thành snapshot JSON mới ở luồng nền khi đủ lớn.
+    - "sharded": mỗi member một file trong DATA_DIR cùng một file index nhỏ; chỉ
+      các member có thay đổi mới bị ghi lại.
+    - "sqlite": cơ sở dữ liệu SQLite (DB_FILE), mỗi thay đổi là một câu lệnh theo dòng.
+    - "binary": snapshot nhị phân gọn (BINARY_FILE, xem binary_snapshot), ghi lại toàn bộ
+      mỗi lần lưu như "json" nhưng đọc nhanh hơn nhiều khi khởi động.
     """
+    backend = None  # StorageBackend đang dùng
 
     @staticmethod
-    def save_data(admins, members, logs):
+    def configure(mode="json"):
         """
-        Lưu toàn bộ danh sách Admins, Members và Logs xuống file JSON.
-        
+        Chọn chế độ lưu trữ.
+
         Args:
-            admins (list[Admin]): Danh sách admin.
-            members (list[Member]): Danh sách member.
-            logs (list[str]): Danh sách log hệ thống.
+            mode (str): Một khóa của BACKENDS ("json", "journal", "sharded", "sqlite", "binary").
+        """
+        if mode not in BACKENDS:
+            raise ValueError(f"Chế độ lưu không hợp lệ: {mode}")
+        DataManager.close()
+        DataManager.backend = BACKENDS[mode]()
+        Member.listener = DataManager.backend.on_member_change
+
+    @staticmethod
+    def record(op, **fields):
+        """Báo một thay đổi cấp hệ thống (tạo/xóa member, đổi hash admin) cho backend."""
+        if DataManager.backend: DataManager.backend.record(op, **fields)
+
+    @staticmethod
+    def close():
+        """Ghi nốt dữ liệu còn chờ và đợi luồng nền kết thúc (gọi trước khi thoát)."""
+        if DataManager.backend: DataManager.backend.close()
+
+    # --- CHUYỂN ĐỔI OBJECT <-> DICT ---
+
+    @staticmethod
+    def contact_to_dict(c):
+        c_dict = {
+            "contact_id": c.contact_id, "name": c.name, "phone": c.phone,
+            "email": c.email, "address": c.address, "notes": c.notes
+        }
+        if c.last_viewed_at:
+            c_dict["last_viewed_at"] = c.last_viewed_at.strftime(TIME_FORMAT)
+        return c_dict
+
+    @staticmethod
+    def contact_from_dict(c_data):
+        contact = Contact(
+            c_data["contact_id"], c_data["name"], c_data["phone"],
+            c_data.get("email", ""), c_data.get("address", ""), c_data.get("notes", "")
+        )
+        if "last_viewed_at" in c_data and c_data["last_viewed_at"]:
+            try: contact.last_viewed_at = datetime.datetime.strptime(c_data["last_viewed_at"], TIME_FORMAT)
+            except: pass
+        return contact
+
+    @staticmethod
+    def group_to_dict(g):
+        return {"group_id": g.group_id, "group_name": g.group_name}
+
+    @staticmethod
+    def membership_to_dict(m):
+        return {
+            "contact_id": m.contact_id, "group_id": m.group_id,
+            "added_at": m.added_at.strftime(TIME_FORMAT)
+        }
+
+    @staticmethod
+    def membership_from_dict(lnk):
+        ms = ContactGroupMembership(lnk["contact_id"], lnk["group_id"])
+        try: ms.added_at = datetime.datetime.strptime(lnk["added_at"], TIME_FORMAT)
+        except: pass
+        return ms
+
+    @staticmethod
+    def member_to_dict(mem):
+        """Chuyển Member (kèm danh bạ, nhóm, liên kết) thành dict để lưu. Member lazy được nạp trước."""
+        mem.ensure_loaded()
+        with mem.lock.read():  # Chụp khi không có luồng nào đang sửa member, các luồng đọc vẫn chạy
+            return DataManager._member_to_dict(mem)
+
+    @staticmethod
+    def _member_to_dict(mem):
+        return {
+            "member_id": mem.member_id, "username": mem.username,
+            "password": mem.password, "email": mem.email,
+            "is_active": mem.is_active,
+            "next_contact_id": mem.contact_ids.next_id,
+            "next_group_id": mem.group_ids.next_id,
+            "contacts": [DataManager.contact_to_dict(c) for c in mem.contacts],
+            "groups": [DataManager.group_to_dict(g) for g in mem.groups],
+            "memberships": [DataManager.membership_to_dict(m) for m in mem.memberships]
+        }
+
+    @staticmethod
+    def capture_member(mem):
+        """
+        Chụp nhanh một member để chuyển thành dict sau, ở luồng khác (xem captured_to_dict).
+        Chỉ lấy thông tin tài khoản và snapshot() (dùng lại nếu member chưa đổi), không dựng dict liên hệ.
         """
+        mem.ensure_loaded()
+        with mem.lock.read():
+            account = {
+                "member_id": mem.member_id, "username": mem.username,
+                "password": mem.password, "email": mem.email,
+                "is_active": mem.is_active,
+                "next_contact_id": mem.contact_ids.next_id,
+                "next_group_id": mem.group_ids.next_id,
+            }
+            return account, mem.snapshot()
+
+    @staticmethod
+    def captured_to_dict(captured):
+        """Dict lưu trữ (như member_to_dict) của một bản chụp từ capture_member."""
+        account, snap = captured
+        return {
+            **account,
+            "contacts": [DataManager.contact_to_dict(c) for c in snap.contacts],
+            "groups": [DataManager.group_to_dict(g) for g in snap.groups],
+            "memberships": [DataManager.membership_to_dict(m) for m in snap.memberships]
+        }
+
+    @staticmethod
+    def member_from_dict(m_data):
+        """Khôi phục Member (kèm danh bạ, nhóm, liên kết và chỉ mục) từ dict."""
+        return DataManager.fill_member(DataManager.account_from_dict(m_data), m_data)
+
+    @staticmethod
+    def account_from_dict(m_data):
+        """Tạo Member chỉ với thông tin tài khoản (chưa có danh bạ)."""
+        new_mem = Member(m_data["member_id"], m_data["username"], m_data["password"], m_data["email"])
+        new_mem.is_active = m_data.get("is_active", True)
+        return new_mem
+
+    @staticmethod
+    def fill_member(new_mem, m_data):
+        """Nạp danh bạ, nhóm, liên kết của dict vào Member rồi dựng chỉ mục."""
+        new_mem.contact_ids.next_id = m_data.get("next_contact_id", 1)
+        new_mem.group_ids.next_id = m_data.get("next_group_id", 1)
+
+        new_mem.contacts = [DataManager.contact_from_dict(c_data) for c_data in m_data.get("contacts", [])]
+        new_mem.groups = [Group(g_data["group_id"], g_data["group_name"]) for g_data in m_data.get("groups", [])]
+
+        new_mem.memberships = [DataManager.membership_from_dict(lnk) for lnk in m_data.get("memberships", [])]
+
+        new_mem.rebuild_indexes()
+        return new_mem
+
+    @staticmethod
+    def lazy_member(entry, fetch):
+        """
+        Tạo Member chỉ có thông tin tài khoản; danh bạ được nạp ở lần dùng đầu (Member.ensure_loaded).
+
+        Args:
+            entry (dict): Thông tin tài khoản, kèm "contact_count".
+            fetch (callable): fetch(member_id) trả về dict danh bạ/nhóm/liên kết của member.
+        """
+        mem = DataManager.account_from_dict(entry)
+        mem.stored_contact_count = entry.get("contact_count", 0)
+        mem.loader = lambda m: DataManager.fill_member(m, fetch(m.member_id))
+        return mem
+
+    @staticmethod
+    def build_snapshot(admins, members, logs, next_member_id=None):
+        """Dựng dict chứa toàn bộ dữ liệu hệ thống (định dạng file JSON)."""
         data = {
             "admins": [],
             "members": [],
-            "logs": logs 
+            "logs": list(logs)
         }
+        if next_member_id is not None:
+            data["next_member_id"] = next_member_id
 
         # 1. Lưu Admin
         for admin in admins:
             data["admins"].append({
-                "admin_id": admin.admin_id, 
-                "username": admin.username, 
+                "admin_id": admin.admin_id,
+                "username": admin.username,
                 "password": admin.password # Đã hash
             })
 
         # 2. Lưu Member
         for mem in members:
-            member_dict = {
-                "member_id": mem.member_id, "username": mem.username, 
-                "password": mem.password, "email": mem.email,
-                "is_active": mem.is_active,
-                "contacts": [], "groups": [], "memberships": []
-            }
+            data["members"].append(DataManager.member_to_dict(mem))
+        return data
+
+    @staticmethod
+    def stream_snapshot(path=None, progress=None):
+        """
+        Đọc file JSON snapshot theo luồng, dựng object ngay khi đọc xong từng phần tử.
+        Không giữ cả cây dict trong bộ nhớ: mỗi lúc chỉ có một contact/group/liên kết dạng dict.
+
+        Args:
+            path (str, optional): File snapshot, mặc định DATA_FILE.
+            progress (callable, optional): progress(số byte đã đọc, tổng số byte).
 
-            # Lưu Contacts
-            for c in mem.contacts:
-                c_dict = {
-                    "contact_id": c.contact_id, "name": c.name, "phone": c.phone,
-                    "email": c.email, "address": c.address, "notes": c.notes
-                }
-                if c.last_viewed_at:
-                    c_dict["last_viewed_at"] = c.last_viewed_at.strftime("%Y-%m-%d %H:%M:%S")
-                member_dict["contacts"].append(c_dict)
-
-            # Lưu Groups
-            for g in mem.groups:
-                member_dict["groups"].append({"group_id": g.group_id, "group_name": g.group_name})
-
-            # Lưu Memberships
-            for m in mem.memberships:
-                member_dict["memberships"].append({
-                    "contact_id": m.contact_id, "group_id": m.group_id,
-                    "added_at": m.added_at.strftime("%Y-%m-%d %H:%M:%S")
-                })
-
-            data["members"].append(member_dict)
-
-        try:
-            with open(DATA_FILE, "w", encoding="utf-8") as f:
-                json.dump(data, f, ensure_ascii=False, indent=4)
+        Returns:
+            tuple: (admins, members, logs, meta) giống from_snapshot.
+        """
+        admins, members, logs, meta = [], [], [], {}
+        with open(path or DATA_FILE, "rb") as f:
+            reader = JsonStreamReader(f, progress=progress)
+            for key in reader.items():
+                if key == "members":
+                    for _ in reader.array(): members.append(DataManager.stream_member(reader))
+                elif key == "admins":
+                    admins = [Admin(ad["admin_id"], ad["username"], ad["password"]) for ad in reader.value()]
+                elif key == "logs":
+                    logs = reader.value()
+                else:
+                    value = reader.value()
+                    if key == "next_member_id": meta[key] = value
+            reader.end()
+        return admins, members, logs, meta
+
+    @staticmethod
+    def stream_member(reader):
+        """Đọc một member từ reader (đang đứng trước object member)."""
+        fields, contacts, groups, links = {}, [], [], []
+        for key in reader.items():
+            if key == "contacts":
+                for _ in reader.array(): contacts.append(DataManager.contact_from_dict(reader.value()))
+            elif key == "groups":
+                for _ in reader.array():
+                    g_data = reader.value()
+                    groups.append(Group(g_data["group_id"], g_data["group_name"]))
+            elif key == "memberships":
+                for _ in reader.array(): links.append(DataManager.membership_from_dict(reader.value()))
+            else:
+                fields[key] = reader.value()
+        new_mem = DataManager.account_from_dict(fields)
+        new_mem.contact_ids.next_id = fields.get("next_contact_id", 1)
+        new_mem.group_ids.next_id = fields.get("next_group_id", 1)
+        new_mem.contacts, new_mem.groups, new_mem.memberships = contacts, groups, links
+        new_mem.rebuild_indexes()
+        return new_mem
+
+    @staticmethod
+    def from_snapshot(data):
+        """
+        Khôi phục các object từ dict snapshot (định dạng file JSON).
+
+        Returns:
+            tuple: (admins, members, logs, meta) với meta chứa "next_member_id" nếu có.
+        """
+        logs = data.get("logs", [])
+        meta = {k: data[k] for k in ("next_member_id",) if k in data}
+        # Password từ file json đã là hash, Admin.__init__ sẽ tự nhận diện qua độ dài
+        admins = [Admin(ad["admin_id"], ad["username"], ad["password"]) for ad in data.get("admins", [])]
+        members = [DataManager.member_from_dict(m_data) for m_data in data.get("members", [])]
+        return admins, members, logs, meta
+
+    @staticmethod
+    def write_snapshot(data, path=None, indent=4):
+        """Ghi dict dữ liệu ra file JSON (ghi file tạm rồi đổi tên để không hỏng file cũ)."""
+        path = path or DATA_FILE
+        tmp = path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False, indent=indent)
+        os.replace(tmp, path)
+
+    @staticmethod
+    def save_data(admins, members, logs, next_member_id=None):
+        """
+        Lưu toàn bộ danh sách Admins, Members và Logs qua backend đang dùng.
+        Các backend không ghi lại toàn bộ chỉ ghi phần đã thay đổi kể từ lần lưu trước.
+
+        Args:
+            admins (list[Admin]): Danh sách admin.
+            members (list[Member]): Danh sách member.
+            logs (list[str]): Log cũ đi kèm dữ liệu (PhoneBookSystem truyền rỗng vì log đã nằm ở file log riêng, xem system_log).
+                Chỉ snapshot JSON/nhị phân còn trường này; "sharded" và "sqlite" không lưu log.
+            next_member_id (int, optional): ID member tiếp theo của hệ thống.
+
+        Returns:
+            bool: True nếu lưu thành công; lỗi được in ra và trả về False.
+        """
+        try: DataManager.backend.save(admins, members, logs, next_member_id)
         except Exception as e:
             print(f"⚠️ Lỗi lưu file: {e}")
+            return False
+        return True
 
     @staticmethod
-    def load_data():
+    def load_data(lazy=False, progress=None):
+        """
+        Đọc dữ liệu qua backend đang dùng rồi khôi phục lại các object.
+        Chưa có dữ liệu thì trả về danh sách rỗng; có dữ liệu nhưng không đọc được thì báo lỗi.
+
+        Args:
+            lazy (bool): Chỉ nạp thông tin tài khoản của member, danh bạ được nạp khi
+                member đăng nhập hoặc admin xem (với backend hỗ trợ: "sharded", "sqlite").
+            progress (callable, optional): progress(đã đọc, tổng) được gọi trong lúc đọc.
+
+        Returns:
+            tuple: (admins, members, logs, meta) với meta chứa "next_member_id" nếu có.
+
+        Raises:
+            DataLoadError: Dữ liệu đã lưu bị hỏng hoặc sai định dạng.
+        """
+        try: return DataManager.backend.load(lazy, progress)
+        except Exception as e:
+            raise DataLoadError(f"Không đọc được dữ liệu ({type(e).__name__}: {e})") from e
+
+
+class JsonStreamReader:
+    """
+    Bộ đọc JSON tuần tự kiểu "kéo" (pull) trên file nhị phân, đọc theo từng khối.
+
+    Người gọi tự đi vào object/array bằng items()/array() và giải mã từng giá trị
+    con bằng value() (json.JSONDecoder.raw_decode), nên bộ nhớ chỉ tỉ lệ với một
+    khối đọc cộng phần tử lớn nhất đang giải mã, không phụ thuộc kích thước file.
+    """
+    WHITESPACE = re.compile(r"[ \t\r\n]*")
+
+    def __init__(self, f, chunk_size=None, progress=None):
+        """
+        Args:
+            f (BinaryIO): File mở ở chế độ "rb".
+            chunk_size (int, optional): Số byte mỗi lần đọc, mặc định STREAM_CHUNK_SIZE.
+            progress (callable, optional): progress(số byte đã đọc, tổng số byte) sau mỗi khối.
+        """
+        self.f = f
+        self.chunk_size = chunk_size or STREAM_CHUNK_SIZE
+        self.progress = progress
+        self.total = os.fstat(f.fileno()).st_size
+        self.bytes_read = 0
+        self.decoder = codecs.getincrementaldecoder("utf-8-sig")()  # Ký tự UTF-8 có thể bị cắt giữa hai khối
+        self.json = json.JSONDecoder()
+        self.buf = ""
+        self.pos = 0
+        self.eof = False
+
+    def _fill(self):
+        """Đọc thêm một khối vào bộ đệm (bỏ phần đã đọc xong). Trả về False nếu đã hết file."""
+        if self.eof: return False
+        chunk = self.f.read(self.chunk_size)
+        self.bytes_read += len(chunk)
+        self.eof = not chunk
+        self.buf = self.buf[self.pos:] + self.decoder.decode(chunk, final=self.eof)
+        self.pos = 0
+        if self.progress: self.progress(self.bytes_read, self.total)
+        return True
+
+    def _peek(self):
+        """Ký tự khác khoảng trắng tiếp theo, "" nếu hết file."""
+        while True:
+            self.pos = self.WHITESPACE.match(self.buf, self.pos).end()
+            if self.pos < len(self.buf): return self.buf[self.pos]
+            if not self._fill(): return ""
+
+    def _error(self, expected):
+        found = self._peek() or "hết file"
+        return ValueError(f"JSON không hợp lệ gần byte {self.bytes_read}: cần {expected}, gặp {found!r}")
+
+    def _expect(self, ch):
+        if self._peek() != ch: raise self._error(repr(ch))
+        self.pos += 1
+
+    def _close(self, end):
+        """Đọc dấu phân cách sau một phần tử. Trả về True nếu gặp ký tự đóng `end`."""
+        ch = self._peek()
+        if ch not in (",", end): raise self._error(f"',' hoặc {end!r}")
+        self.pos += 1
+        return ch == end
+
+    def value(self):
+        """Giải mã trọn giá trị JSON tiếp theo."""
+        self._peek()
+        while True:
+            try:
+                obj, end = self.json.raw_decode(self.buf, self.pos)
+                # Số ở cuối bộ đệm có thể còn chữ số ở khối sau
+                if end < len(self.buf) or self.eof:
+                    self.pos = end
+                    return obj
+            except json.JSONDecodeError:
+                if self.eof: raise
+            self._fill()
+
+    def items(self):
+        """Duyệt các khóa của object tiếp theo; sau mỗi khóa người gọi phải đọc giá trị của nó."""
+        self._expect("{")
+        if self._peek() == "}":
+            self.pos += 1
+            return
+        while True:
+            key = self.value()
+            if not isinstance(key, str): raise self._error("khóa dạng chuỗi")
+            self._expect(":")
+            yield key
+            if self._close("}"): return
+
+    def array(self):
+        """Duyệt array tiếp theo; mỗi lượt người gọi phải đọc đúng một phần tử."""
+        self._expect("[")
+        if self._peek() == "]":
+            self.pos += 1
+            return
+        while True:
+            yield
+            if self._close("]"): return
+
+    def end(self):
+        """Kiểm tra không còn dữ liệu thừa sau giá trị gốc."""
+        if self._peek() != "": raise self._error("hết file")
+
+
+class StorageBackend:
+    """
+    Giao diện chung của các backend lưu trữ mà DataManager sử dụng.
+
+    Backend nhận thay đổi theo hai đường: on_member_change (gắn vào Member.listener)
+    cho thay đổi trong một member, và record cho thay đổi cấp hệ thống ("member",
+    "member_del", "admin"). Backend ghi lại toàn bộ mỗi lần lưu có thể bỏ qua cả hai.
+    """
+    def exists(self):
+        """Backend đã có dữ liệu để đọc hay chưa."""
+        raise NotImplementedError
+
+    def load(self, lazy=False, progress=None):
         """
-        Đọc dữ liệu từ file JSON và khôi phục lại các object.
-        
+        Đọc toàn bộ dữ liệu.
+
+        Args:
+            lazy (bool): Chỉ nạp thông tin tài khoản của member nếu backend hỗ trợ.
+            progress (callable, optional): progress(đã đọc, tổng) nếu backend hỗ trợ.
+
         Returns:
-            tuple: (admins, members, logs)
-        """
-        admins, members, logs = [], [], []
-        if not os.path.exists(DATA_FILE): return [], [], []
-
-        try:
-            with open(DATA_FILE, "r", encoding="utf-8") as f:
-                data = json.load(f)
-
-            # Load Logs
-            logs = data.get("logs", [])
-
-            # Load Admin
-            for ad in data.get("admins", []):
-                # Password từ file json đã là hash, Member.__init__ sẽ tự nhận diện qua độ dài
-                admins.append(Admin(ad["admin_id"], ad["username"], ad["password"]))
-
-            # Load Member
-            for m_data in data.get("members", []):
-                new_mem = Member(m_data["member_id"], m_data["username"], m_data["password"], m_data["email"])
-                new_mem.is_active = m_data.get("is_active", True)
-
-                for c_data in m_data.get("contacts", []):
-                    contact = Contact(
-                        c_data["contact_id"], c_data["name"], c_data["phone"],
-                        c_data.get("email", ""), c_data.get("address", ""), c_data.get("notes", "")
-                    )
-                    if "last_viewed_at" in c_data and c_data["last_viewed_at"]:
-                        try: contact.last_viewed_at = datetime.datetime.strptime(c_data["last_viewed_at"], "%Y-%m-%d %H:%M:%S")
-                        except: pass
-                    new_mem.contacts.append(contact)
-
-                for g_data in m_data.get("groups", []):
-                    new_mem.groups.append(Group(g_data["group_id"], g_data["group_name"]))
-
-                for lnk in m_data.get("memberships", []):
-                    ms = ContactGroupMembership(lnk["contact_id"], lnk["group_id"])
-                    try: ms.added_at = datetime.datetime.strptime(lnk["added_at"], "%Y-%m-%d %H:%M:%S")
-                    except: pass
-                    new_mem.memberships.append(ms)
-
-                members.append(new_mem)
-            
-            return admins, members, logs
-        except Exception: return [], [], []
\ No newline at end of file
+            tuple: (admins, members, logs, meta) giống DataManager.load_data.
+        """
+        raise NotImplementedError
+
+    def save(self, admins, members, logs, next_member_id=None):
+        """Lưu các thay đổi (tham số giống DataManager.save_data)."""
+        raise NotImplementedError
+
+    def save_all(self, admins, members, logs, next_member_id=None):
+        """Ghi lại toàn bộ dữ liệu, bỏ qua mọi thay đổi đang chờ (dùng khi chuyển đổi định dạng)."""
+        self.save(admins, members, logs, next_member_id)
+
+    def on_member_change(self, member, op, data):
+        """Listener gắn vào Member (xem Member._changed)."""
+
+    def record(self, op, **fields):
+        """Ghi nhận một thay đổi cấp hệ thống."""
+
+    def close(self):
+        """Ghi nốt dữ liệu còn chờ và giải phóng tài nguyên."""
+
+    @staticmethod
+    def change_fields(member, op, data):
+        """Chuyển một thay đổi của member thành các trường của bản ghi (dict thuần, lưu được dạng JSON)."""
+        fields = {"member_id": member.member_id}
+        for key, value in data.items():
+            if key == "contact": value = DataManager.contact_to_dict(value)
+            elif key == "group": value = DataManager.group_to_dict(value)
+            elif key == "membership": value = DataManager.membership_to_dict(value)
+            fields[key] = value
+        return fields
+
+
+class JsonBackend(StorageBackend):
+    """Mỗi lần lưu ghi lại toàn bộ dữ liệu vào một file JSON."""
+    def __init__(self, path=None):
+        self.path = path or DATA_FILE
+
+    def exists(self):
+        return os.path.exists(self.path)
+
+    def load(self, lazy=False, progress=None):
+        if not self.exists(): return [], [], [], {}
+        return DataManager.stream_snapshot(self.path, progress)
+
+    def save(self, admins, members, logs, next_member_id=None):
+        DataManager.write_snapshot(DataManager.build_snapshot(admins, members, logs, next_member_id), self.path)
+
+
+class BinaryBackend(StorageBackend):
+    """
+    Mỗi lần lưu ghi lại toàn bộ dữ liệu vào snapshot nhị phân (binary_snapshot).
+    Khi chưa có file nhị phân thì đọc file JSON cũ; lần lưu sau sẽ ghi ra dạng nhị phân.
+    """
+    def __init__(self, path=None):
+        self.path = path or BINARY_FILE
+
+    def exists(self):
+        return os.path.exists(self.path)
+
+    def load(self, lazy=False, progress=None):
+        if not self.exists(): return JsonBackend().load(progress=progress)
+        with open(self.path, "rb") as f:
+            return binary_snapshot.load(f)
+
+    def save(self, admins, members, logs, next_member_id=None):
+        tmp = self.path + ".tmp"
+        with open(tmp, "wb") as f:
+            binary_snapshot.dump(f, admins, members, logs, next_member_id)
+        os.replace(tmp, self.path)
+
+
+class Journal(StorageBackend):
+    """
+    Nhật ký thay đổi chỉ ghi nối (mỗi dòng một bản ghi JSON) đặt cạnh file snapshot.
+
+    Khi nén, journal hiện tại được đổi tên thành "<journal>.compacting" và các
+    thay đổi mới ghi vào journal mới; mỗi member được chụp nhanh (snapshot()) sau thời điểm
+    đó, còn việc dựng dict và ghi file snapshot chạy ở luồng nền rồi mới xóa file ".compacting". Các bản ghi là upsert/xóa theo ID nên
+    phát lại nhiều lần vẫn cho cùng kết quả, kể cả khi chương trình dừng giữa lúc nén.
+    """
+    def __init__(self, path=None, snapshot_path=None, compact_bytes=JOURNAL_COMPACT_BYTES):
+        self.path = path or JOURNAL_FILE
+        self.snapshot_path = snapshot_path or DATA_FILE
+        self.compact_bytes = compact_bytes
+        self.pending = []       # Các dòng chưa ghi xuống đĩa
+        self.lock = threading.Lock()  # Bảo vệ pending và file journal (có thể ghi từ luồng nền)
+        self.compactor = None   # Luồng nén đang chạy (nếu có)
+
+    def record(self, op, **fields):
+        """Thêm một bản ghi thay đổi vào hàng chờ."""
+        line = json.dumps({"op": op, **fields}, ensure_ascii=False)
+        with self.lock: self.pending.append(line)
+
+    def on_member_change(self, member, op, data):
+        """Listener gắn vào Member: chuyển thay đổi của member thành bản ghi journal."""
+        self.record(op, **self.change_fields(member, op, data))
+
+    def exists(self):
+        return os.path.exists(self.snapshot_path) or bool(self.segments())
+
+    def load(self, lazy=False, progress=None):
+        """
+        Đọc snapshot theo luồng rồi phát lại các file journal còn lại. Chỉ những member
+        có bản ghi trong journal mới được chuyển qua dict để phát lại.
+        """
+        if not self.exists(): return [], [], [], {}
+        admins, members, logs, meta = JsonBackend(self.snapshot_path).load(progress=progress)
+        records = [rec for path in self.segments() for rec in Journal.read(path)]
+        if not records: return admins, members, logs, meta
+
+        touched = {rec["member"]["member_id"] if rec["op"] == "member" else rec.get("member_id")
+                   for rec in records}
+        data = {"members": [DataManager.member_to_dict(m) for m in members if m.member_id in touched],
+                "admins": DataManager.build_snapshot(admins, [], [])["admins"], "logs": logs, **meta}
+        Journal.replay(data, records)
+        replayed = {m["member_id"]: m for m in data["members"]}
+        result = []
+        for m in members:
+            if m.member_id not in touched: result.append(m)
+            elif m.member_id in replayed: result.append(DataManager.member_from_dict(replayed.pop(m.member_id)))
+        result.extend(DataManager.member_from_dict(m) for m in replayed.values())  # Member mới tạo
+        meta = {k: data[k] for k in ("next_member_id",) if k in data}
+        admins = [Admin(ad["admin_id"], ad["username"], ad["password"]) for ad in data["admins"]]
+        return admins, result, data["logs"], meta
+
+    def save(self, admins, members, logs, next_member_id=None):
+        """Ghi nối các bản ghi đang chờ; dựng lại snapshot khi cần nén."""
+        if self.needs_compaction():
+            self.compact(admins, members, logs, next_member_id)
+        else:
+            self.flush()
+
+    def save_all(self, admins, members, logs, next_member_id=None):
+        self.wait()
+        with self.lock:
+            self.pending.clear()
+            for path in self.segments(): os.remove(path)
+        DataManager.write_snapshot(DataManager.build_snapshot(admins, members, logs, next_member_id), self.snapshot_path)
+
+    def flush(self):
+        """Ghi các bản ghi đang chờ xuống cuối file journal."""
+        with self.lock: self._write_pending()
+
+    def _write_pending(self):
+        if not self.pending: return
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write("\n".join(self.pending) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        self.pending.clear()
+
+    def needs_compaction(self):
+        """Snapshot chưa tồn tại hoặc journal đã vượt ngưỡng (và không có lần nén nào đang chạy)."""
+        if self.compactor and self.compactor.is_alive(): return False
+        if not os.path.exists(self.snapshot_path): return True
+        return os.path.exists(self.path) and os.path.getsize(self.path) >= self.compact_bytes
+
+    def compact(self, admins, members, logs, next_member_id=None):
+        """
+        Nén journal vào snapshot mới ở luồng nền.
+
+        Luồng gọi chỉ tách journal cũ rồi chụp nhanh từng member (DataManager.capture_member), nên mọi
+        thay đổi trong journal cũ đều có trong snapshot; dựng dict và ghi file (O(toàn bộ dữ liệu))
+        chạy ở luồng "journal-compactor".
+        """
+        self.wait()
+        compacting = self.path + ".compacting"
+        with self.lock:
+            self._write_pending()
+            if os.path.exists(self.path): os.replace(self.path, compacting)
+        data = DataManager.build_snapshot(admins, [], logs, next_member_id)
+        captured = [DataManager.capture_member(m) for m in members]
+
+        def run():
+            data["members"] = [DataManager.captured_to_dict(c) for c in captured]
+            DataManager.write_snapshot(data, self.snapshot_path)
+            if os.path.exists(compacting): os.remove(compacting)
+
+        self.compactor = threading.Thread(target=run, name="journal-compactor", daemon=True)
+        self.compactor.start()
+
+    def wait(self):
+        """Đợi lần nén đang chạy (nếu có) hoàn tất."""
+        if self.compactor: self.compactor.join()
+
+    def close(self):
+        self.flush()
+        self.wait()
+
+    def segments(self):
+        """Các file journal cần phát lại khi khởi động, theo thứ tự cũ -> mới."""
+        return [p for p in (self.path + ".compacting", self.path) if os.path.exists(p)]
+
+    @staticmethod
+    def read(path):
+        """
+        Đọc các bản ghi của một file journal.
+
+        Chỉ dòng cuối được phép hỏng (bị ghi dở khi chương trình dừng giữa lúc ghi): dòng đó bị bỏ
+        và cắt khỏi file, để lần ghi nối tiếp theo bắt đầu ở dòng mới.
+
+        Returns:
+            list[dict]: Các bản ghi theo thứ tự ghi.
+
+        Raises:
+            DataLoadError: Có dòng hỏng nằm giữa file (các thay đổi sau nó sẽ bị mất nếu bỏ qua).
+        """
+        records, size, last = [], 0, b"\n"  # size: số byte của các dòng đọc được
+        with open(path, "rb") as f:
+            for number, line in enumerate(f, 1):
+                try: records.append(json.loads(line))
+                except ValueError:
+                    if f.read(1):
+                        raise DataLoadError(f"File journal {path} bị hỏng ở dòng {number}.") from None
+                    break
+                size += len(line)
+                last = line[-1:]
+        if size < os.path.getsize(path) or last != b"\n":
+            with open(path, "r+b") as f:
+                f.truncate(size)
+                if last != b"\n": f.seek(size); f.write(b"\n")  # Dòng cuối đủ nhưng thiếu xuống dòng
+        return records
+
+    @staticmethod
+    def replay(data, records):
+        """
+        Áp dụng các bản ghi journal lên dict snapshot (định dạng file JSON).
+
+        Args:
+            data (dict): Snapshot, được cập nhật tại chỗ.
+            records (iterable[dict]): Các bản ghi theo thứ tự ghi.
+        """
+        members = {m["member_id"]: m for m in data.setdefault("members", [])}
+        tables = {}  # member_id -> (contacts, groups, links) dạng dict theo khóa
+
+        def table(mid):
+            if mid not in tables:
+                m = members[mid]
+                tables[mid] = (
+                    {c["contact_id"]: c for c in m.get("contacts", [])},
+                    {g["group_id"]: g for g in m.get("groups", [])},
+                    {(l["contact_id"], l["group_id"]): l for l in m.get("memberships", [])},
+                )
+            return tables[mid]
+
+        for rec in records:
+            op, mid = rec["op"], rec.get("member_id")
+            if op == "member":
+                m = rec["member"]
+                members[m["member_id"]] = m
+                tables.pop(m["member_id"], None)
+                data["next_member_id"] = max(data.get("next_member_id", 0), m["member_id"] + 1)
+            elif op == "member_del":
+                members.pop(mid, None)
+                tables.pop(mid, None)
+            elif op == "admin":
+                ad = rec["admin"]
+                admins = [a for a in data.setdefault("admins", []) if a["admin_id"] != ad["admin_id"]]
+                data["admins"] = admins + [ad]
+            elif mid in members:
+                contacts, groups, links = table(mid)
+                m = members[mid]
+                if op == "contact":
+                    c = rec["contact"]
+                    contacts[c["contact_id"]] = c
+                    m["next_contact_id"] = max(m.get("next_contact_id", 1), c["contact_id"] + 1)
+                elif op == "contact_del":
+                    contacts.pop(rec["contact_id"], None)
+                    for key in [k for k in links if k[0] == rec["contact_id"]]: del links[key]
+                elif op == "group":
+                    g = rec["group"]
+                    groups[g["group_id"]] = g
+                    m["next_group_id"] = max(m.get("next_group_id", 1), g["group_id"] + 1)
+                elif op == "group_del":
+                    groups.pop(rec["group_id"], None)
+                    for key in [k for k in links if k[1] == rec["group_id"]]: del links[key]
+                elif op == "link":
+                    l = rec["membership"]
+                    links[(l["contact_id"], l["group_id"])] = l
+                elif op == "unlink":
+                    links.pop((rec["contact_id"], rec["group_id"]), None)
+                elif op == "account":
+                    m.update(rec["account"])
+
+        for mid, (contacts, groups, links) in tables.items():
+            if mid in members:
+                m = members[mid]
+                m["contacts"], m["groups"], m["memberships"] = (
+                    list(contacts.values()), list(groups.values()), list(links.values()))
+        data["members"] = list(members.values())
+
+
+class WriteBehindFlusher:
+    """
+    Ghi trễ (write-behind): save_changes chỉ đánh dấu có thay đổi, một luồng nền
+    gọi hàm lưu thật nhiều nhất một lần mỗi `interval` giây, hoặc ngay khi số lần
+    đánh dấu đạt `batch_size`. close() luôn ghi nốt phần còn lại.
+    Lần ghi lỗi không làm mất thay đổi: số thay đổi được trả lại và ghi thử lại sau `interval`.
+    """
+    def __init__(self, flush, interval=1.0, batch_size=FLUSH_BATCH_SIZE):
+        """
+        Args:
+            flush (callable): Hàm lưu thật; tự chụp snapshot nhất quán của dữ liệu.
+                Báo lỗi bằng ngoại lệ hoặc trả về False (như DataManager.save_data).
+            interval (float): Khoảng thời gian tối thiểu giữa hai lần ghi (giây).
+            batch_size (int): Số thay đổi tích lũy để ghi ngay không chờ hết interval.
+        """
+        self.flush = flush
+        self.interval = interval
+        self.batch_size = batch_size
+        self.dirty = 0          # Số lần đánh dấu chưa được ghi
+        self.closed = False
+        self.cond = threading.Condition()
+        self.thread = threading.Thread(target=self.run, name="write-behind", daemon=True)
+        self.thread.start()
+
+    def mark_dirty(self):
+        """Đánh dấu dữ liệu đã thay đổi (không chặn)."""
+        with self.cond:
+            self.dirty += 1
+            if self.dirty == 1 or self.dirty >= self.batch_size: self.cond.notify()
+
+    def run(self):
+        while True:
+            with self.cond:
+                while not self.dirty and not self.closed:
+                    self.cond.wait()
+                if self.closed: return
+                # Gom thêm thay đổi cho tới khi hết interval hoặc đủ batch
+                self.cond.wait_for(lambda: self.closed or self.dirty >= self.batch_size, self.interval)
+                if self.closed: return
+                pending, self.dirty = self.dirty, 0
+            try: ok = self.flush() is not False
+            except Exception as e:
+                print(f"⚠️ Lỗi ghi nền: {e}")
+                ok = False
+            if not ok:
+                with self.cond:
+                    self.dirty += pending  # Ghi lại ở lần sau, kể cả khi không có thay đổi mới
+                    self.cond.wait_for(lambda: self.closed, self.interval)  # Không thử lại liên tục
+
+    def close(self):
+        """Dừng luồng nền và ghi nốt các thay đổi còn lại (gọi khi thoát)."""
+        with self.cond:
+            self.closed = True
+            self.cond.notify()
+        self.thread.join()
+        if self.dirty:
+            self.dirty = 0
+            self.flush()
+
+
+class ShardedStore(StorageBackend):
+    """
+    Lưu mỗi member vào một file riêng (DATA_DIR/members/<member_id>.json) cùng file
+    index.json nhỏ chứa admin, danh sách tài khoản và next_member_id. Log hệ thống nằm ở file
+    log riêng (system_log); logs.json của phiên bản cũ chỉ còn được đọc để chuyển sang đó.
+
+    Member tự đánh dấu dirty khi thay đổi và báo cho store qua Member.listener, nên
+    mỗi lần lưu chỉ ghi lại shard của các member đã đổi (ghi file tạm rồi đổi tên).
+    index.json chỉ được ghi khi danh sách tài khoản thay đổi. Số liên hệ lưu kèm trong index
+    (dùng cho nạp lazy) không làm index phải ghi lại: số mới được ghi ở lần ghi index kế tiếp,
+    hoặc khi đóng store (close).
+    """
+    ACCOUNT_FIELDS = ("member_id", "username", "password", "email", "is_active")
+
+    def __init__(self, root=None):
+        self.root = root or DATA_DIR
+        self.lock = threading.Lock()
+        self.dirty_members = {}     # member_id -> Member có thay đổi chưa lưu
+        self.created = set()        # member_id mới tạo, chưa có shard
+        self.deleted = set()        # member_id đã xóa, cần xóa shard
+        self.accounts = {}          # member_id -> dòng tài khoản trong index (kèm số liên hệ mới nhất)
+        self.head = None            # Phần còn lại của index (admins, next_member_id) lần ghi/đọc gần nhất
+        self.index_dirty = False
+        self.counts_stale = False   # Số liên hệ trong accounts mới hơn bản trong index.json
+
+    def shard_path(self, member_id):
+        return os.path.join(self.root, "members", f"{member_id}.json")
+
+    def exists(self):
+        return os.path.exists(os.path.join(self.root, "index.json"))
+
+    def on_member_change(self, member, op, data):
+        """Listener gắn vào Member: ghi nhận member cần lưu lại."""
+        with self.lock: self.dirty_members[member.member_id] = member
+
+    def record(self, op, **fields):
+        """Ghi nhận thay đổi cấp hệ thống (tạo/xóa member, đổi hash admin)."""
+        with self.lock:
+            if op == "admin":
+                self.index_dirty = True
+            elif op == "member":
+                self.created.add(fields["member"]["member_id"])
+                self.index_dirty = True
+            elif op == "member_del":
+                self.deleted.add(fields["member_id"])
+                self.dirty_members.pop(fields["member_id"], None)
+                self.index_dirty = True
+
+    def adopt(self, members):
+        """Đánh dấu mọi member cần ghi (khi dữ liệu được nạp từ nguồn khác)."""
+        with self.lock:
+            self.created.update(m.member_id for m in members)
+            self.index_dirty = True
+
+    def account_entry(self, mem):
+        entry = {k: getattr(mem, k) for k in self.ACCOUNT_FIELDS}
+        entry["contact_count"] = mem.contact_count
+        return entry
+
+    def save(self, admins, members, logs, next_member_id=None):
+        """Ghi các shard đã thay đổi, rồi index nếu cần (không lưu logs: log nằm ở file log riêng)."""
+        with self.lock:
+            dirty, self.dirty_members = self.dirty_members, {}
+            created, self.created = self.created, set()
+            deleted, self.deleted = self.deleted, set()
+            index_dirty, self.index_dirty = self.index_dirty or not self.exists(), False
+        if created:
+            # Member mới tạo: cần tìm object trong danh sách (chỉ xảy ra khi admin tạo tài khoản)
+            dirty.update((m.member_id, m) for m in members if m.member_id in created)
+
+        os.makedirs(os.path.join(self.root, "members"), exist_ok=True)
+        for mid, mem in dirty.items():
+            mem.ensure_loaded()
+            with mem.lock.read():
+                shard = DataManager.member_to_dict(mem)
+                mem.dirty = False
+            for k in self.ACCOUNT_FIELDS: shard.pop(k)
+            DataManager.write_snapshot(shard, self.shard_path(mid), indent=None)
+            entry, old = self.account_entry(mem), self.accounts.get(mid)
+            if old is None or any(old[k] != entry[k] for k in self.ACCOUNT_FIELDS): index_dirty = True
+            elif old.get("contact_count") != entry["contact_count"]: self.counts_stale = True
+            self.accounts[mid] = entry
+        for mid in deleted:
+            self.accounts.pop(mid, None)
+            if os.path.exists(self.shard_path(mid)): os.remove(self.shard_path(mid))
+
+        if index_dirty:
+            self.accounts = {m.member_id: self.accounts.get(m.member_id) or self.account_entry(m)
+                             for m in members}
+            self.head = {"admins": DataManager.build_snapshot(admins, [], [])["admins"]}
+            if next_member_id is not None: self.head["next_member_id"] = next_member_id
+            self.write_index()
+
+    def write_index(self):
+        """Ghi index.json từ head và accounts (O(số member))."""
+        index = {"admins": self.head["admins"], "members": list(self.accounts.values())}
+        index.update((k, v) for k, v in self.head.items() if k != "admins")
+        DataManager.write_snapshot(index, os.path.join(self.root, "index.json"))
+        self.counts_stale = False
+
+    def close(self):
+        """Ghi số liên hệ mới nhất vào index nếu chưa được ghi."""
+        if self.counts_stale and self.head is not None: self.write_index()
+
+    def load_index(self):
+        """Đọc index.json và logs.json cũ (nếu còn)."""
+        with open(os.path.join(self.root, "index.json"), "r", encoding="utf-8") as f:
+            index = json.load(f)
+        logs = []
+        if os.path.exists(os.path.join(self.root, "logs.json")):
+            with open(os.path.join(self.root, "logs.json"), "r", encoding="utf-8") as f:
+                logs = json.load(f)
+        return index, logs
+
+    def load_shard(self, member_id):
+        path = self.shard_path(member_id)
+        if not os.path.exists(path): return {}
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    def save_all(self, admins, members, logs, next_member_id=None):
+        with self.lock:
+            self.dirty_members.clear()
+            self.deleted.update(set(self.accounts) - {m.member_id for m in members})
+        self.adopt(members)
+        self.save(admins, members, logs, next_member_id)
+
+    def load(self, lazy=False, progress=None):
+        """
+        Đọc index rồi từng shard (lazy: shard chỉ được đọc khi member được dùng). Nếu chưa
+        có index thì đọc file JSON cũ và đánh dấu mọi member cần ghi ra shard ở lần lưu đầu.
+
+        Returns:
+            tuple: (admins, members, logs, meta) giống DataManager.load_data.
+        """
+        if not self.exists():
+            loaded = JsonBackend().load(progress=progress)
+            self.adopt(loaded[1])
+            return loaded
+        index, logs = self.load_index()
+        self.head = {k: v for k, v in index.items() if k != "members"}
+        admins = [Admin(ad["admin_id"], ad["username"], ad["password"]) for ad in index.get("admins", [])]
+        members = []
+        entries = index.get("members", [])
+        for i, entry in enumerate(entries, 1):
+            if progress: progress(i, len(entries))
+            if lazy: members.append(DataManager.lazy_member(entry, self.load_shard))
+            else: members.append(DataManager.member_from_dict({**self.load_shard(entry["member_id"]), **entry}))
+            self.accounts[entry["member_id"]] = entry
+        meta = {k: index[k] for k in ("next_member_id",) if k in index}
+        return admins, members, logs, meta
+
+
+
+class SqliteBackend(StorageBackend):
+    """
+    Lưu dữ liệu vào một file SQLite (DB_FILE) bằng thư viện chuẩn sqlite3.
+
+    Mỗi loại đối tượng là một bảng, có chỉ mục theo username, contact_id, phone và
+    group_id. Mỗi thay đổi được chuyển thành câu lệnh theo dòng (INSERT OR REPLACE /
+    DELETE) và chờ trong hàng đợi; save() chạy cả hàng đợi trong một transaction.
+    Khi file chưa có dữ liệu, lần lưu đầu ghi toàn bộ (và load() đọc từ file JSON cũ nếu có).
+    Log hệ thống nằm ở file log riêng (system_log): bảng logs của phiên bản cũ chỉ còn được đọc
+    để chuyển sang đó, và bị xóa ở lần ghi toàn bộ tiếp theo.
+    """
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS meta (
+            key TEXT PRIMARY KEY, value INTEGER);
+        CREATE TABLE IF NOT EXISTS admins (
+            admin_id INTEGER PRIMARY KEY, username TEXT NOT NULL, password TEXT NOT NULL);
+        CREATE TABLE IF NOT EXISTS members (
+            member_id INTEGER PRIMARY KEY, username TEXT NOT NULL, password TEXT NOT NULL,
+            email TEXT, is_active INTEGER NOT NULL DEFAULT 1,
+            next_contact_id INTEGER NOT NULL DEFAULT 1, next_group_id INTEGER NOT NULL DEFAULT 1);
+        CREATE TABLE IF NOT EXISTS contacts (
+            member_id INTEGER NOT NULL, contact_id INTEGER NOT NULL, name TEXT NOT NULL,
+            phone TEXT NOT NULL, email TEXT, address TEXT, notes TEXT, last_viewed_at TEXT,
+            PRIMARY KEY (member_id, contact_id));
+        CREATE TABLE IF NOT EXISTS contact_groups (
+            member_id INTEGER NOT NULL, group_id INTEGER NOT NULL, group_name TEXT NOT NULL,
+            PRIMARY KEY (member_id, group_id));
+        CREATE TABLE IF NOT EXISTS memberships (
+            member_id INTEGER NOT NULL, contact_id INTEGER NOT NULL, group_id INTEGER NOT NULL,
+            added_at TEXT, PRIMARY KEY (member_id, contact_id, group_id));
+        CREATE INDEX IF NOT EXISTS idx_admins_username ON admins (username);
+        CREATE INDEX IF NOT EXISTS idx_members_username ON members (username);
+        CREATE INDEX IF NOT EXISTS idx_contacts_phone ON contacts (member_id, phone);
+        CREATE INDEX IF NOT EXISTS idx_memberships_group ON memberships (member_id, group_id);
+    """
+    MEMBER_TABLES = ("contacts", "contact_groups", "memberships", "members")
+    UPSERT = {
+        "admin": "INSERT OR REPLACE INTO admins VALUES (?, ?, ?)",
+        "member": "INSERT OR REPLACE INTO members VALUES (?, ?, ?, ?, ?, ?, ?)",
+        "contact": "INSERT OR REPLACE INTO contacts VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+        "group": "INSERT OR REPLACE INTO contact_groups VALUES (?, ?, ?)",
+        "link": "INSERT OR REPLACE INTO memberships VALUES (?, ?, ?, ?)",
+    }
+
+    def __init__(self, path=None):
+        self.path = path or DB_FILE
+        self.conn = None        # Mở khi dùng lần đầu
+        self.pending = []       # Các bản ghi thay đổi chưa ghi (cùng dạng bản ghi journal)
+        self.lock = threading.Lock()  # Bảo vệ pending và kết nối (có thể ghi từ luồng nền)
+        self.adopted = False    # Dữ liệu được nạp từ nguồn khác: lần lưu đầu ghi toàn bộ
+
+    def connect(self):
+        if self.conn is None:
+            self.conn = sqlite3.connect(self.path, check_same_thread=False)
+            self.conn.executescript(self.SCHEMA)
+        return self.conn
+
+    def exists(self):
+        if not os.path.exists(self.path): return False
+        with self.lock:
+            return self.connect().execute("SELECT 1 FROM meta WHERE key = 'next_member_id'").fetchone() is not None
+
+    # --- HÀNG ĐỢI THAY ĐỔI ---
+
+    def on_member_change(self, member, op, data):
+        """Listener gắn vào Member: đưa thay đổi vào hàng đợi."""
+        self.record(op, **self.change_fields(member, op, data))
+
+    def record(self, op, **fields):
+        with self.lock: self.pending.append({"op": op, **fields})
+
+    @staticmethod
+    def contact_row(mid, c):
+        return (mid, c["contact_id"], c["name"], c["phone"], c.get("email", ""),
+                c.get("address", ""), c.get("notes", ""), c.get("last_viewed_at"))
+
+    def insert_member(self, cur, m):
+        """Ghi một member cùng toàn bộ danh bạ, nhóm và liên kết của nó."""
+        mid = m["member_id"]
+        cur.execute(self.UPSERT["member"], (mid, m["username"], m["password"], m["email"],
+                                             int(m["is_active"]), m["next_contact_id"], m["next_group_id"]))
+        cur.executemany(self.UPSERT["contact"], [self.contact_row(mid, c) for c in m["contacts"]])
+        cur.executemany(self.UPSERT["group"], [(mid, g["group_id"], g["group_name"]) for g in m["groups"]])
+        cur.executemany(self.UPSERT["link"], [(mid, l["contact_id"], l["group_id"], l["added_at"])
+                                              for l in m["memberships"]])
+
+    def apply(self, cur, rec):
+        """Chuyển một bản ghi thay đổi thành câu lệnh theo dòng."""
+        op, mid = rec["op"], rec.get("member_id")
+        if op == "member":
+            m = rec["member"]
+            for table in self.MEMBER_TABLES:
+                cur.execute(f"DELETE FROM {table} WHERE member_id = ?", (m["member_id"],))
+            self.insert_member(cur, m)
+        elif op == "member_del":
+            for table in self.MEMBER_TABLES:
+                cur.execute(f"DELETE FROM {table} WHERE member_id = ?", (mid,))
+        elif op == "admin":
+            ad = rec["admin"]
+            cur.execute(self.UPSERT["admin"], (ad["admin_id"], ad["username"], ad["password"]))
+        elif op == "account":
+            a = rec["account"]
+            cur.execute("UPDATE members SET username = ?, password = ?, email = ?, is_active = ? WHERE member_id = ?",
+                        (a["username"], a["password"], a["email"], int(a["is_active"]), mid))
+        elif op == "contact":
+            c = rec["contact"]
+            cur.execute(self.UPSERT["contact"], self.contact_row(mid, c))
+            cur.execute("UPDATE members SET next_contact_id = MAX(next_contact_id, ?) WHERE member_id = ?",
+                        (c["contact_id"] + 1, mid))
+        elif op == "contact_del":
+            cur.execute("DELETE FROM contacts WHERE member_id = ? AND contact_id = ?", (mid, rec["contact_id"]))
+            cur.execute("DELETE FROM memberships WHERE member_id = ? AND contact_id = ?", (mid, rec["contact_id"]))
+        elif op == "group":
+            g = rec["group"]
+            cur.execute(self.UPSERT["group"], (mid, g["group_id"], g["group_name"]))
+            cur.execute("UPDATE members SET next_group_id = MAX(next_group_id, ?) WHERE member_id = ?",
+                        (g["group_id"] + 1, mid))
+        elif op == "group_del":
+            cur.execute("DELETE FROM contact_groups WHERE member_id = ? AND group_id = ?", (mid, rec["group_id"]))
+            cur.execute("DELETE FROM memberships WHERE member_id = ? AND group_id = ?", (mid, rec["group_id"]))
+        elif op == "link":
+            l = rec["membership"]
+            cur.execute(self.UPSERT["link"], (mid, l["contact_id"], l["group_id"], l["added_at"]))
+        elif op == "unlink":
+            cur.execute("DELETE FROM memberships WHERE member_id = ? AND contact_id = ? AND group_id = ?",
+                        (mid, rec["contact_id"], rec["group_id"]))
+
+    # --- GHI / ĐỌC ---
+
+    def save(self, admins, members, logs, next_member_id=None):
+        """Chạy các thay đổi đang chờ trong một transaction (lần đầu: ghi toàn bộ)."""
+        if self.adopted or not self.exists():
+            self.save_all(admins, members, logs, next_member_id)
+            return
+        with self.lock:
+            pending, self.pending = self.pending, []
+            conn = self.connect()
+            with conn:  # Một transaction: commit khi xong, rollback nếu lỗi
+                cur = conn.cursor()
+                for rec in pending: self.apply(cur, rec)
+                cur.executemany(self.UPSERT["admin"], [(a.admin_id, a.username, a.password) for a in admins])
+                if next_member_id is not None:
+                    cur.execute("INSERT OR REPLACE INTO meta VALUES ('next_member_id', ?)", (next_member_id,))
+        for mem in members: mem.dirty = False
+
+    def save_all(self, admins, members, logs, next_member_id=None):
+        if next_member_id is None:
+            next_member_id = max((m.member_id for m in members), default=100) + 1
+        # Xóa hàng đợi trước khi chụp: thay đổi xảy ra sau đó hoặc nằm trong bản chụp, hoặc
+        # còn trong hàng đợi (upsert theo ID nên áp dụng lại cũng không sai).
+        # Chụp member ngoài self.lock vì listener được gọi khi đang giữ member.lock.
+        with self.lock: self.pending.clear()
+        shards = []
+        for mem in members:
+            shards.append(DataManager.member_to_dict(mem))
+            mem.dirty = False
+        with self.lock:
+            conn = self.connect()
+            with conn:
+                cur = conn.cursor()
+                for table in ("admins", "meta") + self.MEMBER_TABLES:
+                    cur.execute(f"DELETE FROM {table}")
+                cur.execute("DROP TABLE IF EXISTS logs")  # Bảng log của phiên bản cũ
+                cur.executemany(self.UPSERT["admin"], [(a.admin_id, a.username, a.password) for a in admins])
+                for shard in shards: self.insert_member(cur, shard)
+                cur.execute("INSERT INTO meta VALUES ('next_member_id', ?)", (next_member_id,))
+            self.adopted = False
+
+    def read_members(self, conn, member_id=None):
+        """
+        Đọc member (tất cả, hoặc một member theo ID) cùng danh bạ, nhóm, liên kết.
+
+        Returns:
+            dict: member_id -> dict member (định dạng file JSON).
+        """
+        where, params = ("WHERE member_id = ?", (member_id,)) if member_id is not None else ("", ())
+        members = {}
+        for row in conn.execute(f"SELECT * FROM members {where} ORDER BY member_id", params):
+            mid, username, password, email, is_active, next_cid, next_gid = row
+            members[mid] = {
+                "member_id": mid, "username": username, "password": password, "email": email,
+                "is_active": bool(is_active), "next_contact_id": next_cid, "next_group_id": next_gid,
+                "contacts": [], "groups": [], "memberships": []
+            }
+        for mid, cid, name, phone, email, address, notes, viewed in conn.execute(
+                f"SELECT * FROM contacts {where} ORDER BY member_id, contact_id", params):
+            members[mid]["contacts"].append({
+                "contact_id": cid, "name": name, "phone": phone, "email": email,
+                "address": address, "notes": notes, "last_viewed_at": viewed
+            })
+        for mid, gid, group_name in conn.execute(
+                f"SELECT * FROM contact_groups {where} ORDER BY member_id, group_id", params):
+            members[mid]["groups"].append({"group_id": gid, "group_name": group_name})
+        for mid, cid, gid, added_at in conn.execute(f"SELECT * FROM memberships {where} ORDER BY rowid", params):
+            members[mid]["memberships"].append({"contact_id": cid, "group_id": gid, "added_at": added_at})
+        return members
+
+    def read_accounts(self, conn):
+        """Đọc thông tin tài khoản của mọi member kèm số liên hệ (không đọc danh bạ)."""
+        counts = dict(conn.execute("SELECT member_id, COUNT(*) FROM contacts GROUP BY member_id"))
+        return [{"member_id": mid, "username": username, "password": password, "email": email,
+                 "is_active": bool(is_active), "contact_count": counts.get(mid, 0)}
+                for mid, username, password, email, is_active in conn.execute(
+                    "SELECT member_id, username, password, email, is_active FROM members ORDER BY member_id")]
+
+    def fetch_member(self, member_id):
+        """Đọc danh bạ của một member (dùng cho Member.loader ở chế độ lazy)."""
+        with self.lock:
+            return self.read_members(self.connect(), member_id).get(member_id, {})
+
+    def load(self, lazy=False, progress=None):
+        """Đọc các bảng rồi khôi phục object (nếu chưa có dữ liệu thì đọc file JSON cũ)."""
+        if not self.exists():
+            loaded = JsonBackend().load(progress=progress)
+            self.adopted = bool(loaded[0] or loaded[1])
+            return loaded
+        with self.lock:
+            conn = self.connect()
+            admins = [Admin(*row) for row in conn.execute(
+                "SELECT admin_id, username, password FROM admins ORDER BY admin_id")]
+            if lazy:
+                members = [DataManager.lazy_member(entry, self.fetch_member) for entry in self.read_accounts(conn)]
+            else:
+                members = [DataManager.member_from_dict(m) for m in self.read_members(conn).values()]
+            logs = []  # Chỉ file của phiên bản cũ còn bảng logs
+            if conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'logs'").fetchone():
+                logs = [line for (line,) in conn.execute("SELECT line FROM logs ORDER BY log_id")]
+            meta = {"next_member_id": conn.execute(
+                "SELECT value FROM meta WHERE key = 'next_member_id'").fetchone()[0]}
+        return admins, members, logs, meta
+
+    def close(self):
+        with self.lock:
+            if self.conn is not None:
+                self.conn.close()
+                self.conn = None
+
+
+# Các chế độ lưu có thể chọn bằng DataManager.configure / biến môi trường PHONEBOOK_STORAGE
+BACKENDS = {
+    "json": JsonBackend,
+    "journal": Journal,
+    "sharded": ShardedStore,
+    "sqlite": SqliteBackend,
+    "binary": BinaryBackend,
+}
+
+DataManager.configure("json")
\ No newline at end of file
@@ -0,0 +1,310 @@
+"""
+Các cấu trúc chỉ mục dùng nội bộ bởi Member để tìm kiếm nhanh trên danh bạ lớn.
+"""
+import bisect
+import unicodedata
+from array import array
+
+
+def fold_text(text):
+    """
+    Chuẩn hóa chuỗi để tìm kiếm không phân biệt hoa thường và dấu tiếng Việt.
+
+    Ví dụ: "Bố" -> "bo", "Gia Đình" -> "gia dinh".
+    """
+    text = unicodedata.normalize("NFD", text.replace("đ", "d").replace("Đ", "D"))
+    return "".join(ch for ch in text if not unicodedata.combining(ch)).casefold()
+
+# ==========================================
+# 1. TRIGRAM INDEX (TÌM KIẾM CHUỖI CON)
+# ==========================================
+class TrigramIndex:
+    """
+    Chỉ mục đảo ngược theo trigram (3 ký tự liên tiếp) trên chuỗi đã chuẩn hóa.
+
+    Mỗi trigram trỏ tới danh sách contact_id chứa nó. Khi truy vấn, chỉ các
+    contact trong danh sách ngắn nhất mới được kiểm tra lại bằng phép so khớp
+    chuỗi con, nên chi phí tỉ lệ với số ứng viên thay vì toàn bộ danh bạ.
+    Xóa/sửa được xử lý kiểu "lazy": bản ghi cũ bị bỏ qua lúc kiểm tra và được
+    dọn khi số bản ghi cũ vượt quá số bản ghi còn hiệu lực.
+    """
+    N = 3
+
+    def __init__(self):
+        self.texts = {}     # Dict[int, str]: contact_id -> chuỗi đã chuẩn hóa
+        self.postings = {}  # Dict[str, array[int]]: trigram -> contact_ids (4 byte/ID)
+        self.live = 0       # Số bản ghi posting còn hiệu lực
+        self.stale = 0      # Số bản ghi posting đã lỗi thời
+
+    @classmethod
+    def grams(cls, text):
+        """Tập trigram của một chuỗi."""
+        return {text[i:i + cls.N] for i in range(len(text) - cls.N + 1)}
+
+    def add(self, key, text):
+        """Thêm (hoặc thay thế) chuỗi của một khóa."""
+        if key in self.texts: self.remove(key)
+        self.texts[key] = text
+        grams = self.grams(text)
+        for g in grams:
+            self.postings.setdefault(g, array("i")).append(key)
+        self.live += len(grams)
+
+    def remove(self, key):
+        """Gỡ một khóa khỏi chỉ mục."""
+        text = self.texts.pop(key, None)
+        if text is None: return
+        n = len(self.grams(text))
+        self.live -= n
+        self.stale += n
+        if self.stale > max(self.live, 1024): self.compact()
+
+    def compact(self):
+        """Dựng lại postings, loại bỏ các bản ghi lỗi thời."""
+        texts = self.texts
+        self.texts, self.postings, self.live, self.stale = {}, {}, 0, 0
+        for key, text in texts.items(): self.add(key, text)
+
+    def search(self, query):
+        """
+        Tìm các khóa có chuỗi chứa query (query đã chuẩn hóa).
+
+        Returns:
+            list[int]: Danh sách khóa khớp, sắp xếp tăng dần.
+        """
+        texts = self.texts
+        if len(query) < self.N:
+            # Truy vấn quá ngắn để có trigram: quét các chuỗi đã chuẩn hóa sẵn.
+            return sorted(k for k, t in texts.items() if query in t)
+        lists = [self.postings.get(g) for g in self.grams(query)]
+        if not all(lists): return []
+        candidates = min(lists, key=len)
+        found = {k for k in candidates if k in texts and query in texts[k]}
+        return sorted(found)
+
+
+# ==========================================
+# 2. PREFIX INDEX (GỢI Ý KHI ĐANG GÕ)
+# ==========================================
+class PrefixIndex:
+    """
+    Hai mảng song song (chuỗi đã chuẩn hóa, khóa) luôn được sắp xếp theo (chuỗi, khóa),
+    dùng cho gợi ý theo tiền tố.
+
+    Truy vấn dùng tìm kiếm nhị phân tới vị trí đầu tiên có tiền tố rồi đọc tối đa
+    k phần tử liên tiếp: O(|prefix| * log n + k). Thêm/xóa là một lần chèn/xóa
+    trong mảng (memmove), rẻ hơn nhiều so với sắp xếp lại mỗi lần gõ phím.
+    Không dùng tuple cho từng phần tử để tiết kiệm bộ nhớ.
+    """
+    def __init__(self, items=()):
+        """
+        Args:
+            items (iterable[tuple[int, str]]): Các cặp (khóa, chuỗi) ban đầu.
+        """
+        self.texts = dict(items)  # Dict[int, str]
+        pairs = sorted((t, k) for k, t in self.texts.items())
+        self.words = [t for t, _ in pairs]          # List[str]
+        self.keys = array("i", (k for _, k in pairs))  # array[int]
+
+    def _position(self, key, text):
+        """Vị trí của (text, key) trong mảng đã sắp xếp."""
+        lo = bisect.bisect_left(self.words, text)
+        hi = bisect.bisect_right(self.words, text, lo)
+        return bisect.bisect_left(self.keys, key, lo, hi)
+
+    def add(self, key, text):
+        """Thêm (hoặc thay thế) chuỗi của một khóa."""
+        if key in self.texts: self.remove(key)
+        self.texts[key] = text
+        i = self._position(key, text)
+        self.words.insert(i, text)
+        self.keys.insert(i, key)
+
+    def remove(self, key):
+        """Gỡ một khóa khỏi chỉ mục."""
+        text = self.texts.pop(key, None)
+        if text is None: return
+        i = self._position(key, text)
+        del self.words[i]
+        del self.keys[i]
+
+    def complete(self, prefix, limit=10):
+        """
+        Lấy tối đa `limit` khóa có chuỗi bắt đầu bằng prefix, theo thứ tự từ điển.
+
+        Returns:
+            list[int]: Danh sách khóa.
+        """
+        words = self.words
+        i = bisect.bisect_left(words, prefix)
+        j = i
+        end = min(len(words), i + limit)
+        while j < end and words[j].startswith(prefix):
+            j += 1
+        return self.keys[i:j].tolist()
+
+# ==========================================
+# 3. PHONE INDEX (TRA NGƯỢC SỐ ĐIỆN THOẠI)
+# ==========================================
+COUNTRY_CODE = "84"
+
+def normalize_phone(phone, country_code=COUNTRY_CODE):
+    """
+    Chuẩn hóa số điện thoại về dạng chỉ gồm chữ số, bỏ tiền tố quốc tế/quốc gia.
+
+    Ví dụ: "+84 90 111 2233", "0084901112233" và "090 111 2233" đều thành "901112233".
+
+    Args:
+        phone (str): Số điện thoại gốc.
+        country_code (str): Mã quốc gia mặc định.
+
+    Returns:
+        str: Chuỗi chữ số đã chuẩn hóa.
+    """
+    phone = phone.strip()
+    international = phone.startswith("+")
+    digits = "".join(ch for ch in phone if ch.isdigit())
+    if digits.startswith("00"):
+        international, digits = True, digits[2:]
+    if international and digits.startswith(country_code):
+        digits = digits[len(country_code):]
+    if digits.startswith("0"):
+        digits = digits[1:]
+    return digits
+
+
+class PhoneIndex:
+    """
+    Chỉ mục tra ngược số điện thoại trên khóa đã chuẩn hóa.
+
+    - Tra chính xác: dict số chuẩn hóa -> tập khóa, O(1).
+    - Tra theo N chữ số cuối: PrefixIndex trên chuỗi số đảo ngược, O(log n + k).
+    """
+    def __init__(self, items=()):
+        """
+        Args:
+            items (iterable[tuple[int, str]]): Các cặp (khóa, số điện thoại gốc).
+        """
+        self.exact = {}     # Dict[str, Tuple[int]]: số chuẩn hóa -> khóa (tuple nhỏ hơn set nhiều)
+        numbers = []
+        for key, phone in items:
+            number = normalize_phone(phone)
+            numbers.append((key, number[::-1]))
+            self.exact[number] = self.exact.get(number, ()) + (key,)
+        # Số đảo ngược theo khóa; reversed.texts cũng là nơi tra số hiện tại của một khóa
+        self.reversed = PrefixIndex(numbers)
+
+    def add(self, key, phone):
+        """Thêm (hoặc thay thế) số điện thoại của một khóa."""
+        if key in self.reversed.texts: self.remove(key)
+        number = normalize_phone(phone)
+        self.exact[number] = self.exact.get(number, ()) + (key,)
+        self.reversed.add(key, number[::-1])
+
+    def remove(self, key):
+        """Gỡ một khóa khỏi chỉ mục."""
+        rev = self.reversed.texts.get(key)
+        if rev is None: return
+        number = rev[::-1]
+        bucket = tuple(k for k in self.exact[number] if k != key)
+        if bucket: self.exact[number] = bucket
+        else: del self.exact[number]
+        self.reversed.remove(key)
+
+    def lookup(self, phone):
+        """Các khóa có số trùng khớp chính xác (sau chuẩn hóa), sắp xếp tăng dần."""
+        return sorted(self.exact.get(normalize_phone(phone), ()))
+
+    def lookup_suffix(self, digits, limit=10):
+        """Tối đa `limit` khóa có số kết thúc bằng các chữ số cho trước."""
+        digits = "".join(ch for ch in digits if ch.isdigit())
+        if not digits: return []
+        return self.reversed.complete(digits[::-1], limit)
+
+# ==========================================
+# 4. BK-TREE (TÌM KIẾM GẦN ĐÚNG, CHỊU LỖI GÕ)
+# ==========================================
+def edit_distance(a, b):
+    """Khoảng cách Levenshtein giữa hai chuỗi (quy hoạch động trên một hàng)."""
+    if a == b: return 0
+    if len(a) < len(b): a, b = b, a
+    if not b: return len(a)
+    prev = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        cur = [i]
+        left = i
+        for j, cb in enumerate(b):
+            # Tránh gọi min() trong vòng lặp trong cùng: nhanh hơn ~2.5 lần
+            up = prev[j + 1] + 1
+            diag = prev[j] + (ca != cb)
+            left += 1
+            if up < left: left = up
+            if diag < left: left = diag
+            cur.append(left)
+        prev = cur
+    return prev[-1]
+
+
+class BKTree:
+    """
+    Cây BK theo khoảng cách Levenshtein, mỗi nút là một chuỗi và tập khóa mang chuỗi đó.
+
+    Truy vấn trong bán kính k chỉ đi vào các nhánh con có khoảng cách nằm trong
+    [d - k, d + k] (bất đẳng thức tam giác), nên bỏ qua phần lớn cây thay vì tính
+    khoảng cách với mọi tên. Khi xóa, nút được giữ lại nhưng tập khóa rỗng.
+    """
+    def __init__(self, items=()):
+        """
+        Args:
+            items (iterable[tuple[int, str]]): Các cặp (khóa, chuỗi) ban đầu.
+        """
+        self.root = None    # [chuỗi, Set[khóa], Dict[int, nút con]]
+        self.nodes = {}     # Dict[str, nút]: tra nhanh nút theo chuỗi
+        self.texts = {}     # Dict[int, str]
+        for key, text in items: self.add(key, text)
+
+    def add(self, key, text):
+        """Thêm (hoặc thay thế) chuỗi của một khóa."""
+        if key in self.texts: self.remove(key)
+        self.texts[key] = text
+        node = self.nodes.get(text)
+        if node is None:
+            node = [text, set(), {}]
+            self.nodes[text] = node
+            if self.root is None:
+                self.root = node
+            else:
+                cur = self.root
+                while True:
+                    d = edit_distance(text, cur[0])
+                    child = cur[2].get(d)
+                    if child is None:
+                        cur[2][d] = node
+                        break
+                    cur = child
+        node[1].add(key)
+
+    def remove(self, key):
+        """Gỡ một khóa khỏi cây."""
+        text = self.texts.pop(key, None)
+        if text is not None: self.nodes[text][1].discard(key)
+
+    def search(self, query, max_distance):
+        """
+        Tìm các khóa có chuỗi cách query không quá max_distance.
+
+        Returns:
+            list[tuple[int, int]]: Các cặp (khoảng cách, khóa), gần nhất trước.
+        """
+        found = []
+        stack = [self.root] if self.root else []
+        while stack:
+            text, keys, children = stack.pop()
+            d = edit_distance(query, text)
+            if d <= max_distance:
+                found.extend((d, k) for k in keys)
+            for cd, child in children.items():
+                if d - max_distance <= cd <= d + max_distance:
+                    stack.append(child)
+        found.sort()
+        return found
\ No newline at end of file
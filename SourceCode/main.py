@@ -1,44 +1,262 @@
+import os
 import sys
+import csv
+import argparse
 import datetime
-from models import Member, Admin
-from data import DataManager
+import threading
+from models import Member, Admin, IdSequence
+from auth import AuthService, AuthBusyError, AUTH_WORKERS, AUTH_MAX_PENDING
+from data import DataManager, DataLoadError, WriteBehindFlusher, FLUSH_BATCH_SIZE, STREAM_CHUNK_SIZE
+from system_log import SystemLog
+from contact_import import import_file
+from contact_export import export_file
 
 class PhoneBookSystem:
     """
     Lớp chính điều khiển luồng hoạt động của ứng dụng (Controller).
     """
-    def __init__(self):
-        """Khởi tạo hệ thống, tải dữ liệu từ file."""
+    member_type, admin_type = Member, Admin  # Kiểu tài khoản trả về từ authenticate (server.py kiểm tra quyền)
+
+    def __init__(self, storage=None, flush_interval=None, flush_batch=None, lazy=None, echo=True):
+        """
+        Khởi tạo hệ thống, tải dữ liệu từ file.
+
+        Args:
+            storage (str, optional): Chế độ lưu ("json" | "journal" | "sharded" | "sqlite" | "binary"), mặc định lấy từ
+                biến môi trường PHONEBOOK_STORAGE hoặc "json".
+            flush_interval (float, optional): > 0 để bật ghi trễ: lưu ở luồng nền tối đa
+                một lần mỗi flush_interval giây (mặc định PHONEBOOK_FLUSH_INTERVAL hoặc 0 = lưu ngay).
+            flush_batch (int, optional): Ghi trễ: số thay đổi tích lũy để lưu ngay
+                (mặc định PHONEBOOK_FLUSH_BATCH hoặc 50).
+            lazy (bool, optional): Chỉ nạp danh sách tài khoản lúc khởi động; danh bạ của
+                member được nạp khi đăng nhập hoặc khi admin xem (mặc định PHONEBOOK_LAZY=1,
+                chỉ có tác dụng với chế độ lưu "sharded" và "sqlite").
+            echo (bool): In các thông báo của Member (menu console), False để bỏ qua (server.py).
+        Xác thực mật khẩu chạy trên pool của AuthService (PHONEBOOK_AUTH_WORKERS luồng, tối đa
+        PHONEBOOK_AUTH_MAX_PENDING yêu cầu chờ; hệ số PBKDF2 đặt bằng PHONEBOOK_PBKDF2_ITERATIONS).
+
+        Raises:
+            DataLoadError: File dữ liệu tồn tại nhưng không đọc được (không tự tạo dữ liệu mẫu đè lên).
+        """
+        DataManager.configure(storage or os.environ.get("PHONEBOOK_STORAGE", "json"))
         self.members = []
         self.admins = []
-        self.logs = [] 
+        # Log hệ thống ghi vào file log riêng; self.logs là bộ đệm vòng các dòng gần nhất
+        self.system_log = SystemLog()
+        self.logs = self.system_log.recent
         self.current_user = None
+        self.session = None  # Token phiên của người đang đăng nhập
+        self.echo = echo
+        self.member_ids = IdSequence(101)
+        self.lock = threading.RLock()  # Giữ khi thay đổi danh sách admins/members
+        self.save_lock = threading.Lock()  # Giữ trong suốt một lần lưu
+        # Bản đồ tra cứu tài khoản O(1), luôn đồng bộ với self.members / self.admins
+        self.members_by_name = {}  # Dict[str, Member]
+        self.members_by_id = {}    # Dict[int, Member]
+        self.admins_by_name = {}   # Dict[str, Admin]
+        self.member_snapshot = None  # tuple các Member cho luồng đọc, dựng lại sau khi danh sách đổi
+        self.auth = AuthService(
+            workers=int(os.environ.get("PHONEBOOK_AUTH_WORKERS", AUTH_WORKERS)),
+            max_pending=int(os.environ.get("PHONEBOOK_AUTH_MAX_PENDING", AUTH_MAX_PENDING)),
+            on_upgrade=self.on_password_upgrade)
+        self.load_percent = -1
+        self.flusher = None
         
-        loaded_admins, loaded_members, loaded_logs = DataManager.load_data()
-        self.logs = loaded_logs if loaded_logs else []
+        if lazy is None: lazy = os.environ.get("PHONEBOOK_LAZY", "0") == "1"
+        loaded_admins, loaded_members, loaded_logs, meta = DataManager.load_data(lazy, self.show_load_progress)
+        # Dữ liệu cũ còn log trong file dữ liệu: chuyển sang file log một lần
+        self.system_log.adopt(loaded_logs)
 
         if loaded_admins or loaded_members:
             self.admins = loaded_admins
             self.members = loaded_members
+            self.member_ids.next_id = meta.get("next_member_id", 101)
+            if self.members: self.member_ids.observe(max(m.member_id for m in self.members))
+            self.index_accounts()
         else:
             print(">> Khởi tạo dữ liệu mẫu...")
             self.load_dummy_data()
+            self.index_accounts()
             self.save_changes()
 
+        if flush_interval is None: flush_interval = float(os.environ.get("PHONEBOOK_FLUSH_INTERVAL", 0))
+        if flush_batch is None: flush_batch = int(os.environ.get("PHONEBOOK_FLUSH_BATCH", FLUSH_BATCH_SIZE))
+        if flush_interval > 0:
+            self.flusher = WriteBehindFlusher(self.flush_now, flush_interval, flush_batch)
+
+    # --- TRA CỨU TÀI KHOẢN ---
+
+    def index_accounts(self):
+        """Dựng lại các bản đồ username/member_id -> tài khoản từ danh sách hiện có."""
+        with self.lock:
+            self.members_by_name = {m.username: m for m in self.members}
+            self.members_by_id = {m.member_id: m for m in self.members}
+            self.admins_by_name = {a.username: a for a in self.admins}
+            self.member_snapshot = None
+            if not self.echo:
+                for m in self.members: m.echo = None
+
+    def list_members(self):
+        """
+        Danh sách Member (tuple bất biến) cho các màn hình chỉ đọc.
+        Bản chụp được dùng lại cho đến lần thêm/xóa tài khoản tiếp theo nên đọc không chặn luồng ghi.
+        """
+        snap = self.member_snapshot
+        if snap is None:
+            with self.lock: snap = self.member_snapshot = tuple(self.members)
+        return snap
+
+    def find_member(self, username):
+        """Tìm Member theo username trong O(1). Trả về None nếu không có."""
+        return self.members_by_name.get(username)
+
+    def get_member(self, member_id):
+        """Tìm Member theo ID trong O(1). Trả về None nếu không có."""
+        return self.members_by_id.get(member_id)
+
+    def find_admin(self, username):
+        """Tìm Admin theo username trong O(1). Trả về None nếu không có."""
+        return self.admins_by_name.get(username)
+
+    def add_member(self, mem):
+        """Thêm tài khoản Member mới vào hệ thống và báo cho backend lưu trữ."""
+        if not self.echo: mem.echo = None
+        with self.lock:
+            self.members.append(mem)
+            self.members_by_name[mem.username] = mem
+            self.members_by_id[mem.member_id] = mem
+            self.member_snapshot = None
+            DataManager.record("member", member=DataManager.member_to_dict(mem))
+
+    def remove_member(self, mem):
+        """Xóa tài khoản Member khỏi hệ thống và báo cho backend lưu trữ."""
+        with self.lock:
+            self.members.remove(mem)
+            self.members_by_name.pop(mem.username, None)
+            self.members_by_id.pop(mem.member_id, None)
+            self.member_snapshot = None
+            DataManager.record("member_del", member_id=mem.member_id)
+        self.auth.sessions.revoke_account(mem)
+
+    def on_password_upgrade(self, account):
+        """Hash mật khẩu cũ vừa được băm lại khi đăng nhập (gọi từ luồng của AuthService)."""
+        # Member tự báo thay đổi qua Member.listener; Admin không có listener nên báo ở đây
+        if isinstance(account, Admin):
+            DataManager.record("admin", admin={"admin_id": account.admin_id, "username": account.username,
+                                               "password": account.password})
+
+    def create_member(self, username, password, email=""):
+        """
+        Tạo tài khoản Member mới (mật khẩu được băm trên pool xác thực) và lưu.
+
+        Returns:
+            Member | None: Member vừa tạo, None nếu username đã tồn tại.
+
+        Raises:
+            AuthBusyError: Pool xác thực đang quá tải.
+        """
+        if self.find_member(username): return None
+        hashed = self.auth.hash_password(password).result()
+        with self.lock:  # Kiểm tra lại: username có thể vừa được tạo trong lúc băm
+            if self.find_member(username): return None
+            mem = Member(self.member_ids.allocate(), username, hashed, email)
+            self.add_member(mem)
+        self.save_changes()
+        return mem
+
+    def login_account(self, username, password, role="member"):
+        """
+        Đăng nhập Member hoặc Admin (tính hash trên pool xác thực).
+
+        Returns:
+            tuple: (tài khoản, token phiên) nếu đúng, (None, None) nếu sai.
+
+        Raises:
+            AuthBusyError: Pool xác thực đang quá tải.
+        """
+        account = self.find_admin(username) if role == "admin" else self.find_member(username)
+        before = account.password if account else None
+        token = self.auth.login(account, password)
+        if not token: return None, None
+        if account.password != before: self.save_changes()  # Hash cũ vừa được nâng cấp
+        if role != "admin": account.ensure_loaded()
+        return account, token
+
+    def authenticate(self, token):
+        """Tài khoản ứng với token phiên còn hạn (không tính lại hash), None nếu không hợp lệ."""
+        return self.auth.authenticate(token)
+
+    def end_session(self, token):
+        """Hủy token phiên."""
+        self.auth.logout(token)
+
+    def logout(self):
+        """Đăng xuất: hủy token phiên hiện tại."""
+        if self.session: self.end_session(self.session)
+        self.current_user = None
+        self.session = None
+
+    def show_load_progress(self, done, total):
+        """In tiến độ nạp dữ liệu khi dữ liệu lớn (mỗi phần trăm in một lần)."""
+        if total < STREAM_CHUNK_SIZE: return
+        percent = done * 100 // total
+        if percent == self.load_percent: return
+        self.load_percent = percent
+        print(f"\r>> Đang tải dữ liệu... {percent}%", end="\n" if done >= total else "", flush=True)
+
     def write_log(self, message):
         """Ghi log hệ thống."""
         now = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        self.logs.append(f"[{now}] {message}")
-        if len(self.logs) > 100: self.logs.pop(0)
+        line = f"[{now}] {message}"
+        self.system_log.write(line)
+
+    def show_logs(self, page_size=20):
+        """Xem log hệ thống theo trang (trang 1 là mới nhất), đọc từ bộ đệm vòng hoặc file log."""
+        page = 0
+        while True:
+            lines = self.system_log.page(page, page_size)
+            print(f"\n--- SYSTEM LOGS (Trang {page + 1}) ---")
+            if not lines: print("(Trống)")
+            for line in lines: print(line)
+            c = input("n: Cũ hơn | p: Mới hơn | Enter: Quay lại: ").strip().lower()
+            if c == 'n':
+                if len(lines) == page_size: page += 1
+                else: print("⚠️ Đã đến trang cuối.")
+            elif c == 'p':
+                if page > 0: page -= 1
+                else: print("⚠️ Đang ở trang mới nhất.")
+            else: break
 
     def save_changes(self):
-        """Lưu thay đổi xuống file."""
-        DataManager.save_data(self.admins, self.members, self.logs)
+        """Lưu thay đổi xuống file (ở chế độ ghi trễ chỉ đánh dấu, luồng nền sẽ lưu sau)."""
+        if self.flusher: self.flusher.mark_dirty()
+        else: self.flush_now()
+
+    def flush_now(self):
+        """Chụp snapshot nhất quán của dữ liệu rồi lưu ngay. Trả về False nếu lưu lỗi."""
+        # Các lần lưu từ nhiều luồng chạy lần lượt, mỗi lần chụp ngay trước khi ghi,
+        # nên bản cũ không ghi đè bản mới hơn
+        with self.save_lock:
+            with self.lock:
+                admins, members = list(self.admins), list(self.members)
+                next_member_id = self.member_ids.next_id
+            # Từng member được chụp khi giữ khóa đọc của nó (xem DataManager.member_to_dict).
+            # Log nằm ở file log riêng nên không làm lớn file dữ liệu.
+            return DataManager.save_data(admins, members, [], next_member_id)
+
+    def shutdown(self):
+        """Ghi nốt mọi thay đổi còn chờ và dừng các luồng nền."""
+        if self.flusher:
+            self.flusher.close()
+            self.flusher = None
+        self.auth.close()
+        self.system_log.close()
+        DataManager.close()
 
     def load_dummy_data(self):
         """Tạo dữ liệu mẫu nếu chạy lần đầu."""
         self.admins.append(Admin(1, "admin", "123456"))
-        mem = Member(101, "sinhvien", "123", "sv@email.com")
+        mem = Member(self.member_ids.allocate(), "sinhvien", "123", "sv@email.com")
         mem.add_contact("Bố", "090111", "dad@email.com", "Home", "Gia đình")
         mem.create_group("Gia Đình")
         self.members.append(mem)
@@ -59,6 +277,7 @@ class PhoneBookSystem:
             elif c == '3': 
                 self.write_log("System shutdown.")
                 self.save_changes()
+                self.shutdown()
                 sys.exit()
 
     # --- CẬP NHẬT: XỬ LÝ LOGIN MEMBER CÓ THÔNG BÁO ---
@@ -67,11 +286,13 @@ class PhoneBookSystem:
         u = input("User: ")
         p = input("Pass: ")
         
-        user = next((m for m in self.members if m.username == u), None)
-        
-        # Kiểm tra login
-        if user and user.login(p):
+        # Kiểm tra login (tính hash trên pool xác thực)
+        try: user, token = self.login_account(u, p)
+        except AuthBusyError as e:
+            print(f"⚠️ {e}"); return
+        if token:
             self.current_user = user
+            self.session = token
             print(f"\n✅ Đăng nhập thành công! Xin chào {u}.")
             self.write_log(f"Member '{u}' login.")
             self.member_dashboard()
@@ -88,10 +309,12 @@ class PhoneBookSystem:
         u = input("User: ")
         p = input("Pass: ")
         
-        admin = next((a for a in self.admins if a.username == u), None)
-        
-        if admin and admin.login(p):
+        try: admin, token = self.login_account(u, p, "admin")
+        except AuthBusyError as e:
+            print(f"⚠️ {e}"); return
+        if token:
             self.current_user = admin
+            self.session = token
             print(f"\n✅ Đăng nhập thành công! Xin chào Admin {u}.")
             self.write_log(f"Admin '{u}' login.")
             self.admin_dashboard()
@@ -110,33 +333,37 @@ class PhoneBookSystem:
             print("2. Tạo tài khoản Member")
             print("3. Xóa tài khoản Member")
             print("4. 📜 Xem System Log") 
+            print("5. Xem danh bạ của Member")
+            print("6. 📤 Xuất danh bạ của Member")
             print("0. Đăng xuất")
             
             c = input("👉 Admin: ")
             
             if c == '1':
                 print("\n--- USER LIST ---")
-                for m in self.members:
-                    print(f"ID: {m.member_id} | User: {m.username} | Contacts: {len(m.contacts)}")
+                for m in self.list_members():
+                    print(f"ID: {m.member_id} | User: {m.username} | Contacts: {m.contact_count}")
             
             elif c == '2':
                 u = input("User mới: ")
-                if any(m.username == u for m in self.members):
+                if self.find_member(u):
                     print("⚠️ Trùng tên."); continue
                 p = input("Pass: "); e = input("Email: ")
-                new_id = 101 if not self.members else max(m.member_id for m in self.members) + 1
-                self.members.append(Member(new_id, u, p, e))
+                try: created = self.create_member(u, p, e)
+                except AuthBusyError as err:
+                    print(f"⚠️ {err}"); continue
+                if created is None:
+                    print("⚠️ Trùng tên."); continue
                 self.write_log(f"Admin created user {u}.")
-                self.save_changes()
                 print(f"✅ Đã tạo user {u} thành công.")
                 
             elif c == '3':
                 try:
                     mid = int(input("ID User xóa: "))
-                    t = next((m for m in self.members if m.member_id == mid), None)
+                    t = self.get_member(mid)
                     if t:
                         if input(f"Sure to delete {t.username}? (y/n): ")=='y':
-                            self.members.remove(t)
+                            self.remove_member(t)
                             self.write_log(f"Admin deleted user {t.username}.")
                             self.save_changes()
                             print("✅ Đã xóa thành công.")
@@ -145,13 +372,30 @@ class PhoneBookSystem:
                 except: pass
 
             elif c == '4':
-                print("\n--- SYSTEM LOGS ---")
-                if not self.logs: print("(Trống)")
-                for line in self.logs: print(line)
-                input("Enter để quay lại...")
+                self.show_logs()
+
+            elif c == '5':
+                try:
+                    mid = int(input("ID User: "))
+                    t = self.get_member(mid)
+                    if t:
+                        snap = t.snapshot()
+                        print(f"\n--- Danh bạ của {t.username} ({len(snap.contacts)}) ---")
+                        for ct in snap.contacts: print(f"[{ct.contact_id}] {ct.name} - {ct.phone}")
+                        print(f"Nhóm: {', '.join(g.group_name for g in snap.groups) or '(Trống)'}")
+                    else:
+                        print("❌ Không tìm thấy User ID này.")
+                except ValueError: print("❌ ID phải là số.")
+
+            elif c == '6':
+                try:
+                    t = self.get_member(int(input("ID User: ")))
+                    if t: self.export_contacts_menu(t)
+                    else: print("❌ Không tìm thấy User ID này.")
+                except ValueError: print("❌ ID phải là số.")
             
             elif c == '0':
-                self.current_user = None; break
+                self.logout(); break
 
     # --- MEMBER DASHBOARD ---
     def member_dashboard(self):
@@ -165,6 +409,8 @@ class PhoneBookSystem:
             print("4. Xóa liên hệ")
             print("5. Xem Recent (Vừa truy cập)")
             print("9. 🔍 Tìm kiếm tên (Smart Search)")
+            print("10. 📥 Nhập danh bạ (CSV/vCard)")
+            print("11. 📤 Xuất danh bạ (CSV/vCard/JSONL)")
             print("--- GROUP ---")
             print("6. Tạo Nhóm (Create)")
             print("7. Xóa Nhóm (Delete)")
@@ -174,9 +420,10 @@ class PhoneBookSystem:
             c = input("👉 Chọn: ")
 
             if c == '1': # VIEW ALL
-                print(f"--- Danh bạ ({len(self.current_user.contacts)}) ---")
+                contacts = self.current_user.snapshot().contacts
+                print(f"--- Danh bạ ({len(contacts)}) ---")
                 print(f"{'ID':<5} {'Tên':<20} {'SĐT':<15}")
-                for ct in self.current_user.contacts: 
+                for ct in contacts: 
                     print(f"{ct.contact_id:<5} {ct.name:<20} {ct.phone:<15}")
                 input("Nhấn Enter để tiếp tục...")
 
@@ -230,6 +477,10 @@ class PhoneBookSystem:
                 
                 if not res:
                     print("❌ Không thấy.")
+                    similar = self.current_user.fuzzy_search_contacts(kw)
+                    if similar:
+                        print("💡 Có phải bạn muốn tìm:")
+                        for ct in similar: print(f"ID: {ct.contact_id} | {ct.name} | {ct.phone}")
                 elif len(res) == 1:
                     target = res[0]
                     print(f"✅ Tìm thấy: {target.name} - {target.phone}")
@@ -245,6 +496,12 @@ class PhoneBookSystem:
                             self.save_changes()
                             input("Nhấn Enter để tiếp tục...")
 
+            elif c == '10': # BULK IMPORT
+                self.import_contacts_menu()
+
+            elif c == '11': # EXPORT
+                self.export_contacts_menu(self.current_user)
+
             elif c == '6': # CREATE GROUP
                 self.current_user.create_group(input("Tên nhóm: "))
                 self.save_changes()
@@ -261,7 +518,46 @@ class PhoneBookSystem:
                 self.group_management_menu()
 
             elif c == '0':
-                self.current_user = None; break
+                self.logout(); break
+
+    def import_contacts_menu(self):
+        """Nhập danh bạ từ file CSV/vCard, lưu xuống file sau mỗi lô."""
+        path = input("Đường dẫn file (.csv / .vcf): ").strip().strip('"')
+        group = input("Gán vào nhóm (Enter bỏ qua): ").strip() or None
+        saved = 0  # Số liên hệ của các lô đã lưu
+        def on_batch(report):
+            nonlocal saved
+            saved = report.imported
+            print(f"\r>> Đã nhập {report.imported} liên hệ...", end="", flush=True)
+            self.save_changes()
+        try:
+            report = import_file(self.current_user, path, group=group, on_batch=on_batch)
+        except OSError as e:
+            print(f"❌ Không mở được file: {e}")
+            return
+        except (csv.Error, ValueError) as e:  # File hỏng (csv.Error có số dòng), lỗi giải mã...
+            print(f"\n❌ File không hợp lệ: {e}")
+            if saved: print(f"⚠️ {saved} liên hệ ở các lô trước dòng lỗi đã được nhập.")
+            self.write_log(f"{self.current_user.username} import failed after {saved} contacts.")
+            return
+        print(f"\n✅ Đã nhập {report.imported} liên hệ, bỏ qua {report.rejected} dòng lỗi.")
+        for line, reason in report.errors[:5]: print(f"⚠️ Dòng {line}: {reason}")
+        if report.rejected > 5: print(f"... và {report.rejected - 5} dòng lỗi khác.")
+        self.write_log(f"{self.current_user.username} imported {report.imported} contacts.")
+
+    def export_contacts_menu(self, member):
+        """Xuất danh bạ của member ra file; định dạng theo phần mở rộng (.csv / .vcf / .jsonl)."""
+        path = input("Lưu vào file (.csv / .vcf / .jsonl): ").strip().strip('"')
+        if not path:
+            print("⚠️ Chưa nhập tên file."); return
+        try:
+            count = export_file(member, path)
+        except OSError as e:
+            print(f"❌ Không ghi được file: {e}")
+            return
+        print(f"✅ Đã xuất {count} liên hệ ra {path}.")
+        who = "Admin" if self.current_user is not member else member.username
+        self.write_log(f"{who} exported {count} contacts of {member.username}.")
 
     def group_management_menu(self):
         """Menu quản lý chi tiết thành viên trong nhóm."""
@@ -302,6 +598,36 @@ class PhoneBookSystem:
             
             if changed: self.save_changes()
 
+def open_system(shards=None, quiet=False, **kwargs):
+    """
+    Mở hệ thống một tiến trình (PhoneBookSystem) hoặc nhiều tiến trình (cluster.ClusterSystem).
+
+    Args:
+        shards (int, optional): Số tiến trình shard, mặc định lấy từ biến môi trường PHONEBOOK_SHARDS
+            hoặc 0 = chạy một tiến trình.
+        quiet (bool): Không in các thông báo của Member, kể cả các dòng in trong shard (server.py).
+        **kwargs: Tham số của PhoneBookSystem (storage, flush_interval...).
+
+    Raises:
+        DataLoadError: File dữ liệu tồn tại nhưng không đọc được.
+        ValueError: Thư mục cụm đã được tạo với số shard khác.
+    """
+    if shards is None: shards = int(os.environ.get("PHONEBOOK_SHARDS", 0))
+    if shards > 0:
+        from cluster import ClusterSystem  # cluster import main: chỉ nạp khi cần
+        return ClusterSystem(shards, kwargs.get("storage"), kwargs.get("flush_interval"), echo=not quiet)
+    return PhoneBookSystem(echo=not quiet, **kwargs)
+
+
 if __name__ == "__main__":
-    app = PhoneBookSystem()
+    parser = argparse.ArgumentParser(description="Phone Book System")
+    parser.add_argument("--shards", type=int, default=None,
+                        help="Số tiến trình shard (mặc định PHONEBOOK_SHARDS hoặc 0 = một tiến trình)")
+    args = parser.parse_args()
+    try:
+        app = open_system(args.shards)
+    except (DataLoadError, ValueError) as e:
+        print(f"❌ {e}")
+        print("💡 Hãy kiểm tra hoặc khôi phục file dữ liệu. Chương trình dừng để không ghi đè dữ liệu cũ.")
+        sys.exit(1)
     app.main_menu()
\ No newline at end of file
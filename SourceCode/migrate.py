@@ -0,0 +1,48 @@
+"""
+Chuyển dữ liệu giữa các chế độ lưu (một lần, chạy khi chương trình đang tắt).
+
+Cách chạy:
+    python migrate.py json sqlite
+    python migrate.py sqlite json
+"""
+import argparse
+from data import BACKENDS
+from system_log import SystemLog
+
+
+def migrate(source, target):
+    """
+    Đọc toàn bộ dữ liệu bằng backend nguồn rồi ghi lại toàn bộ bằng backend đích.
+    Log cũ còn trong dữ liệu nguồn được chuyển sang file log (SystemLog.adopt), không ghi sang đích.
+
+    Args:
+        source (str): Chế độ lưu nguồn (khóa của BACKENDS).
+        target (str): Chế độ lưu đích.
+
+    Returns:
+        tuple[int, int, int]: Số admin, member và liên hệ đã chuyển.
+    """
+    src, dst = BACKENDS[source](), BACKENDS[target]()
+    if not src.exists():
+        raise FileNotFoundError(f"Không tìm thấy dữ liệu ở chế độ '{source}'.")
+    try:
+        admins, members, logs, meta = src.load()
+        system_log = SystemLog()
+        try: system_log.adopt(logs)
+        finally: system_log.close()
+        dst.save_all(admins, members, [], meta.get("next_member_id"))
+    finally:
+        src.close()
+        dst.close()
+    return len(admins), len(members), sum(len(m.contacts) for m in members)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Chuyển dữ liệu PhoneBook giữa các chế độ lưu")
+    parser.add_argument("source", choices=sorted(BACKENDS))
+    parser.add_argument("target", choices=sorted(BACKENDS))
+    args = parser.parse_args()
+    if args.source == args.target:
+        parser.error("Chế độ nguồn và đích phải khác nhau.")
+    n_admins, n_members, n_contacts = migrate(args.source, args.target)
+    print(f"✅ Đã chuyển {n_admins} admin, {n_members} member, {n_contacts} liên hệ: {args.source} -> {args.target}")
\ No newline at end of file
@@ -1,14 +1,89 @@
 import datetime
-import hashlib
+import functools
+import itertools
+import sys
+import threading
+import time
+from collections import OrderedDict, namedtuple
+from concurrency import RWLock
+from indexes import TrigramIndex, PrefixIndex, PhoneIndex, BKTree, fold_text, edit_distance
+from auth import hash_password, is_password_hash, verify_password
+
+_FUZZY_START_LOCK = threading.Lock()  # Chỉ một luồng dựng BK-tree cho mỗi member
+
+def _intern(value):
+    """sys.intern cho chuỗi; giá trị khác (None trong file JSON cũ/sửa tay) giữ nguyên."""
+    return sys.intern(value) if isinstance(value, str) else value
+
+# ==========================================
+# 0. CLASS ID SEQUENCE
+# ==========================================
+class IdSequence:
+    """
+    Bộ cấp phát ID tăng đơn điệu, cấp phát O(1).
+    ID đã cấp sẽ không bao giờ được dùng lại, kể cả khi đối tượng bị xóa.
+    """
+    def __init__(self, next_id=1):
+        """
+        Khởi tạo bộ cấp phát.
+
+        Args:
+            next_id (int): ID sẽ được cấp ở lần gọi tiếp theo.
+        """
+        self.next_id = next_id
+
+    def allocate(self):
+        """Cấp phát một ID mới."""
+        new_id = self.next_id
+        self.next_id += 1
+        return new_id
+
+    def reserve(self, count):
+        """
+        Giữ trước một khối ID liên tiếp cho thao tác thêm hàng loạt.
+
+        Args:
+            count (int): Số lượng ID cần giữ.
+
+        Returns:
+            range: Khoảng ID đã được giữ.
+        """
+        start = self.next_id
+        self.next_id += max(count, 0)
+        return range(start, self.next_id)
+
+    def observe(self, used_id):
+        """Đảm bảo ID đã tồn tại (ví dụ nạp từ file) không bị cấp lại."""
+        if used_id >= self.next_id:
+            self.next_id = used_id + 1
 
 # ==========================================
 # 1. CLASS CONTACT
 # ==========================================
+def _to_ts(value):
+    """datetime -> epoch (float), giữ nguyên None."""
+    return None if value is None else value.timestamp()
+
+def _from_ts(ts):
+    """epoch (float) -> datetime, giữ nguyên None."""
+    return None if ts is None else datetime.datetime.fromtimestamp(ts)
+
+def _ts_property(slot):
+    """Thuộc tính datetime đọc/ghi trên một slot lưu epoch."""
+    return property(lambda self: _from_ts(getattr(self, slot)),
+                    lambda self, value: setattr(self, slot, _to_ts(value)))
+
 class Contact:
     """
     Lớp đại diện cho một liên hệ (Contact).
     Lưu trữ các thông tin cá nhân như tên, sđt, email, v.v.
+
+    Dùng __slots__ và lưu thời gian dạng epoch để giảm bộ nhớ khi danh bạ rất lớn;
+    created_at / last_viewed_at / updated_at vẫn đọc ghi được dưới dạng datetime.
     """
+    __slots__ = ("contact_id", "name", "phone", "email", "address", "notes",
+                 "search_key", "created_ts", "viewed_ts", "updated_ts")
+
     def __init__(self, contact_id, name, phone, email="", address="", notes=""):
         """
         Khởi tạo một Contact mới.
@@ -25,10 +100,43 @@ class Contact:
         self.name = name
         self.phone = phone
         self.email = email
-        self.address = address
-        self.notes = notes
-        self.created_at = datetime.datetime.now()
-        self.last_viewed_at = None
+        # Địa chỉ/ghi chú hay lặp lại giữa các liên hệ nên dùng chung một chuỗi
+        self.address = _intern(address)
+        self.notes = _intern(notes)
+        self.created_ts = time.time()
+        self.viewed_ts = None
+        self.updated_ts = None
+        self.search_key = self._fold(name)  # Tên đã bỏ dấu + chữ thường, dùng cho tìm kiếm
+
+    @classmethod
+    def restore(cls, contact_id, name, phone, email, address, notes, search_key,
+                created_ts, viewed_ts=None, updated_ts=None):
+        """
+        Dựng lại Contact từ dữ liệu đã lưu, dùng search_key đã tính sẵn thay vì chuẩn hóa lại tên
+        (dùng khi nạp snapshot nhị phân).
+        """
+        contact = cls.__new__(cls)
+        contact.contact_id = contact_id
+        contact.name = name
+        contact.phone = phone
+        contact.email = email
+        contact.address = address
+        contact.notes = notes
+        contact.search_key = search_key
+        contact.created_ts = created_ts
+        contact.viewed_ts = viewed_ts
+        contact.updated_ts = updated_ts
+        return contact
+
+    @staticmethod
+    def _fold(name):
+        """Tính khóa tìm kiếm; dùng lại chính chuỗi tên nếu không có gì thay đổi."""
+        key = fold_text(name)
+        return name if key == name else key
+
+    created_at = _ts_property("created_ts")
+    last_viewed_at = _ts_property("viewed_ts")
+    updated_at = _ts_property("updated_ts")
 
     def update_details(self, name=None, phone=None, email=None, notes=None):
         """
@@ -40,15 +148,17 @@ class Contact:
             email (str): Email mới.
             notes (str): Ghi chú mới.
         """
-        if name: self.name = name
+        if name:
+            self.name = name
+            self.search_key = self._fold(name)
         if phone: self.phone = phone
         if email: self.email = email
-        if notes: self.notes = notes
-        self.updated_at = datetime.datetime.now()
+        if notes: self.notes = _intern(notes)
+        self.updated_ts = time.time()
 
     def view(self):
         """Ghi nhận thời gian vừa xem liên hệ này."""
-        self.last_viewed_at = datetime.datetime.now()
+        self.viewed_ts = time.time()
 
     def __str__(self):
         return f"ID: {self.contact_id} | {self.name} | {self.phone}"
@@ -104,11 +214,45 @@ class ContactGroupMembership:
 # ==========================================
 # 4. CLASS MEMBER
 # ==========================================
+def synchronized(method):
+    """
+    Chạy method khi đang giữ khóa ghi self.lock, để luồng đọc (tìm kiếm, luồng lưu nền)
+    không thấy dữ liệu sửa dở. Member mới nạp thông tin tài khoản (lazy) được nạp đầy đủ trước khi sửa.
+    """
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        with self.lock.write():
+            if self.loader: self.ensure_loaded()
+            return method(self, *args, **kwargs)
+    return wrapper
+
+def reader(method):
+    """
+    Chạy method khi đang giữ khóa đọc self.lock: nhiều luồng đọc cùng một member song song,
+    chỉ chờ khi có luồng đang sửa member đó.
+    """
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        if self.loader: self.ensure_loaded()  # Nạp trước: không nâng được khóa đọc lên khóa ghi
+        with self.lock.read():
+            return method(self, *args, **kwargs)
+    return wrapper
+
+# Bản chụp bất biến của danh bạ một member (tuple), đọc không cần khóa
+MemberSnapshot = namedtuple("MemberSnapshot", "version contacts groups memberships")
+
 class Member:
     """
     Lớp đại diện cho người dùng thông thường (Member).
     Có khả năng quản lý danh bạ cá nhân.
     """
+    # Hàm nhận (member, op, data) mỗi khi dữ liệu của member thay đổi, ví dụ journal
+    # của DataManager. None nghĩa là không ai theo dõi.
+    listener = None
+    # Hàm in các thông báo cho menu console (mặc định print). None để không in, ví dụ
+    # khi member được dùng qua server.py (PhoneBookSystem(echo=False)).
+    echo = print
+
     def __init__(self, member_id, username, password, email):
         """
         Khởi tạo Member.
@@ -116,28 +260,223 @@ class Member:
         Args:
             member_id (int): ID người dùng.
             username (str): Tên đăng nhập.
-            password (str): Mật khẩu (sẽ được tự động mã hóa nếu chưa mã hóa).
+            password (str): Mật khẩu (sẽ được băm PBKDF2 nếu chưa phải hash).
             email (str): Email người dùng.
         """
         self.member_id = member_id
         self.username = username
         self.email = email
         self.is_active = True
+        # Khóa đọc/ghi riêng của member: ghi khi sửa, đọc khi tìm kiếm hoặc chụp dữ liệu để lưu.
+        # Các member khác nhau không bao giờ chờ nhau.
+        self.lock = RWLock()
+        self.version = 0               # Tăng sau mỗi thay đổi, dùng để biết bản chụp đã cũ
+        self._snapshot = None          # MemberSnapshot gần nhất
+        self.dirty = False             # Có thay đổi chưa được lưu (dùng cho lưu theo từng member)
+        # Chế độ lazy: hàm loader(member) nạp danh bạ/nhóm/liên kết ở lần dùng đầu tiên;
+        # trước đó chỉ biết số liên hệ đã lưu (stored_contact_count).
+        self.loader = None
+        self.stored_contact_count = 0
         
         # Xử lý mã hóa mật khẩu (Requirement 2.2.1)
-        # Nếu độ dài khác 64 (độ dài SHA256 hex), coi như là plain text và thực hiện băm.
-        if len(password) != 64:
-            self.password = hashlib.sha256(password.encode()).hexdigest()
-        else:
-            self.password = password
+        # Chuỗi đã là hash (PBKDF2, hoặc SHA-256 cũ nạp từ file) được giữ nguyên, còn lại là plain text và được băm.
+        self.password = password if is_password_hash(password) else hash_password(password)
 
+        # contact_index / group_index là nơi lưu liên hệ và nhóm (xem property bên dưới)
         self.contacts = []      # List[Contact]
         self.groups = []        # List[Group]
         self.memberships = []   # List[ContactGroupMembership]
 
+        self.name_index = TrigramIndex()  # Tìm kiếm chuỗi con theo tên
+        self.prefix_index = PrefixIndex() # Gợi ý tên theo tiền tố (type-ahead)
+        self.phone_index = PhoneIndex()   # Tra ngược theo số điện thoại
+        self.fuzzy_index = None           # BKTree tìm gần đúng theo tên, dựng ở luồng nền khi cần lần đầu
+        self._fuzzy_builder = None        # Luồng đang dựng fuzzy_index
+        self.recent = OrderedDict()       # contact_id -> Contact, xem gần nhất nằm cuối
+
+        # Bộ cấp phát ID riêng của member (được lưu cùng dữ liệu)
+        self.contact_ids = IdSequence()
+        self.group_ids = IdSequence()
+
+    def _say(self, *args, **kwargs):
+        if self.echo: self.echo(*args, **kwargs)
+
+    def rebuild_indexes(self):
+        """
+        Dựng lại toàn bộ chỉ mục tìm kiếm từ danh bạ hiện có.
+        Gọi sau khi gán thẳng self.contacts/self.groups (ví dụ DataManager.load_data).
+        """
+        contacts = self.contact_index.values()
+        self.name_index = TrigramIndex()
+        for c in contacts: self.name_index.add(c.contact_id, c.search_key)
+        self.prefix_index = PrefixIndex((c.contact_id, c.search_key) for c in contacts)
+        self.phone_index = PhoneIndex((c.contact_id, c.phone) for c in contacts)
+        self.fuzzy_index = None
+        viewed = sorted((c for c in contacts if c.viewed_ts is not None),
+                        key=lambda x: x.viewed_ts)
+        self.recent = OrderedDict((c.contact_id, c) for c in viewed)
+        # contact_groups / group_contacts đã được setter của memberships dựng sẵn
+        if self.contact_index: self.contact_ids.observe(max(self.contact_index))
+        if self.group_index: self.group_ids.observe(max(self.group_index))
+        self.version += 1
+
+    def ensure_loaded(self):
+        """Nạp danh bạ, nhóm và liên kết nếu member mới chỉ có thông tin tài khoản (chế độ lazy)."""
+        if self.loader is None: return
+        with self.lock.write():
+            if self.loader is None: return
+            self.loader(self)
+            self.loader = None
+
+    @property
+    def is_loaded(self):
+        return self.loader is None
+
+    @property
+    def contact_count(self):
+        """Số liên hệ, không cần nạp danh bạ nếu member chưa được nạp."""
+        return self.stored_contact_count if self.loader else len(self.contact_index)
+
+    def _changed(self, op, **data):
+        """Báo một thay đổi (op: contact, contact_del, group, group_del, link, unlink, account) cho listener."""
+        self.dirty = True
+        self.version += 1
+        if Member.listener: Member.listener(self, op, data)
+
+    def get_contact(self, contact_id):
+        """Tra cứu liên hệ theo ID trong O(1). Trả về None nếu không có."""
+        return self.contact_index.get(contact_id)
+
+    def get_group(self, group_id):
+        """Tra cứu nhóm theo ID trong O(1). Trả về None nếu không có."""
+        return self.group_index.get(group_id)
+
+    def snapshot(self):
+        """
+        Bản chụp nhất quán (tuple bất biến) của danh bạ, nhóm và liên kết.
+
+        Bản chụp được dùng lại cho đến khi member thay đổi, nên đọc lặp lại không cần khóa;
+        duyệt bản chụp không chặn luồng ghi và không bị ảnh hưởng khi dữ liệu bị sửa sau đó.
+
+        Returns:
+            MemberSnapshot: (version, contacts, groups, memberships).
+        """
+        snap = self._snapshot
+        if snap is not None and snap.version == self.version: return snap
+        if self.loader: self.ensure_loaded()
+        with self.lock.read():
+            snap = MemberSnapshot(self.version, tuple(self.contact_index.values()), tuple(self.group_index.values()),
+                                  tuple(self.membership_index.values()))
+        self._snapshot = snap
+        return snap
+
+    def iter_export(self):
+        """
+        Duyệt danh bạ một lần để xuất file (xem contact_export), kèm tên các nhóm của từng liên hệ.
+
+        Liên hệ, nhóm và liên kết đều lấy từ cùng một snapshot() nên file xuất nhất quán dù dữ liệu
+        bị sửa trong lúc xuất, và không chặn luồng ghi. Bộ nhớ dùng tăng theo kích thước danh bạ:
+        snapshot() là tuple tham chiếu tới mọi liên hệ (không sao chép object Contact), cộng bảng
+        contact_id -> group_id (tỉ lệ với số liên kết).
+
+        Yields:
+            tuple[Contact, list[str]]: (liên hệ, tên các nhóm của liên hệ, theo group_id).
+        """
+        snap = self.snapshot()
+        names = {g.group_id: g.group_name for g in snap.groups}
+        groups_of = {}
+        for ms in snap.memberships:
+            if ms.group_id in names: groups_of.setdefault(ms.contact_id, []).append(ms.group_id)
+        for contact in snap.contacts:
+            yield contact, [names[gid] for gid in sorted(groups_of.get(contact.contact_id, ()))]
+
+    # --- CONTACT & GROUP STORAGE ---
+    # Liên hệ và nhóm được lưu trong contact_index / group_index (dict giữ thứ tự thêm vào):
+    # tra cứu và xóa theo ID trong O(1); contacts / groups là danh sách theo đúng thứ tự đó.
+
+    @property
+    def contacts(self):
+        """
+        Danh sách liên hệ theo thứ tự thêm (bản sao, dùng các hàm của Member để thay đổi).
+        Không tự nạp member lazy (khi đó danh sách rỗng, xem contact_count).
+        """
+        with self.lock.read(): return list(self.contact_index.values())
+
+    @contacts.setter
+    def contacts(self, contacts):
+        """Thay toàn bộ danh bạ (khi nạp dữ liệu), sau đó gọi rebuild_indexes."""
+        self.contact_index = {c.contact_id: c for c in contacts}  # Dict[int, Contact]
+
+    @property
+    def groups(self):
+        """Danh sách nhóm theo thứ tự tạo (bản sao, dùng các hàm của Member để thay đổi)."""
+        with self.lock.read(): return list(self.group_index.values())
+
+    @groups.setter
+    def groups(self, groups):
+        """Thay toàn bộ danh sách nhóm (khi nạp dữ liệu), sau đó gọi rebuild_indexes."""
+        self.group_index = {g.group_id: g for g in groups}  # Dict[int, Group]
+
+    # --- MEMBERSHIP INDEX ---
+    # Liên kết được lưu trong membership_index (giữ thứ tự thêm vào) cùng hai bản đồ
+    # contact_groups / group_contacts, nên mọi thao tác chỉ tốn chi phí theo số liên kết bị ảnh hưởng.
+
+    @property
+    @reader
+    def memberships(self):
+        """Danh sách liên kết Contact-Group (bản sao, dùng các hàm của Member để thay đổi)."""
+        return list(self.membership_index.values())
+
+    @memberships.setter
+    def memberships(self, links):
+        """Thay toàn bộ danh sách liên kết và dựng lại các chỉ mục."""
+        self.membership_index = {}  # Dict[(contact_id, group_id), ContactGroupMembership]
+        self.contact_groups = {}    # Dict[int, Set[int]]: contact_id -> group_ids
+        self.group_contacts = {}    # Dict[int, Set[int]]: group_id -> contact_ids
+        for ms in links: self._link(ms)
+
+    def _link(self, ms):
+        """Ghi một liên kết vào các chỉ mục. Trả về False nếu đã tồn tại."""
+        key = (ms.contact_id, ms.group_id)
+        if key in self.membership_index: return False
+        self.membership_index[key] = ms
+        self.contact_groups.setdefault(ms.contact_id, set()).add(ms.group_id)
+        self.group_contacts.setdefault(ms.group_id, set()).add(ms.contact_id)
+        return True
+
+    def _unlink(self, contact_id, group_id):
+        """Gỡ một liên kết khỏi các chỉ mục. Trả về liên kết bị gỡ hoặc None."""
+        ms = self.membership_index.pop((contact_id, group_id), None)
+        if ms is None: return None
+        for index, key, value in ((self.contact_groups, contact_id, group_id),
+                                  (self.group_contacts, group_id, contact_id)):
+            bucket = index[key]
+            bucket.discard(value)
+            if not bucket: del index[key]
+        return ms
+
+    @reader
+    def is_in_group(self, contact_id, group_id):
+        """Kiểm tra contact có thuộc group không trong O(1)."""
+        return (contact_id, group_id) in self.membership_index
+
+    @reader
+    def get_groups_of_contact(self, contact_id):
+        """Lấy danh sách Group mà contact đang thuộc về."""
+        return [self.group_index[gid] for gid in sorted(self.contact_groups.get(contact_id, ()))
+                if gid in self.group_index]
+
+    @reader
+    def get_contacts_in_group(self, group_id):
+        """Lấy danh sách Contact thuộc một group."""
+        return [self.contact_index[cid] for cid in sorted(self.group_contacts.get(group_id, ()))
+                if cid in self.contact_index]
+
     def login(self, password_input):
         """
         Kiểm tra đăng nhập bằng cách so sánh hash của mật khẩu nhập vào.
+        Hash cũ (SHA-256 hoặc ít vòng lặp) được băm lại bằng PBKDF2 khi đăng nhập đúng.
+        Hàm tốn thời gian (PBKDF2): nên gọi qua auth.AuthService thay vì trên luồng giao diện.
         
         Args:
             password_input (str): Mật khẩu người dùng nhập (plain text).
@@ -145,111 +484,293 @@ class Member:
         Returns:
             bool: True nếu mật khẩu đúng và tài khoản active, ngược lại False.
         """
-        input_hashed = hashlib.sha256(password_input.encode()).hexdigest()
-        return self.password == input_hashed and self.is_active
+        ok, upgrade = verify_password(password_input, self.password)
+        if ok and upgrade: self.set_password(password_input)
+        return ok and self.is_active
+
+    def set_password(self, password):
+        """Đặt mật khẩu mới (băm PBKDF2) và báo thay đổi tài khoản cho listener."""
+        hashed = hash_password(password)
+        with self.lock.write():
+            self.password = hashed
+            self._changed("account", account={"username": self.username, "password": self.password,
+                                              "email": self.email, "is_active": self.is_active})
 
     # --- CONTACT MANAGEMENT ---
     
+    def _index_contact(self, contact):
+        """Đưa Contact mới vào danh bạ và mọi chỉ mục (gọi khi đang giữ khóa ghi)."""
+        cid = contact.contact_id
+        self.contact_index[cid] = contact
+        self.name_index.add(cid, contact.search_key)
+        self.prefix_index.add(cid, contact.search_key)
+        if self.fuzzy_index is not None: self.fuzzy_index.add(cid, contact.search_key)
+        self.phone_index.add(cid, contact.phone)
+        self._changed("contact", contact=contact)
+
+    @synchronized
     def add_contact(self, name, phone, email="", addr="", note=""):
-        """Thêm một liên hệ mới vào danh bạ."""
-        new_id = 1
-        if self.contacts: new_id = max(c.contact_id for c in self.contacts) + 1
-        self.contacts.append(Contact(new_id, name, phone, email, addr, note))
-        print(f"✅ Đã thêm: {name}")
+        """Thêm một liên hệ mới vào danh bạ. Trả về Contact vừa tạo."""
+        contact = Contact(self.contact_ids.allocate(), name, phone, email, addr, note)
+        self._index_contact(contact)
+        self._say(f"✅ Đã thêm: {name}")
+        return contact
+
+    @synchronized
+    def add_contacts(self, rows):
+        """
+        Thêm hàng loạt liên hệ (nhập danh bạ): cấp ID theo khối, không in từng dòng.
+
+        Args:
+            rows (list[tuple]): Mỗi dòng (name, phone, email, address, notes[, group_ids]),
+                group_ids là các ID nhóm đã có mà liên hệ được thêm vào.
+
+        Returns:
+            list[Contact]: Các liên hệ vừa tạo, theo thứ tự của rows.
+        """
+        rows = list(rows)
+        added = []
+        for cid, (name, phone, email, address, notes, *groups) in zip(self.contact_ids.reserve(len(rows)), rows):
+            contact = Contact(cid, name, phone, email, address, notes)
+            self._index_contact(contact)
+            for gid in (groups[0] if groups else ()):
+                ms = ContactGroupMembership(cid, gid)
+                if gid in self.group_index and self._link(ms): self._changed("link", membership=ms)
+            added.append(contact)
+        return added
 
+    @synchronized
     def edit_contact_details(self, contact_id, name=None, phone=None, email=None, notes=None):
         """Sửa thông tin liên hệ theo ID."""
-        target = next((c for c in self.contacts if c.contact_id == contact_id), None)
+        target = self.get_contact(contact_id)
         if target:
+            old_name, old_phone = target.name, target.phone
             target.update_details(name, phone, email, notes)
-            print(f"✅ Đã cập nhật thông tin ID {contact_id}")
+            if target.phone != old_phone: self.phone_index.add(contact_id, target.phone)
+            if target.name != old_name:
+                self.name_index.add(contact_id, target.search_key)
+                self.prefix_index.add(contact_id, target.search_key)
+                if self.fuzzy_index is not None: self.fuzzy_index.add(contact_id, target.search_key)
+            self._changed("contact", contact=target)
+            self._say(f"✅ Đã cập nhật thông tin ID {contact_id}")
             return True
         return False
 
+    @synchronized
     def delete_contact(self, contact_id):
         """Xóa liên hệ và xóa cả các liên kết nhóm liên quan."""
-        self.memberships = [m for m in self.memberships if m.contact_id != contact_id]
-        target = next((c for c in self.contacts if c.contact_id == contact_id), None)
+        for gid in list(self.contact_groups.get(contact_id, ())):
+            self._unlink(contact_id, gid)
+        target = self.contact_index.pop(contact_id, None)
         if target:
-            self.contacts.remove(target)
-            print(f"✅ Đã xóa liên hệ ID {contact_id}")
+            self.name_index.remove(contact_id)
+            self.prefix_index.remove(contact_id)
+            self.phone_index.remove(contact_id)
+            if self.fuzzy_index is not None: self.fuzzy_index.remove(contact_id)
+            self.recent.pop(contact_id, None)
+            self._changed("contact_del", contact_id=contact_id)
+            self._say(f"✅ Đã xóa liên hệ ID {contact_id}")
         else:
-            print("❌ Không tìm thấy ID.")
+            self._say("❌ Không tìm thấy ID.")
 
+    @synchronized
     def view_contact_detail(self, contact_id):
         """Xem chi tiết và ghi nhận lịch sử xem."""
-        target = next((c for c in self.contacts if c.contact_id == contact_id), None)
+        target = self.get_contact(contact_id)
         if target:
             target.view()
-            print(f"\n--- CHI TIẾT: {target.name} ---")
-            print(f"SĐT  : {target.phone}")
-            print(f"Email: {target.email}")
-            print(f"Note : {target.notes}")
+            self.recent[contact_id] = target
+            self.recent.move_to_end(contact_id)
+            self._changed("contact", contact=target)
+            self._say(f"\n--- CHI TIẾT: {target.name} ---")
+            self._say(f"SĐT  : {target.phone}")
+            self._say(f"Email: {target.email}")
+            self._say(f"Note : {target.notes}")
             if target.last_viewed_at:
-                print(f"Xem lần cuối: {target.last_viewed_at.strftime('%H:%M %d/%m')}")
+                self._say(f"Xem lần cuối: {target.last_viewed_at.strftime('%H:%M %d/%m')}")
             return True
         return False
 
-    def get_recent_contacts(self):
-        """Lấy danh sách các liên hệ vừa xem gần đây."""
-        viewed = [c for c in self.contacts if c.last_viewed_at is not None]
-        viewed.sort(key=lambda x: x.last_viewed_at, reverse=True)
-        return viewed
+    @reader
+    def get_recent_contacts(self, limit=None):
+        """
+        Lấy danh sách các liên hệ vừa xem gần đây (mới xem nhất trước).
+
+        Args:
+            limit (int, optional): Chỉ lấy tối đa `limit` liên hệ.
+        """
+        recent = reversed(self.recent.values())
+        if limit is not None: recent = itertools.islice(recent, limit)
+        return list(recent)
 
+    @reader
     def search_contact_by_name(self, keyword):
-        """Tìm kiếm liên hệ theo tên (gần đúng)."""
-        keyword = keyword.lower().strip()
-        found = [c for c in self.contacts if keyword in c.name.lower()]
+        """Tìm kiếm liên hệ theo tên (gần đúng, không phân biệt dấu), dùng chỉ mục trigram."""
+        keyword = fold_text(keyword.strip())
+        found = [self.contact_index[cid] for cid in self.name_index.search(keyword)]
         return found
 
+    @reader
+    def suggest_contacts(self, prefix, limit=10):
+        """
+        Gợi ý liên hệ có tên bắt đầu bằng prefix (không phân biệt hoa thường và dấu),
+        dùng cho ô tìm kiếm gợi ý khi đang gõ.
+
+        Args:
+            prefix (str): Phần đầu của tên.
+            limit (int): Số gợi ý tối đa.
+
+        Returns:
+            list[Contact]: Các liên hệ theo thứ tự tên A-Z.
+        """
+        prefix = fold_text(prefix.lstrip())
+        return [self.contact_index[cid] for cid in self.prefix_index.complete(prefix, limit)]
+
+    def build_fuzzy_index(self, background=True):
+        """
+        Dựng BKTree cho tìm gần đúng mà không giữ khóa của member.
+
+        Tên được lấy từ snapshot() và cây được dựng ngoài khóa nên luồng ghi không phải chờ; chỉ bước
+        đối chiếu các thay đổi xảy ra trong lúc dựng mới giữ khóa ghi (tốn O(n) phép tra dict).
+        Không gọi với background=False khi đang giữ khóa của member.
+
+        Args:
+            background (bool): True để dựng trên luồng nền; False để chờ dựng xong.
+
+        Returns:
+            bool: True nếu cây đã sẵn sàng, False nếu đang dựng ở luồng nền.
+        """
+        with _FUZZY_START_LOCK:
+            if self.fuzzy_index is not None: return True
+            thread = self._fuzzy_builder
+            if thread is None or not thread.is_alive():
+                thread = threading.Thread(target=self._build_fuzzy_index, daemon=True,
+                                          name=f"fuzzy-index-{self.member_id}")
+                self._fuzzy_builder = thread
+                thread.start()
+        if background: return False
+        thread.join()
+        return self.fuzzy_index is not None
+
+    def _build_fuzzy_index(self):
+        tree = BKTree((c.contact_id, c.search_key) for c in self.snapshot().contacts)
+        with self.lock.write():
+            for cid in [cid for cid in tree.texts if cid not in self.contact_index]: tree.remove(cid)
+            for cid, c in self.contact_index.items():
+                if tree.texts.get(cid) != c.search_key: tree.add(cid, c.search_key)
+            self.fuzzy_index = tree
+
+    def fuzzy_search_contacts(self, keyword, max_distance=2, limit=10):
+        """
+        Tìm gần đúng theo tên, chấp nhận lỗi gõ (không phân biệt hoa thường và dấu).
+
+        Khi BK-tree chưa có (lần đầu, hoặc sau khi nạp lại), cây được dựng ở luồng nền
+        (xem build_fuzzy_index); trong lúc chờ, mọi tên trong snapshot() được so trực tiếp nên kết quả
+        vẫn đầy đủ, chỉ chậm hơn (O(n)).
+
+        Args:
+            keyword (str): Tên cần tìm.
+            max_distance (int): Khoảng cách Levenshtein tối đa.
+            limit (int): Số kết quả tối đa.
+
+        Returns:
+            list[Contact]: Các liên hệ, gần đúng nhất trước.
+        """
+        keyword = fold_text(keyword.strip())
+        if self.loader: self.ensure_loaded()
+        with self.lock.read():
+            if self.fuzzy_index is not None:
+                found = self.fuzzy_index.search(keyword, max_distance)[:limit]
+                return [self.contact_index[cid] for _, cid in found]
+        self.build_fuzzy_index()
+        # Cây đang dựng: so trực tiếp toàn bộ bản chụp (không giữ khóa)
+        found = []
+        for c in self.snapshot().contacts:
+            if abs(len(c.search_key) - len(keyword)) > max_distance: continue
+            d = edit_distance(keyword, c.search_key)
+            if d <= max_distance: found.append((d, c.contact_id, c))
+        found.sort(key=lambda x: x[:2])
+        return [c for _, _, c in found[:limit]]
+
+    @reader
+    def find_contacts_by_phone(self, phone):
+        """
+        Tra ngược liên hệ theo số điện thoại (bỏ qua khoảng trắng, '+', mã quốc gia, số 0 đầu).
+
+        Returns:
+            list[Contact]: Các liên hệ có cùng số.
+        """
+        return [self.contact_index[cid] for cid in self.phone_index.lookup(phone)]
+
+    @reader
+    def find_contacts_by_phone_suffix(self, digits, limit=10):
+        """
+        Tìm liên hệ có số điện thoại kết thúc bằng các chữ số cho trước (kiểu caller-ID).
+
+        Args:
+            digits (str): N chữ số cuối.
+            limit (int): Số kết quả tối đa.
+
+        Returns:
+            list[Contact]: Các liên hệ khớp.
+        """
+        return [self.contact_index[cid] for cid in self.phone_index.lookup_suffix(digits, limit)]
+
     # --- GROUP MANAGEMENT ---
+    @synchronized
     def create_group(self, group_name):
-        """Tạo nhóm mới."""
-        new_id = 1
-        if self.groups: new_id = max(g.group_id for g in self.groups) + 1
-        self.groups.append(Group(new_id, group_name))
-        print(f"✅ Đã tạo nhóm: {group_name}")
+        """Tạo nhóm mới. Trả về Group vừa tạo."""
+        new_id = self.group_ids.allocate()
+        group = Group(new_id, group_name)
+        self.group_index[new_id] = group
+        self._changed("group", group=group)
+        self._say(f"✅ Đã tạo nhóm: {group_name}")
+        return group
 
+    @synchronized
     def remove_group(self, group_id):
         """Xóa nhóm và các liên kết thành viên trong nhóm đó."""
-        target = next((g for g in self.groups if g.group_id == group_id), None)
+        target = self.group_index.pop(group_id, None)
         if target:
-            self.memberships = [m for m in self.memberships if m.group_id != group_id]
-            self.groups.remove(target)
-            print(f"✅ Đã xóa nhóm ID {group_id}")
-        else: print("❌ Không tìm thấy nhóm.")
+            for cid in list(self.group_contacts.get(group_id, ())):
+                self._unlink(cid, group_id)
+            self._changed("group_del", group_id=group_id)
+            self._say(f"✅ Đã xóa nhóm ID {group_id}")
+        else: self._say("❌ Không tìm thấy nhóm.")
 
+    @synchronized
     def rename_group(self, group_id, new_name):
         """Đổi tên nhóm."""
-        target = next((g for g in self.groups if g.group_id == group_id), None)
-        if target: target.rename_group(new_name)
+        target = self.group_index.get(group_id)
+        if target:
+            target.rename_group(new_name)
+            self._changed("group", group=target)
 
+    @synchronized
     def add_contact_to_group(self, contact_id, group_id):
         """Thêm một contact vào một group."""
-        if not any(c.contact_id == contact_id for c in self.contacts): return
-        if not any(g.group_id == group_id for g in self.groups): return
-        for m in self.memberships:
-            if m.check_membership(contact_id, group_id): return
-        self.memberships.append(ContactGroupMembership(contact_id, group_id))
-        print(f"✅ Đã thêm vào nhóm.")
+        if contact_id not in self.contact_index: return
+        if group_id not in self.group_index: return
+        ms = ContactGroupMembership(contact_id, group_id)
+        if not self._link(ms): return
+        self._changed("link", membership=ms)
+        self._say(f"✅ Đã thêm vào nhóm.")
 
+    @synchronized
     def remove_contact_from_group(self, contact_id, group_id):
         """Xóa contact khỏi group."""
-        initial = len(self.memberships)
-        self.memberships = [m for m in self.memberships if not (m.contact_id == contact_id and m.group_id == group_id)]
-        if len(self.memberships) < initial:
-            print(f"✅ Đã mời Contact {contact_id} ra khỏi nhóm.")
+        if self._unlink(contact_id, group_id):
+            self._changed("unlink", contact_id=contact_id, group_id=group_id)
+            self._say(f"✅ Đã mời Contact {contact_id} ra khỏi nhóm.")
             return True
         return False
 
     def view_contacts_in_group(self, group_id):
         """Hiển thị tất cả thành viên trong một nhóm."""
-        print(f"\n--- Thành viên Nhóm {group_id} ---")
-        linked_ids = [m.contact_id for m in self.memberships if m.group_id == group_id]
-        if not linked_ids: print("(Trống)")
-        for cid in linked_ids:
-            c = next((x for x in self.contacts if x.contact_id == cid), None)
-            if c: print(f"{c.contact_id}. {c.name} - {c.phone}")
+        self._say(f"\n--- Thành viên Nhóm {group_id} ---")
+        linked = self.get_contacts_in_group(group_id)
+        if not linked: self._say("(Trống)")
+        for c in linked: self._say(f"{c.contact_id}. {c.name} - {c.phone}")
 
 # ==========================================
 # 5. CLASS ADMIN
@@ -261,18 +782,18 @@ class Admin:
     def __init__(self, admin_id, username, password):
         """
         Khởi tạo Admin.
-        Mật khẩu sẽ được băm SHA-256 nếu chưa băm.
+        Mật khẩu sẽ được băm PBKDF2 nếu chưa phải hash.
         """
         self.admin_id = admin_id
         self.username = username
-        if len(password) != 64:
-            self.password = hashlib.sha256(password.encode()).hexdigest()
-        else:
-            self.password = password
+        self.password = password if is_password_hash(password) else hash_password(password)
 
     def login(self, password_input):
         """
         Đăng nhập Admin với mật khẩu đã băm.
+        Hash cũ được băm lại bằng PBKDF2 khi đăng nhập đúng (người gọi tự lưu lại, xem
+        auth.AuthService.on_upgrade).
         """
-        input_hashed = hashlib.sha256(password_input.encode()).hexdigest()
-        return self.password == input_hashed
\ No newline at end of file
+        ok, upgrade = verify_password(password_input, self.password)
+        if ok and upgrade: self.password = hash_password(password_input)
+        return ok
\ No newline at end of file
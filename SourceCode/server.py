@@ -0,0 +1,455 @@
+"""
+Dịch vụ JSON/HTTP cục bộ cho PhoneBookSystem (asyncio, chỉ dùng thư viện chuẩn).
+
+Một tiến trình phục vụ nhiều client đồng thời. Event loop chỉ đọc/ghi socket và kiểm tra dữ liệu
+gửi lên; mọi thao tác trên Member (có thể phải chờ khóa hoặc tốn CPU như tìm gần đúng) chạy trên
+pool luồng xử lý, tính hash mật khẩu chạy trên pool của AuthService, còn lưu dữ liệu, ghi/đọc file
+log và nạp danh bạ lazy chạy trên luồng I/O riêng. Hệ thống được mở với quiet=True (xem
+main.open_system) nên các thông báo Member in cho menu console không được in ra.
+
+Cách chạy:
+    python server.py --host 127.0.0.1 --port 8080
+
+Mọi body là JSON. POST /login trả về token; các yêu cầu khác gửi kèm header
+"Authorization: Bearer <token>".
+
+    POST   /login                         {"username", "password", "role": "member" | "admin"}
+    POST   /logout
+    --- Member ---
+    GET    /contacts                      Danh bạ
+    POST   /contacts                      {"name", "phone", "email", "address", "notes"}
+    GET    /contacts/<id>                 Xem chi tiết (ghi nhận vào Recent)
+    PATCH  /contacts/<id>                 {"name", "phone", "email", "notes"} (trường nào có thì sửa)
+    DELETE /contacts/<id>
+    GET    /search?q=<tên>                Tìm theo tên (kèm gợi ý gần đúng nếu không thấy)
+    GET    /search?prefix=<đầu tên>       Gợi ý theo phần đầu tên
+    GET    /search?phone=<sđt>            Tra ngược theo số điện thoại
+    GET    /recent?limit=<n>              Liên hệ vừa xem
+    GET    /groups                        Danh sách nhóm
+    POST   /groups                        {"name"}
+    PATCH  /groups/<id>                   {"name"}
+    DELETE /groups/<id>
+    GET    /groups/<id>/contacts          Thành viên nhóm
+    POST   /groups/<id>/contacts          {"contact_id"}
+    DELETE /groups/<id>/contacts/<cid>
+    --- Admin ---
+    GET    /admin/members                 Danh sách member
+    POST   /admin/members                 {"username", "password", "email"}
+    DELETE /admin/members/<id>
+    GET    /admin/members/<id>/contacts   Danh bạ của một member
+    GET    /admin/logs?page=<n>&size=<n>  Log hệ thống theo trang (trang 0 mới nhất)
+"""
+import argparse
+import asyncio
+import json
+import re
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from http import HTTPStatus
+from urllib.parse import urlsplit, parse_qs
+from auth import AuthBusyError
+from data import DataManager, DataLoadError
+
+MAX_BODY = 1024 * 1024   # Kích thước body tối đa (byte)
+MAX_HEADERS = 100        # Số header tối đa mỗi yêu cầu
+LOG_PAGE_SIZE = 20
+API_WORKERS = 4          # Số luồng xử lý thao tác trên Member
+THREAD_PREFIX = "api-"   # Tiền tố tên các luồng của server
+
+
+class HttpError(Exception):
+    """Lỗi trả về cho client với mã HTTP tương ứng."""
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+
+def _int(value, name):
+    try: return int(value)
+    except (TypeError, ValueError):
+        raise HttpError(HTTPStatus.BAD_REQUEST, f"'{name}' phải là số nguyên.")
+
+def _text(data, name, required=False):
+    value = data.get(name)
+    if value is None:
+        if required: raise HttpError(HTTPStatus.BAD_REQUEST, f"Thiếu trường '{name}'.")
+        return None
+    if not isinstance(value, str): raise HttpError(HTTPStatus.BAD_REQUEST, f"'{name}' phải là chuỗi.")
+    value = value.strip()
+    if required and not value: raise HttpError(HTTPStatus.BAD_REQUEST, f"'{name}' không được để trống.")
+    return value
+
+def _phone(value):
+    if value is not None and not value.isdigit():
+        raise HttpError(HTTPStatus.BAD_REQUEST, "SĐT chỉ được chứa số.")
+    return value
+
+def _contact(mem, contact):
+    data = DataManager.contact_to_dict(contact)
+    data["groups"] = [g.group_id for g in mem.get_groups_of_contact(contact.contact_id)]
+    return data
+
+def _account(mem):
+    return {"member_id": mem.member_id, "username": mem.username, "email": mem.email,
+            "is_active": mem.is_active, "contact_count": mem.contact_count}
+
+
+class PhoneBookServer:
+    """
+    Bộ xử lý HTTP/1.1 (keep-alive) ánh xạ các endpoint sang Member/Admin của PhoneBookSystem.
+    """
+    def __init__(self, system):
+        """
+        Args:
+            system (PhoneBookSystem): Hệ thống đã nạp dữ liệu, nên mở với echo=False
+                (open_system(quiet=True)) để Member không in ra stdout.
+        """
+        self.system = system
+        # Một luồng I/O: các lần lưu nối tiếp nhau, không ghi cùng lúc vào một file
+        self.io = ThreadPoolExecutor(max_workers=1, thread_name_prefix=THREAD_PREFIX + "persist")
+        # Thao tác trên Member: chờ khóa hoặc tính toán ở đây thay vì trên event loop
+        self.workers = ThreadPoolExecutor(max_workers=API_WORKERS, thread_name_prefix=THREAD_PREFIX + "worker")
+        # List[(method, regex, handler, vai trò)]: vai trò None = không cần đăng nhập,
+        # str = chỉ cần token hợp lệ (handler nhận chính token), còn lại là lớp tài khoản
+        self.routes = []
+        member, admin = system.member_type, system.admin_type
+        for method, path, handler, role in [
+            ("POST", r"/login", self.login, None),
+            ("POST", r"/logout", self.logout, str),
+            ("GET", r"/contacts", self.list_contacts, member),
+            ("POST", r"/contacts", self.add_contact, member),
+            ("GET", r"/contacts/(\d+)", self.view_contact, member),
+            ("PATCH", r"/contacts/(\d+)", self.edit_contact, member),
+            ("DELETE", r"/contacts/(\d+)", self.delete_contact, member),
+            ("GET", r"/search", self.search, member),
+            ("GET", r"/recent", self.recent, member),
+            ("GET", r"/groups", self.list_groups, member),
+            ("POST", r"/groups", self.create_group, member),
+            ("PATCH", r"/groups/(\d+)", self.rename_group, member),
+            ("DELETE", r"/groups/(\d+)", self.remove_group, member),
+            ("GET", r"/groups/(\d+)/contacts", self.group_contacts, member),
+            ("POST", r"/groups/(\d+)/contacts", self.add_to_group, member),
+            ("DELETE", r"/groups/(\d+)/contacts/(\d+)", self.remove_from_group, member),
+            ("GET", r"/admin/members", self.list_members, admin),
+            ("POST", r"/admin/members", self.create_member, admin),
+            ("DELETE", r"/admin/members/(\d+)", self.delete_member, admin),
+            ("GET", r"/admin/members/(\d+)/contacts", self.member_contacts, admin),
+            ("GET", r"/admin/logs", self.logs, admin),
+        ]:
+            self.routes.append((method, re.compile(path), handler, role))
+
+    # --- CHẠY VIỆC CHẬM NGOÀI EVENT LOOP ---
+
+    async def run_io(self, fn, *args):
+        """Chạy fn(*args) trên luồng I/O và đợi kết quả."""
+        return await asyncio.get_running_loop().run_in_executor(self.io, fn, *args)
+
+    async def run(self, fn, *args):
+        """Chạy fn(*args) (thao tác trên Member/PhoneBookSystem) trên pool luồng xử lý và đợi kết quả."""
+        return await asyncio.get_running_loop().run_in_executor(self.workers, fn, *args)
+
+    async def commit(self, message=None):
+        """Ghi log (nếu có) rồi lưu thay đổi, trên luồng I/O."""
+        def work():
+            if message: self.system.write_log(message)
+            self.system.save_changes()
+        await self.run_io(work)
+
+    # --- HTTP ---
+
+    async def start(self, host="127.0.0.1", port=8080):
+        """Mở cổng lắng nghe. Trả về asyncio.Server (port=0 để hệ điều hành chọn cổng)."""
+        return await asyncio.start_server(self.handle_client, host, port)
+
+    def close(self):
+        """Đợi các thao tác và lần lưu đang chạy rồi dừng các luồng."""
+        self.workers.shutdown(wait=True)
+        self.io.shutdown(wait=True)
+
+    async def handle_client(self, reader, writer):
+        """Phục vụ một kết nối: đọc lần lượt các yêu cầu cho đến khi client đóng."""
+        try:
+            while True:
+                try: request_line = await reader.readline()
+                except ValueError:  # Dòng yêu cầu vượt giới hạn của StreamReader
+                    await self.respond(writer, HTTPStatus.REQUEST_URI_TOO_LONG, {"error": "Dòng yêu cầu quá dài."}, False)
+                    break
+                if not request_line.strip(): break
+                try:
+                    method, target, version = request_line.decode("latin-1").split()
+                    headers = {}
+                    for _ in range(MAX_HEADERS + 1):
+                        line = await reader.readline()
+                        if line in (b"\r\n", b"\n", b""): break
+                        name, _, value = line.decode("latin-1").partition(":")
+                        headers[name.strip().lower()] = value.strip()
+                    else:
+                        raise HttpError(HTTPStatus.REQUEST_HEADER_FIELDS_TOO_LARGE, "Quá nhiều header.")
+                    length = _int(headers.get("content-length", 0), "Content-Length")
+                    if not 0 <= length <= MAX_BODY:
+                        raise HttpError(HTTPStatus.REQUEST_ENTITY_TOO_LARGE, "Body quá lớn.")
+                except (ValueError, HttpError) as e:
+                    # Yêu cầu hỏng: trả lỗi rồi đóng kết nối vì không biết yêu cầu kết thúc ở đâu
+                    error = e if isinstance(e, HttpError) else HttpError(HTTPStatus.BAD_REQUEST, "Yêu cầu không hợp lệ.")
+                    await self.respond(writer, error.status, {"error": error.message}, False)
+                    break
+                body = await reader.readexactly(length) if length else b""
+                status, payload = await self.dispatch(method, target, headers, body)
+                keep_alive = version == "HTTP/1.1" and headers.get("connection", "").lower() != "close"
+                await self.respond(writer, status, payload, keep_alive)
+                if not keep_alive: break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass  # Client ngắt giữa chừng
+        finally:
+            writer.close()
+
+    @staticmethod
+    async def respond(writer, status, payload, keep_alive):
+        body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        head = (f"HTTP/1.1 {status.value} {status.phrase}\r\n"
+                "Content-Type: application/json; charset=utf-8\r\n"
+                f"Content-Length: {len(body)}\r\n"
+                f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n")
+        writer.write(head.encode("latin-1") + body)
+        await writer.drain()
+
+    async def dispatch(self, method, target, headers, body):
+        """
+        Tìm endpoint và gọi handler.
+
+        Returns:
+            tuple[HTTPStatus, object]: Mã trả về và dữ liệu JSON.
+        """
+        url = urlsplit(target)
+        query = {k: v[-1] for k, v in parse_qs(url.query).items()}
+        allowed = False
+        for route_method, pattern, handler, role in self.routes:
+            match = pattern.fullmatch(url.path)
+            if not match: continue
+            allowed = True
+            if route_method != method: continue
+            try:
+                data = json.loads(body) if body else {}
+                if not isinstance(data, dict): raise ValueError
+            except ValueError:
+                return HTTPStatus.BAD_REQUEST, {"error": "Body phải là một object JSON."}
+            try:
+                account = self.authorize(headers, role)
+                result = await handler(account, data, query, *map(int, match.groups()))
+            except HttpError as e:
+                return e.status, {"error": e.message}
+            except AuthBusyError as e:
+                return HTTPStatus.SERVICE_UNAVAILABLE, {"error": str(e)}
+            except Exception as e:
+                # Lỗi ngoài dự kiến của handler: ghi log, client vẫn nhận được phản hồi
+                traceback.print_exc()
+                await self.run_io(self.system.write_log, f"API error {method} {url.path}: {type(e).__name__}: {e}")
+                return HTTPStatus.INTERNAL_SERVER_ERROR, {"error": "Lỗi máy chủ."}
+            if isinstance(result, tuple): return result
+            return HTTPStatus.OK, result
+        if allowed: return HTTPStatus.METHOD_NOT_ALLOWED, {"error": "Phương thức không được hỗ trợ."}
+        return HTTPStatus.NOT_FOUND, {"error": "Không tìm thấy endpoint."}
+
+    def authorize(self, headers, role):
+        """Tài khoản của token trong header Authorization (kiểm tra đúng vai trò), hoặc token nếu role là str."""
+        if role is None: return None
+        scheme, _, token = headers.get("authorization", "").partition(" ")
+        account = self.system.authenticate(token.strip()) if scheme.lower() == "bearer" else None
+        if account is None:
+            raise HttpError(HTTPStatus.UNAUTHORIZED, "Chưa đăng nhập hoặc phiên đã hết hạn.")
+        if role is str: return token.strip()
+        if not isinstance(account, role):
+            raise HttpError(HTTPStatus.FORBIDDEN, "Tài khoản không có quyền dùng chức năng này.")
+        return account
+
+    # --- ĐĂNG NHẬP ---
+
+    async def login(self, _, data, query):
+        username, password = _text(data, "username", True), data.get("password")
+        if not isinstance(password, str): raise HttpError(HTTPStatus.BAD_REQUEST, "Thiếu trường 'password'.")
+        role = data.get("role", "member")
+        if role not in ("member", "admin"): raise HttpError(HTTPStatus.BAD_REQUEST, "'role' phải là member hoặc admin.")
+        # Tính hash (và nạp danh bạ lazy của member) trên luồng xử lý, cả ở chế độ nhiều tiến trình
+        _, token = await self.run(self.system.login_account, username, password, role)
+        if not token: raise HttpError(HTTPStatus.UNAUTHORIZED, "Tên đăng nhập hoặc mật khẩu không đúng.")
+        await self.run_io(self.system.write_log, f"{role.capitalize()} '{username}' login (api).")
+        return {"token": token, "role": role}
+
+    async def logout(self, token, data, query):
+        self.system.end_session(token)
+        return {"ok": True}
+
+    # --- LIÊN HỆ ---
+
+    async def list_contacts(self, mem, data, query):
+        return await self.run(lambda: [DataManager.contact_to_dict(c) for c in mem.snapshot().contacts])
+
+    async def add_contact(self, mem, data, query):
+        args = (_text(data, "name", True), _phone(_text(data, "phone", True)), _text(data, "email") or "",
+                _text(data, "address") or "", _text(data, "notes") or "")
+        contact = await self.run(mem.add_contact, *args)
+        await self.commit(f"{mem.username} added contact.")
+        return HTTPStatus.CREATED, await self.run(_contact, mem, contact)
+
+    async def view_contact(self, mem, data, query, contact_id):
+        if not await self.run(mem.view_contact_detail, contact_id):
+            raise HttpError(HTTPStatus.NOT_FOUND, "Không tìm thấy liên hệ.")
+        await self.commit()
+        return await self.run(lambda: _contact(mem, mem.get_contact(contact_id)))
+
+    async def edit_contact(self, mem, data, query, contact_id):
+        args = (_text(data, "name") or None, _phone(_text(data, "phone") or None),
+                _text(data, "email") or None, _text(data, "notes") or None)
+        if not await self.run(mem.edit_contact_details, contact_id, *args):
+            raise HttpError(HTTPStatus.NOT_FOUND, "Không tìm thấy liên hệ.")
+        await self.commit()
+        return await self.run(lambda: _contact(mem, mem.get_contact(contact_id)))
+
+    async def delete_contact(self, mem, data, query, contact_id):
+        if await self.run(mem.get_contact, contact_id) is None:
+            raise HttpError(HTTPStatus.NOT_FOUND, "Không tìm thấy liên hệ.")
+        await self.run(mem.delete_contact, contact_id)
+        await self.commit(f"{mem.username} deleted contact.")
+        return {"ok": True}
+
+    async def search(self, mem, data, query):
+        limit = _int(query.get("limit", 10), "limit")
+        if not {"phone", "prefix", "q"} & query.keys():
+            raise HttpError(HTTPStatus.BAD_REQUEST, "Cần một trong các tham số q, prefix, phone.")
+        def work():
+            if "phone" in query: found = mem.find_contacts_by_phone(query["phone"])
+            elif "prefix" in query: found = mem.suggest_contacts(query["prefix"], limit)
+            else:
+                found = mem.search_contact_by_name(query["q"])
+                if not found:
+                    similar = mem.fuzzy_search_contacts(query["q"], limit=limit)
+                    return {"results": [], "suggestions": [DataManager.contact_to_dict(c) for c in similar]}
+            return {"results": [DataManager.contact_to_dict(c) for c in found]}
+        return await self.run(work)
+
+    async def recent(self, mem, data, query):
+        limit = _int(query["limit"], "limit") if "limit" in query else None
+        return await self.run(lambda: [DataManager.contact_to_dict(c) for c in mem.get_recent_contacts(limit)])
+
+    # --- NHÓM ---
+
+    async def _group(self, mem, group_id):
+        group = await self.run(mem.get_group, group_id)
+        if group is None: raise HttpError(HTTPStatus.NOT_FOUND, "Không tìm thấy nhóm.")
+        return group
+
+    async def list_groups(self, mem, data, query):
+        return await self.run(lambda: [DataManager.group_to_dict(g) for g in mem.snapshot().groups])
+
+    async def create_group(self, mem, data, query):
+        group = await self.run(mem.create_group, _text(data, "name", True))
+        await self.commit()
+        return HTTPStatus.CREATED, DataManager.group_to_dict(group)
+
+    async def rename_group(self, mem, data, query, group_id):
+        name = _text(data, "name", True)
+        await self._group(mem, group_id)
+        await self.run(mem.rename_group, group_id, name)
+        await self.commit()
+        return DataManager.group_to_dict(await self._group(mem, group_id))
+
+    async def remove_group(self, mem, data, query, group_id):
+        await self._group(mem, group_id)
+        await self.run(mem.remove_group, group_id)
+        await self.commit()
+        return {"ok": True}
+
+    async def group_contacts(self, mem, data, query, group_id):
+        await self._group(mem, group_id)
+        return await self.run(lambda: [DataManager.contact_to_dict(c) for c in mem.get_contacts_in_group(group_id)])
+
+    async def add_to_group(self, mem, data, query, group_id):
+        await self._group(mem, group_id)
+        contact_id = _int(data.get("contact_id"), "contact_id")
+        if await self.run(mem.get_contact, contact_id) is None:
+            raise HttpError(HTTPStatus.NOT_FOUND, "Không tìm thấy liên hệ.")
+        if await self.run(mem.is_in_group, contact_id, group_id):
+            raise HttpError(HTTPStatus.CONFLICT, "Liên hệ đã ở trong nhóm.")
+        await self.run(mem.add_contact_to_group, contact_id, group_id)
+        await self.commit()
+        return HTTPStatus.CREATED, {"contact_id": contact_id, "group_id": group_id}
+
+    async def remove_from_group(self, mem, data, query, group_id, contact_id):
+        if not await self.run(mem.remove_contact_from_group, contact_id, group_id):
+            raise HttpError(HTTPStatus.NOT_FOUND, "Liên hệ không ở trong nhóm.")
+        await self.commit()
+        return {"ok": True}
+
+    # --- ADMIN ---
+
+    def _member(self, member_id):
+        mem = self.system.get_member(member_id)
+        if mem is None: raise HttpError(HTTPStatus.NOT_FOUND, "Không tìm thấy User ID này.")
+        return mem
+
+    async def list_members(self, admin, data, query):
+        return await self.run(lambda: [_account(m) for m in self.system.list_members()])
+
+    async def create_member(self, admin, data, query):
+        username, password = _text(data, "username", True), data.get("password")
+        if not isinstance(password, str) or not password:
+            raise HttpError(HTTPStatus.BAD_REQUEST, "Thiếu trường 'password'.")
+        # create_member kiểm tra lại tên sau khi băm mật khẩu, trong cùng lần giữ khóa với lúc thêm
+        mem = await self.run(self.system.create_member, username, password, _text(data, "email") or "")
+        if mem is None: raise HttpError(HTTPStatus.CONFLICT, "Trùng tên.")
+        await self.run_io(self.system.write_log, f"Admin created user {username}.")
+        return HTTPStatus.CREATED, _account(mem)
+
+    async def delete_member(self, admin, data, query, member_id):
+        mem = self._member(member_id)
+        await self.run(self.system.remove_member, mem)
+        await self.commit(f"Admin deleted user {mem.username}.")
+        return {"ok": True}
+
+    async def member_contacts(self, admin, data, query, member_id):
+        mem = self._member(member_id)
+        snap = await self.run_io(mem.snapshot)  # Có thể phải nạp danh bạ lazy
+        return {"username": mem.username,
+                "contacts": [DataManager.contact_to_dict(c) for c in snap.contacts],
+                "groups": [DataManager.group_to_dict(g) for g in snap.groups]}
+
+    async def logs(self, admin, data, query):
+        page = _int(query.get("page", 0), "page")
+        size = _int(query.get("size", LOG_PAGE_SIZE), "size")
+        if page < 0 or size <= 0: raise HttpError(HTTPStatus.BAD_REQUEST, "'page' >= 0 và 'size' > 0.")
+        return {"page": page, "lines": await self.run_io(self.system.system_log.page, page, size)}
+
+
+async def serve(system, host, port):
+    """Chạy dịch vụ cho đến khi bị dừng (Ctrl+C)."""
+    server = PhoneBookServer(system)
+    listener = await server.start(host, port)
+    print(f"✅ PhoneBook API đang chạy tại http://{host}:{listener.sockets[0].getsockname()[1]}")
+    try:
+        async with listener: await listener.serve_forever()
+    finally:
+        server.close()
+
+
+if __name__ == "__main__":
+    from main import open_system
+    parser = argparse.ArgumentParser(description="Dịch vụ JSON/HTTP cục bộ cho PhoneBook")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--shards", type=int, default=None,
+                        help="Số tiến trình shard (mặc định PHONEBOOK_SHARDS hoặc 0 = một tiến trình)")
+    args = parser.parse_args()
+    try:
+        system = open_system(args.shards, quiet=True)
+    except (DataLoadError, ValueError) as e:
+        print(f"❌ {e}")
+        raise SystemExit(1)
+    try:
+        asyncio.run(serve(system, args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        system.write_log("Server shutdown.")
+        system.save_changes()
+        system.shutdown()
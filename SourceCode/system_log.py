@@ -0,0 +1,139 @@
+"""
+Log hệ thống: bộ đệm vòng trong bộ nhớ cho màn hình admin và file log riêng chỉ ghi nối,
+tự xoay vòng theo kích thước (không nằm trong file dữ liệu chính).
+"""
+import itertools
+import os
+import threading
+from collections import deque
+
+LOG_FILE = "phonebook_system.log"
+LOG_MAX_BYTES = 1024 * 1024   # File log lớn hơn ngưỡng này được đổi tên thành .1, .2, ...
+LOG_BACKUPS = 3               # Số file log cũ được giữ lại
+LOG_CAPACITY = 100            # Số dòng log gần nhất giữ trong bộ nhớ
+READ_BLOCK = 64 * 1024        # Đọc file log ngược từ cuối theo khối
+
+
+class SystemLog:
+    """
+    Log hệ thống gồm bộ đệm vòng (deque có maxlen, thêm O(1)) và file log chỉ ghi nối.
+
+    Khi dòng mới sẽ làm file vượt max_bytes, file được đổi tên thành "<file>.1" (các file cũ lùi thành .2, .3...,
+    file thứ backups + 1 bị xóa) và ghi tiếp vào file mới. Đọc theo trang đi ngược từ
+    cuối file nên chi phí chỉ tỉ lệ với số dòng của các trang đã lật qua.
+    """
+    def __init__(self, path=None, capacity=LOG_CAPACITY, max_bytes=LOG_MAX_BYTES, backups=LOG_BACKUPS):
+        """
+        Args:
+            path (str, optional): File log, mặc định LOG_FILE.
+            capacity (int): Số dòng gần nhất giữ trong bộ nhớ.
+            max_bytes (int): Kích thước tối đa của file log trước khi xoay vòng.
+            backups (int): Số file log cũ được giữ lại.
+        """
+        self.path = path or LOG_FILE
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self.recent = deque(maxlen=capacity)  # Các dòng gần nhất, cũ -> mới
+        self.lock = threading.Lock()
+        self.file = None  # Mở khi ghi lần đầu
+        # Nạp lại các dòng gần nhất từ file khi khởi động
+        self.recent.extend(reversed(list(itertools.islice(self.iter_newest(), capacity))))
+
+    def exists(self):
+        return os.path.exists(self.path)
+
+    def files(self):
+        """Các file log hiện có, mới -> cũ."""
+        paths = [self.path] + [f"{self.path}.{i}" for i in range(1, self.backups + 1)]
+        return [p for p in paths if os.path.exists(p)]
+
+    # --- GHI ---
+
+    def write(self, line):
+        """Thêm một dòng log (vào bộ đệm vòng và cuối file log)."""
+        line = line.replace("\n", " ")
+        data = (line + "\n").encode("utf-8")
+        with self.lock:
+            self.recent.append(line)
+            if self.file is None:
+                self.file = open(self.path, "ab")
+            # Xoay vòng trước khi dòng mới làm file vượt max_bytes
+            if self.file.tell() and self.file.tell() + len(data) > self.max_bytes: self._rotate()
+            self.file.write(data)
+            self.file.flush()
+
+    def extend(self, lines):
+        """Ghi nhiều dòng."""
+        for line in lines: self.write(line)
+
+    def adopt(self, lines):
+        """
+        Chuyển log cũ còn nằm trong file dữ liệu (trước khi có file log riêng) sang file log.
+        Chỉ chạy một lần: bỏ qua nếu file log đã tồn tại.
+
+        Returns:
+            bool: True nếu đã chuyển.
+        """
+        if not lines or self.exists(): return False
+        self.extend(lines)
+        return True
+
+    def _rotate(self):
+        self.file.close()
+        oldest = f"{self.path}.{self.backups}"
+        if os.path.exists(oldest): os.remove(oldest)
+        for i in range(self.backups - 1, 0, -1):
+            if os.path.exists(f"{self.path}.{i}"): os.replace(f"{self.path}.{i}", f"{self.path}.{i + 1}")
+        if self.backups > 0: os.replace(self.path, f"{self.path}.1")
+        else: os.remove(self.path)
+        self.file = open(self.path, "ab")
+
+    def close(self):
+        with self.lock:
+            if self.file is not None:
+                self.file.close()
+                self.file = None
+
+    # --- ĐỌC ---
+
+    @staticmethod
+    def _reverse_lines(path):
+        """Các dòng của một file, từ cuối lên đầu, đọc theo khối từ cuối file."""
+        with open(path, "rb") as f:
+            pos = f.seek(0, os.SEEK_END)
+            tail = b""
+            while pos > 0:
+                step = min(READ_BLOCK, pos)
+                pos -= step
+                f.seek(pos)
+                parts = (f.read(step) + tail).split(b"\n")
+                tail = parts[0]  # Có thể là nửa sau của một dòng nằm ở khối trước
+                for part in reversed(parts[1:]):
+                    if part: yield part.decode("utf-8", "replace")
+            if tail: yield tail.decode("utf-8", "replace")
+
+    def iter_newest(self):
+        """Mọi dòng log đã lưu, mới nhất trước, qua cả các file đã xoay vòng."""
+        with self.lock:
+            if self.file is not None: self.file.flush()
+            paths = self.files()
+        for path in paths:
+            yield from self._reverse_lines(path)
+
+    def page(self, number, size=20):
+        """
+        Lấy một trang log, trang 0 là các dòng mới nhất.
+
+        Args:
+            number (int): Số thứ tự trang (0 = mới nhất).
+            size (int): Số dòng mỗi trang.
+
+        Returns:
+            list[str]: Các dòng của trang theo thứ tự thời gian (cũ -> mới), rỗng nếu đã hết.
+        """
+        start, stop = number * size, (number + 1) * size
+        with self.lock:
+            # Trang nằm trọn trong bộ đệm vòng: không cần đọc file
+            if stop <= len(self.recent):
+                return list(itertools.islice(reversed(self.recent), start, stop))[::-1]
+        return list(itertools.islice(self.iter_newest(), start, stop))[::-1]
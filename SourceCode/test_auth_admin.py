@@ -4,22 +4,23 @@ from models import Member, Admin
 
 # ============================================================
 # MODULE: AUTHENTICATION & ADMIN (Mã: AUTH)
-# Tổng số Test Case: 16
+# Tổng số Test Case: 27
 # ============================================================
 
 # --- GROUP 1: PASSWORD SECURITY (4 Cases) ---
 def test_01_password_hashing_creation():
-    """[AUTH_TC01] Kiểm tra mật khẩu được hash ngay khi tạo."""
+    """[AUTH_TC01] Kiểm tra mật khẩu được hash (PBKDF2) ngay khi tạo."""
     raw = "123456"
     mem = Member(1, "user", raw, "mail")
     assert mem.password != raw
-    assert len(mem.password) == 64
+    assert mem.password.startswith("pbkdf2_sha256$")
 
 def test_02_password_hashing_consistency():
-    """[AUTH_TC02] Cùng input mật khẩu phải ra cùng mã hash."""
+    """[AUTH_TC02] Cùng mật khẩu ra hash khác nhau (salt) nhưng đều đăng nhập được."""
     mem1 = Member(1, "u1", "abc", "m1")
     mem2 = Member(2, "u2", "abc", "m2")
-    assert mem1.password == mem2.password
+    assert mem1.password != mem2.password
+    assert mem1.login("abc") and mem2.login("abc")
 
 def test_03_password_hashing_diff():
     """[AUTH_TC03] Khác input mật khẩu phải ra khác mã hash."""
@@ -30,7 +31,7 @@ def test_03_password_hashing_diff():
 def test_04_admin_hashing():
     """[AUTH_TC04] Admin password cũng phải được hash."""
     adm = Admin(1, "ad", "pass")
-    assert len(adm.password) == 64
+    assert adm.password.startswith("pbkdf2_sha256$") and "pass" not in adm.password
 
 # --- GROUP 2: MEMBER LOGIN (7 Cases) ---
 def test_05_mem_login_success():
@@ -94,4 +95,150 @@ def test_15_admin_init_id():
 def test_16_admin_username_check():
     """[AUTH_TC16] Kiểm tra username Admin lưu đúng."""
     adm = Admin(1, "superadmin", "123")
-    assert adm.username == "superadmin"
\ No newline at end of file
+    assert adm.username == "superadmin"
+
+# --- GROUP 4: ACCOUNT LOOKUP (3 Cases) ---
+@pytest.fixture
+def app(tmp_path, monkeypatch):
+    """PhoneBookSystem với dữ liệu mẫu, chạy trong thư mục tạm."""
+    from main import PhoneBookSystem
+    monkeypatch.chdir(tmp_path)
+    system = PhoneBookSystem(storage="json")
+    yield system
+    system.shutdown()
+
+def test_17_lookup_maps_built_on_load(app):
+    """[AUTH_TC17] Bản đồ username/ID được dựng khi khởi động."""
+    mem = app.members[0]
+    assert app.find_member("sinhvien") is mem and app.get_member(mem.member_id) is mem
+    assert app.find_admin("admin") is app.admins[0]
+    assert app.find_member("admin") is None and app.find_admin("sinhvien") is None
+
+def test_18_lookup_maps_follow_create_delete(app):
+    """[AUTH_TC18] Tạo/xóa member cập nhật bản đồ tra cứu."""
+    new = Member(app.member_ids.allocate(), "moi", "1", "e")
+    app.add_member(new)
+    assert app.find_member("moi") is new and app.get_member(new.member_id) is new
+    app.remove_member(new)
+    assert app.find_member("moi") is None and app.get_member(new.member_id) is None
+    assert new not in app.members
+
+def test_19_login_flow_uses_lookup(app, monkeypatch):
+    """[AUTH_TC19] Đăng nhập tìm tài khoản qua bản đồ; user không tồn tại thì thất bại."""
+    answers = iter(["sinhvien", "123", "0", "khongco", "123", ""])
+    monkeypatch.setattr("builtins.input", lambda *_: next(answers))
+    app.login_member_flow()                      # Đăng nhập rồi đăng xuất ngay
+    assert app.logs[-1].endswith("Member 'sinhvien' login.")
+    app.login_member_flow()
+    assert app.current_user is None and app.logs[-1].endswith("Member 'sinhvien' login.")
+
+# --- GROUP 5: PASSWORD POOL & SESSION (4 Cases) ---
+def test_20_legacy_sha256_upgraded_on_login(monkeypatch):
+    """[AUTH_TC20] Hash SHA-256 cũ vẫn đăng nhập được và được băm lại bằng PBKDF2."""
+    legacy = hashlib.sha256(b"123").hexdigest()
+    events = []
+    monkeypatch.setattr(Member, "listener", lambda m, op, data: events.append((op, data)))
+    mem = Member(1, "sv", legacy, "mail")
+    assert mem.password == legacy
+    assert mem.login("wrong") is False and mem.password == legacy
+    assert mem.login("123") is True
+    assert mem.password.startswith("pbkdf2_sha256$") and mem.login("123") is True
+    assert [op for op, _ in events] == ["account"] and events[0][1]["account"]["password"] == mem.password
+    adm = Admin(1, "ad", hashlib.sha256(b"pass").hexdigest())
+    assert adm.login("pass") and adm.password.startswith("pbkdf2_sha256$")
+
+def test_21_work_factor_upgrade(monkeypatch):
+    """[AUTH_TC21] Tăng hệ số công việc: hash ít vòng lặp được băm lại khi đăng nhập."""
+    import auth
+    mem = Member(1, "sv", "123", "mail")
+    monkeypatch.setattr(auth, "PBKDF2_ITERATIONS", auth.PBKDF2_ITERATIONS * 2)
+    assert mem.login("123") is True
+    assert mem.password.split("$")[1] == str(auth.PBKDF2_ITERATIONS)
+
+def test_22_auth_service_session_tokens():
+    """[AUTH_TC22] Đăng nhập qua pool cấp token; token dùng lại được, đăng xuất/hết hạn thì mất hiệu lực."""
+    from auth import AuthService
+    service = AuthService(workers=2)
+    try:
+        mem = Member(1, "sv", "123", "mail")
+        assert service.login(mem, "sai") is None and service.login(None, "123") is None
+        token = service.login(mem, "123")
+        assert service.authenticate(token) is mem and service.authenticate("khong-co") is None
+        service.logout(token)
+        assert service.authenticate(token) is None
+        service.sessions.ttl = 0
+        assert service.authenticate(service.login(mem, "123")) is None
+    finally:
+        service.close()
+
+def test_23_auth_service_backpressure():
+    """[AUTH_TC23] Hàng đợi xác thực đầy thì báo AuthBusyError thay vì xếp hàng vô hạn."""
+    import threading
+    from auth import AuthService, AuthBusyError
+    service = AuthService(workers=1, max_pending=1, queue_wait=0.05)
+    gate = threading.Event()
+    try:
+        blocked = service.submit(gate.wait)
+        with pytest.raises(AuthBusyError):
+            service.login(Member(1, "sv", "123", "mail"), "123")
+        gate.set()
+        blocked.result(5)
+        assert service.login(Member(1, "sv", "123", "mail"), "123") is not None
+    finally:
+        gate.set()
+        service.close()
+
+# --- GROUP 6: SYSTEM LOG (4 Cases) ---
+def test_24_system_log_ring_buffer(tmp_path):
+    """[AUTH_TC24] Bộ đệm vòng chỉ giữ `capacity` dòng mới nhất, file log giữ đủ."""
+    from system_log import SystemLog
+    log = SystemLog(str(tmp_path / "sys.log"), capacity=5)
+    for i in range(12): log.write(f"dong {i}")
+    assert list(log.recent) == [f"dong {i}" for i in range(7, 12)]
+    assert len(list(log.iter_newest())) == 12
+    log.close()
+
+def test_25_system_log_rotation(tmp_path):
+    """[AUTH_TC25] File log xoay vòng theo kích thước và chỉ giữ `backups` file cũ."""
+    from system_log import SystemLog
+    path = str(tmp_path / "sys.log")
+    log = SystemLog(path, capacity=5, max_bytes=100, backups=2)
+    for i in range(60): log.write(f"dong so {i:03d}")
+    log.close()
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["sys.log", "sys.log.1", "sys.log.2"]
+    assert all(p.stat().st_size <= 100 for p in tmp_path.iterdir())
+    newest = list(log.iter_newest())
+    assert newest[0] == "dong so 059"
+    assert newest == [f"dong so {i:03d}" for i in range(59, 59 - len(newest), -1)]
+
+def test_26_system_log_paging(tmp_path, monkeypatch):
+    """[AUTH_TC26] Xem log theo trang: trang 0 mới nhất, lật qua cả file đã xoay vòng."""
+    import system_log
+    from system_log import SystemLog
+    monkeypatch.setattr(system_log, "READ_BLOCK", 16)  # Ép đọc nhiều khối
+    log = SystemLog(str(tmp_path / "sys.log"), capacity=4, max_bytes=200, backups=5)
+    for i in range(50): log.write(f"dong {i:02d}")
+    assert log.page(0, 4) == ["dong 46", "dong 47", "dong 48", "dong 49"]  # Từ bộ đệm vòng
+    assert log.page(1, 4) == ["dong 42", "dong 43", "dong 44", "dong 45"]  # Từ file
+    assert log.page(2, 20) == ["dong 00", "dong 01", "dong 02", "dong 03", "dong 04",
+                               "dong 05", "dong 06", "dong 07", "dong 08", "dong 09"]
+    assert log.page(3, 20) == []
+    log.close()
+
+def test_27_system_log_not_in_data_file(app):
+    """[AUTH_TC27] Log ghi vào file log riêng (không vào file dữ liệu) và được nạp lại khi khởi động."""
+    import json
+    from main import PhoneBookSystem
+    from system_log import LOG_FILE
+    app.write_log("Test log rieng")
+    app.save_changes()
+    with open("phonebook_data.json", encoding="utf-8") as f:
+        assert json.load(f)["logs"] == []
+    with open(LOG_FILE, encoding="utf-8") as f:
+        assert "Test log rieng" in f.read()
+    app.shutdown()
+    again = PhoneBookSystem(storage="json")
+    try:
+        assert again.logs[-1].endswith("Test log rieng")
+    finally:
+        again.shutdown()
\ No newline at end of file
@@ -0,0 +1,212 @@
+import asyncio
+import json
+import os
+import pytest
+import cluster
+from cluster import ShardRouter, ShardError, ClusterSystem, RemoteMember, CLUSTER_DIR
+from data import DataManager
+from models import Member
+
+# ============================================================
+# MODULE: MULTI-PROCESS SHARDING (Mã: CLUSTER)
+# Tổng số Test Case: 10
+# ============================================================
+
+@pytest.fixture
+def router(tmp_path, monkeypatch):
+    """ShardRouter 2 tiến trình trong thư mục tạm."""
+    monkeypatch.chdir(tmp_path)
+    r = ShardRouter(2)
+    yield r
+    r.close()
+
+# --- GROUP 1: ROUTING (3 Cases) ---
+def test_01_members_partitioned_by_id(router):
+    """[CLUSTER_TC01] Member mới được chia đều, ID thuộc đúng shard; danh sách user gom từ mọi shard."""
+    accounts = [router.create_member(f"u{i}", "pw", f"u{i}@x.com") for i in range(4)]
+    assert sorted(a["member_id"] % 2 for a in accounts) == [0, 0, 1, 1]
+    assert len({a["member_id"] for a in accounts}) == 4
+    assert router.create_member("u0", "pw") is None  # Trùng tên trên toàn cụm
+    listed = router.list_members()
+    assert [a["member_id"] for a in listed] == sorted(a["member_id"] for a in accounts)
+    for a in accounts:
+        with open(os.path.join(CLUSTER_DIR, f"shard_{a['member_id'] % 2}", "phonebook_data.json"), encoding="utf-8") as f:
+            assert a["username"] in [m["username"] for m in json.load(f)["members"]]
+
+def test_02_member_calls_go_to_owner(router):
+    """[CLUSTER_TC02] Thao tác danh bạ chạy trên shard sở hữu member và trả về dict."""
+    a = router.create_member("a", "pw")["member_id"]
+    b = router.create_member("b", "pw")["member_id"]
+    assert router.call(a, "add_contact", "Nguyễn An", "0901")["contact_id"] == 1
+    router.call(a, "create_group", "Bạn")
+    router.call(a, "add_contact_to_group", 1, 1)
+    assert router.add_contacts(b, [("Bình", "0902", "", "", ""), ("Bích", "0903", "", "", "")]) == 2
+    assert [c["name"] for c in router.call(a, "search_contact_by_name", "nguyen")] == ["Nguyễn An"]
+    assert [c["name"] for c in router.call(b, "suggest_contacts", "bi")] == ["Bích", "Bình"]
+    assert router.call(a, "search_contact_by_name", "bich") == []  # Không lẫn dữ liệu giữa member
+    snap = router.call(a, "snapshot")
+    assert snap["memberships"][0]["group_id"] == 1 and snap["groups"][0]["group_name"] == "Bạn"
+    assert {m["member_id"]: m["contact_count"] for m in router.list_members()} == {a: 1, b: 2}
+
+def test_03_errors_are_returned(router):
+    """[CLUSTER_TC03] Member không tồn tại hoặc hàm không được phép báo ShardError; lỗi của hàm được chuyển về."""
+    a = router.create_member("a", "pw")["member_id"]
+    with pytest.raises(ShardError):
+        router.call(999, "get_contact", 1)
+    with pytest.raises(ShardError):
+        router.call(a, "set_password", "x")
+    with pytest.raises(TypeError):
+        router.call(a, "add_contact")  # Thiếu tham số
+    assert router.call(a, "get_recent_contacts") == []  # Shard vẫn chạy sau lỗi
+
+# --- GROUP 2: ACCOUNTS & PERSISTENCE (3 Cases) ---
+def test_04_login_and_sessions(router):
+    """[CLUSTER_TC04] Đăng nhập member/admin qua shard; xóa member hủy phiên của nó."""
+    a = router.create_member("a", "pw")["member_id"]
+    assert router.login("a", "sai") is None and router.login("khongco", "pw") is None
+    token = router.login("a", "pw")
+    assert router.authenticate(token) == ("member", a)
+    assert router.authenticate(router.login("admin", "123456", "admin")) == ("admin", "admin")
+    router.delete_member(a)
+    assert router.authenticate(token) is None and router.find_member("a") is None
+    assert router.list_members() == []
+
+def test_05_data_persists_per_shard(tmp_path, monkeypatch):
+    """[CLUSTER_TC05] Dữ liệu mỗi shard được lưu và nạp lại; mở với số shard khác bị từ chối."""
+    monkeypatch.chdir(tmp_path)
+    r = ShardRouter(2)
+    a = r.create_member("a", "pw")["member_id"]
+    r.call(a, "add_contact", "An", "1")
+    r.close()
+    r = ShardRouter(2)
+    try:
+        assert r.find_member("a") == a and r.call(a, "get_contact", 1)["name"] == "An"
+        assert r.login("a", "pw") is not None
+        b = r.create_member("b", "pw")["member_id"]
+        assert b % 2 != a % 2  # Vào shard đang ít member hơn
+    finally:
+        r.close()
+    with pytest.raises(ValueError):
+        ShardRouter(3)
+
+def test_06_existing_data_is_partitioned(tmp_path, monkeypatch):
+    """[CLUSTER_TC06] Lần chạy đầu, dữ liệu một tiến trình có sẵn được chia vào các shard theo member_id."""
+    monkeypatch.chdir(tmp_path)
+    DataManager.configure("json")
+    members = [Member(101 + i, f"user{i}", "pw", "") for i in range(5)]
+    for m in members: m.add_contact(f"C{m.member_id}", "1")
+    DataManager.save_data([], members, [], 106)
+    r = ShardRouter(2)
+    try:
+        assert [a["member_id"] for a in r.list_members()] == [101, 102, 103, 104, 105]
+        assert r.call(104, "get_contact", 1)["name"] == "C104"
+        assert r.login("user3", "pw") is not None
+        assert r.create_member("moi", "pw")["member_id"] >= 106
+    finally:
+        r.close()
+
+# --- GROUP 3: MENU & SERVER (3 Cases) ---
+def test_07_cluster_system_for_menu(tmp_path, monkeypatch, capsys):
+    """[CLUSTER_TC07] ClusterSystem có cùng các hàm tài khoản/danh bạ menu dùng; dòng in trong shard hiện ra console."""
+    monkeypatch.chdir(tmp_path)
+    system = ClusterSystem(2, storage="json")
+    try:
+        mem = system.create_member("a", "pw", "a@x.com")
+        assert isinstance(mem, RemoteMember) and system.create_member("a", "pw") is None
+        user, token = system.login_account("a", "pw")
+        assert user == mem and system.authenticate(token) == mem
+        assert system.login_account("a", "sai") == (None, None)
+        contact = user.add_contact("Nguyễn An", "0901")
+        group = user.create_group("Bạn")
+        user.add_contact_to_group(contact.contact_id, group.group_id)
+        assert [c.name for c in user.search_contact_by_name("nguyen")] == ["Nguyễn An"]
+        assert [g.group_name for g in user.groups] == ["Bạn"]
+        assert list(user.iter_export())[0][1] == ["Bạn"]
+        capsys.readouterr()
+        assert user.view_contact_detail(contact.contact_id)
+        assert "Nguyễn An" in capsys.readouterr().out  # In trong tiến trình shard, hiện ở tiến trình chính
+        assert {m.username: m.contact_count for m in system.list_members()} == {"sinhvien": 1, "a": 1}  # Có dữ liệu mẫu
+        system.remove_member(mem)
+        assert system.authenticate(token) is None and system.find_member("a") is None
+        system.index_accounts()  # Hàm kế thừa: chuyển cho router hoặc báo lỗi rõ ràng
+        with pytest.raises(NotImplementedError): system.add_member(Member(999, "b", "pw", ""))
+        with pytest.raises(NotImplementedError): system.find_admin("admin")
+    finally:
+        system.shutdown()
+
+def test_08_unknown_username_still_hashes(router, monkeypatch):
+    """[CLUSTER_TC08] Đăng nhập với username không tồn tại vẫn kiểm tra mật khẩu với hash giả (không lộ qua thời gian)."""
+    checked = []
+    real = cluster.verify_password
+    monkeypatch.setattr(cluster, "verify_password", lambda p, h: checked.append(p) or real(p, h))
+    assert router.login("khongco", "pw") is None
+    assert checked == ["pw"]
+
+def test_09_server_and_switch(tmp_path, monkeypatch):
+    """[CLUSTER_TC09] PHONEBOOK_SHARDS bật chế độ nhiều tiến trình; server.py chạy trên ClusterSystem."""
+    from main import open_system, PhoneBookSystem
+    from server import PhoneBookServer
+    from test_server import call, login
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setenv("PHONEBOOK_SHARDS", "2")
+    system = open_system(quiet=True, storage="json")
+    assert isinstance(system, ClusterSystem) and system.router.count == 2
+    server = PhoneBookServer(system)
+    async def main():
+        listener = await server.start("127.0.0.1", 0)
+        port = listener.sockets[0].getsockname()[1]
+        try:
+            admin = await login(port, "admin", "123456", "admin")
+            assert (await call(port, "POST", "/admin/members", {"username": "a", "password": "pw"}, admin))[0] == 201
+            token = await login(port, "a", "pw")
+            assert (await call(port, "GET", "/admin/members", token=token))[0] == 403
+            assert (await call(port, "POST", "/contacts", {"name": "An", "phone": "0901"}, token))[0] == 201
+            assert (await call(port, "POST", "/groups", {"name": "Bạn"}, token))[0] == 201
+            assert (await call(port, "POST", "/groups/1/contacts", {"contact_id": 1}, token))[0] == 201
+            assert (await call(port, "POST", "/groups/9/contacts", {"contact_id": 1}, token))[0] == 404
+            status, found = await call(port, "GET", "/search?q=an", token=token)
+            assert status == 200 and [c["name"] for c in found["results"]] == ["An"]
+            status, found = await call(port, "GET", "/search?q=Anh%20Bb", token=token)
+            assert status == 200 and found["results"] == []
+        finally:
+            listener.close()
+            await listener.wait_closed()
+    try:
+        asyncio.run(main())
+    finally:
+        server.close()
+        system.shutdown()
+    monkeypatch.setenv("PHONEBOOK_SHARDS", "0")
+    system = open_system(storage="json")
+    try: assert type(system) is PhoneBookSystem
+    finally:
+        system.shutdown()
+        DataManager.configure("json")
+
+# --- GROUP 4: EXPORT (1 Case) ---
+def test_10_export_streams_from_shard(router, monkeypatch):
+    """[CLUSTER_TC10] Xuất danh bạ lấy từng trang từ shard sở hữu (cùng một snapshot); dừng giữa chừng thì hủy lần xuất."""
+    from contact_export import export_contacts
+    monkeypatch.setattr(cluster, "EXPORT_PAGE", 2)
+    a = router.create_member("a", "pw")["member_id"]
+    router.add_contacts(a, [(f"C{i}", f"09{i}", "", "", "") for i in range(5)])
+    router.call(a, "create_group", "Bạn")
+    router.call(a, "add_contact_to_group", 3, 1)
+    pages = []
+    real = cluster.ShardClient.submit
+    def submit(self, op, *args):
+        if op == "export_next": pages.append(op)
+        return real(self, op, *args)
+    monkeypatch.setattr(cluster.ShardClient, "submit", submit)
+    items = router.iter_export(a)
+    first = next(items)
+    router.call(a, "delete_contact", 5)  # Thay đổi sau khi bắt đầu xuất không lẫn vào file
+    rest = list(items)
+    assert [c.name for c, _ in [first] + rest] == ["C0", "C1", "C2", "C3", "C4"]
+    assert rest[1] == (rest[1][0], ["Bạn"]) and len(pages) == 4  # 3 trang có dữ liệu + 1 trang rỗng
+    assert router.shard_of(a).submit("export_next", 0, 1).exception() is not None  # Đã đóng khi hết
+    partial = router.iter_export(a)
+    next(partial); partial.close()  # Dừng giữa chừng: shard hủy lần xuất
+    with pytest.raises(ShardError):
+        router.shard_of(a).submit("export_next", 1, 1).result()
+    assert "".join(export_contacts(RemoteMember(router, a, "a"), "csv")).count("\n") == 5  # Header + 4 liên hệ
\ No newline at end of file
@@ -0,0 +1,181 @@
+import random
+import threading
+import time
+import pytest
+from concurrency import RWLock
+from data import DataManager
+from models import Member
+
+# ============================================================
+# MODULE: CONCURRENCY (Mã: CONC)
+# Tổng số Test Case: 7
+# ============================================================
+
+def run_threads(targets, timeout=60):
+    """Chạy các hàm trên luồng riêng, trả về danh sách lỗi (rỗng nếu tất cả chạy xong bình thường)."""
+    errors = []
+    def wrap(fn):
+        try: fn()
+        except BaseException as e: errors.append(e)
+    threads = [threading.Thread(target=wrap, args=(fn,)) for fn in targets]
+    for t in threads: t.start()
+    for t in threads: t.join(timeout)
+    assert not any(t.is_alive() for t in threads), "Có luồng bị treo (deadlock?)"
+    return errors
+
+# --- GROUP 1: READER/WRITER LOCK (3 Cases) ---
+def test_01_readers_share_writer_exclusive():
+    """[CONC_TC01] Nhiều luồng đọc cùng giữ khóa; luồng ghi phải chờ tất cả nhả ra."""
+    lock = RWLock()
+    inside = threading.Barrier(3, timeout=5)  # Chỉ qua được nếu 3 luồng đọc cùng ở trong khóa
+    release = threading.Event()
+    order = []
+    def read():
+        with lock.read():
+            inside.wait()
+            release.wait(5)
+            order.append("read")
+    def write():
+        inside_done.wait(5)
+        with lock.write(): order.append("write")
+    inside_done = threading.Event()
+    def opener():
+        while lock.readers < 3: time.sleep(0.001)
+        inside_done.set()
+        time.sleep(0.05)
+        release.set()
+    assert run_threads([read, read, read, write, opener]) == []
+    assert order == ["read", "read", "read", "write"]
+
+def test_02_writer_preference_and_reentrancy():
+    """[CONC_TC02] Luồng ghi đang chờ được ưu tiên hơn luồng đọc mới; khóa ghi lồng được."""
+    lock = RWLock()
+    order = []
+    lock.acquire_read()
+    writer = threading.Thread(target=lambda: (lock.acquire_write(), order.append("write"), lock.release()))
+    writer.start()
+    while not lock.waiting_writers: time.sleep(0.001)
+    late_reader = threading.Thread(target=lambda: (lock.acquire_read(), order.append("read"), lock.release()))
+    late_reader.start()
+    time.sleep(0.05)
+    assert order == []           # Luồng đọc mới không chen trước luồng ghi đang chờ
+    lock.acquire_read()          # Luồng đang đọc vẫn đọc lồng được (không tự khóa chết)
+    lock.release(); lock.release()
+    writer.join(5); late_reader.join(5)
+    assert order == ["write", "read"]
+
+    with lock.write():
+        with lock.write():
+            with lock.read(): assert lock.writer == threading.get_ident()
+    assert lock.writer is None and not lock.held
+
+def test_03_upgrade_is_rejected():
+    """[CONC_TC03] Nâng khóa đọc lên khóa ghi báo lỗi thay vì treo."""
+    lock = RWLock()
+    with lock.read():
+        with pytest.raises(RuntimeError):
+            lock.acquire_write()
+    with lock.write(): pass  # Khóa vẫn dùng được sau lỗi
+
+# --- GROUP 2: MEMBER SNAPSHOT (2 Cases) ---
+def test_04_snapshot_cached_until_change():
+    """[CONC_TC04] Bản chụp được dùng lại khi chưa đổi và không bị ảnh hưởng bởi thay đổi sau đó."""
+    m = Member(1, "u", "p", "e")
+    m.add_contact("An", "01"); m.create_group("G"); m.add_contact_to_group(1, 1)
+    snap = m.snapshot()
+    assert m.snapshot() is snap
+    assert [c.name for c in snap.contacts] == ["An"] and len(snap.memberships) == 1
+    m.delete_contact(1)
+    assert [c.name for c in snap.contacts] == ["An"] and len(snap.memberships) == 1
+    new = m.snapshot()
+    assert new is not snap and new.contacts == () and new.memberships == ()
+
+def test_05_members_do_not_contend():
+    """[CONC_TC05] Khi một member đang bị sửa, member khác vẫn đọc/ghi được ngay."""
+    a, b = Member(1, "a", "p", "e"), Member(2, "b", "p", "e")
+    done = threading.Event()
+    def other():
+        b.add_contact("X", "1")
+        b.search_contact_by_name("x")
+        done.set()
+    with a.lock.write():
+        t = threading.Thread(target=other); t.start()
+        assert done.wait(5)
+    t.join()
+
+# --- GROUP 3: STRESS (2 Cases) ---
+def test_06_stress_member_many_threads():
+    """[CONC_TC06] Nhiều luồng cùng sửa/tìm/chụp/lưu một member: không lỗi và chỉ mục vẫn khớp dữ liệu."""
+    m = Member(1, "u", "p", "e")
+    for g in range(5): m.create_group(f"Nhóm {g}")
+    stop = threading.Event()
+
+    def writer(seed):
+        rnd = random.Random(seed)
+        for i in range(300):
+            op = rnd.random()
+            if op < 0.5: m.add_contact(f"Người {seed}-{i}", f"09{seed}{i:04d}")
+            elif op < 0.7 and m.contacts: m.delete_contact(rnd.choice(m.snapshot().contacts).contact_id)
+            elif op < 0.9 and m.contacts:
+                m.add_contact_to_group(rnd.choice(m.snapshot().contacts).contact_id, rnd.randint(1, 5))
+            elif m.contacts:
+                c = rnd.choice(m.snapshot().contacts)
+                m.edit_contact_details(c.contact_id, name=f"Sửa {i}")
+                m.remove_contact_from_group(c.contact_id, rnd.randint(1, 5))
+
+    def reader_loop():
+        while not stop.is_set():
+            snap = m.snapshot()
+            ids = {c.contact_id for c in snap.contacts}
+            assert all(ms.contact_id in ids for ms in snap.memberships)  # Bản chụp nhất quán
+            m.search_contact_by_name("người")
+            m.suggest_contacts("sửa")
+            m.find_contacts_by_phone_suffix("1")
+            for g in range(1, 6): m.get_contacts_in_group(g)
+            m.get_recent_contacts(5)
+            DataManager.member_to_dict(m)  # Như luồng lưu nền
+
+    readers = [reader_loop for _ in range(4)]
+    writers = [lambda s=s: writer(s) for s in range(4)]
+    def writers_then_stop():
+        assert run_threads(writers) == []
+        stop.set()
+    errors = run_threads(readers + [writers_then_stop])
+    assert errors == []
+
+    # Chỉ mục khớp với dữ liệu cuối cùng
+    assert set(m.contact_index) == {c.contact_id for c in m.contacts}
+    for c in m.contacts:
+        assert c in m.search_contact_by_name(c.name)
+    for ms in m.memberships:
+        assert ms.contact_id in m.contact_index and m.is_in_group(ms.contact_id, ms.group_id)
+    assert m.lock.writer is None and m.lock.readers == 0
+
+def test_07_stress_system_accounts(tmp_path, monkeypatch):
+    """[CONC_TC07] Tạo/xóa tài khoản, lưu và xem danh sách user đồng thời trên PhoneBookSystem."""
+    from main import PhoneBookSystem
+    monkeypatch.chdir(tmp_path)
+    app = PhoneBookSystem(storage="json")
+    stop = threading.Event()
+    try:
+        def creator(k):
+            for i in range(40):
+                mem = Member(app.member_ids.allocate(), f"user{k}-{i}", "pw", "e")
+                app.add_member(mem)
+                mem.add_contact("A", "1")
+                if i % 2: app.remove_member(mem)
+        def lister():
+            while not stop.is_set():
+                members = app.list_members()
+                assert len({m.member_id for m in members}) == len(members)
+                app.flush_now()
+        def creators_then_stop():
+            assert run_threads([lambda k=k: creator(k) for k in range(3)]) == []
+            stop.set()
+        assert run_threads([lister, lister, creators_then_stop]) == []
+        assert len(app.list_members()) == 1 + 3 * 20
+        app.flush_now()
+        assert len(DataManager.load_data()[1]) == 1 + 3 * 20
+    finally:
+        app.shutdown()
+        DataManager.configure("json")
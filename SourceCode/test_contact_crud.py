@@ -1,9 +1,14 @@
+import csv
+import io
+import json
 import pytest
 from models import Member
+from contact_import import iter_csv, import_contacts, import_file
+from contact_export import export_contacts, export_file
 
 # ============================================================
 # MODULE: CONTACT MANAGEMENT (Mã: CRUD)
-# Tổng số Test Case: 18
+# Tổng số Test Case: 32
 # ============================================================
 
 # --- GROUP 1: ADD CONTACT (6 Cases) ---
@@ -132,4 +137,190 @@ def test_18_delete_removes_membership():
     m.create_group("G")
     m.add_contact_to_group(1, 1)
     m.delete_contact(1)
-    assert len(m.memberships) == 0
\ No newline at end of file
+    assert len(m.memberships) == 0
+
+# --- GROUP 4: CONTACT INDEX (2 Cases) ---
+def test_19_index_tracks_add_delete():
+    """[CRUD_TC19] Chỉ mục contact_id luôn đồng bộ khi thêm/xóa."""
+    m = Member(1, "u", "p", "e")
+    m.add_contact("A", "1"); m.add_contact("B", "2")
+    m.delete_contact(1)
+    assert m.get_contact(1) is None
+    assert m.get_contact(2).name == "B"
+    assert len(m.contact_index) == len(m.contacts)
+
+def test_20_rebuild_indexes_after_load():
+    """[CRUD_TC20] Dựng lại chỉ mục sau khi gán thẳng danh bạ (như khi nạp dữ liệu)."""
+    from models import Contact
+    m = Member(1, "u", "p", "e")
+    m.contacts = [Contact(7, "Loaded", "7")]
+    m.rebuild_indexes()
+    assert m.edit_contact_details(7, name="Edited") is True
+    assert m.contacts[0].name == "Edited"
+
+# --- GROUP 5: ID SEQUENCE (2 Cases) ---
+def test_21_contact_id_not_reused():
+    """[CRUD_TC21] ID liên hệ đã xóa không bị cấp lại."""
+    m = Member(1, "u", "p", "e")
+    m.add_contact("A", "1"); m.add_contact("B", "2")
+    m.delete_contact(2)
+    m.add_contact("C", "3")
+    assert m.contacts[1].contact_id == 3
+
+def test_22_reserve_id_block():
+    """[CRUD_TC22] Giữ trước một khối ID cho thêm hàng loạt."""
+    m = Member(1, "u", "p", "e")
+    block = m.contact_ids.reserve(5)
+    m.add_contact("A", "1")
+    assert list(block) == [1, 2, 3, 4, 5]
+    assert m.contacts[0].contact_id == 6
+
+# --- GROUP 6: COMPACT CONTACT (1 Case) ---
+def test_23_compact_contact_keeps_datetime_api():
+    """[CRUD_TC23] Contact dạng __slots__ vẫn đọc/ghi thời gian kiểu datetime."""
+    import datetime
+    m = Member(1, "u", "p", "e")
+    m.add_contact("A", "1")
+    c = m.contacts[0]
+    assert not hasattr(c, "__dict__")
+    assert c.updated_at is None and isinstance(c.created_at, datetime.datetime)
+    c.last_viewed_at = datetime.datetime(2024, 5, 6, 7, 8, 9)
+    assert c.last_viewed_at == datetime.datetime(2024, 5, 6, 7, 8, 9)
+
+# --- GROUP 7: BULK IMPORT (3 Cases) ---
+def test_24_bulk_add_contacts():
+    """[CRUD_TC24] Thêm hàng loạt: ID liên tiếp, có chỉ mục tìm kiếm, gán nhóm có sẵn."""
+    m = Member(1, "u", "p", "e")
+    m.create_group("Bạn")
+    added = m.add_contacts([("Nguyễn An", "0901", "", "", ""), ("Bình", "0902", "b@x.com", "", "", [1, 99])])
+    assert [c.contact_id for c in added] == [1, 2]
+    assert [c.name for c in m.search_contact_by_name("nguyen")] == ["Nguyễn An"]
+    assert m.find_contacts_by_phone("0902")[0].email == "b@x.com"
+    assert [c.contact_id for c in m.get_contacts_in_group(1)] == [2]  # Nhóm 99 không tồn tại bị bỏ qua
+    assert m.add_contact("C", "3").contact_id == 3
+
+def test_25_import_csv_in_batches():
+    """[CRUD_TC25] Nhập CSV theo lô: nhận tiêu đề tiếng Việt, chuẩn hóa SĐT, bỏ dòng lỗi, tạo nhóm theo tên."""
+    m = Member(1, "u", "p", "e")
+    m.create_group("Gia đình")
+    data = "Họ tên;SĐT;Email;Nhóm\nAn;090 111-2233;an@x.com;gia ĐÌNH\n;0902;;\nBình;09ab;;\nCường;+84 903;;Bạn, Công ty\nDũng;0904;;\n"
+    batches = []
+    report = import_contacts(m, iter_csv(io.StringIO(data)), batch_size=2, on_batch=lambda r: batches.append(r.imported))
+    assert (report.imported, report.rejected, batches) == (3, 2, [2, 3])
+    assert [line for line, _ in report.errors] == [3, 4]
+    assert [(c.name, c.phone) for c in m.contacts] == [("An", "0901112233"), ("Cường", "0084903"), ("Dũng", "0904")]
+    assert [g.group_name for g in m.groups] == ["Gia đình", "Bạn", "Công ty"]
+    assert [c.name for c in m.get_contacts_in_group(1)] == ["An"]
+    assert [c.name for c in m.get_contacts_in_group(3)] == ["Cường"]
+    # Không có tiêu đề: cột theo thứ tự name, phone, email, address, notes, group
+    import_contacts(m, iter_csv(io.StringIO("Hà,0905,ha@x.com,Huế,bạn cũ\n")))
+    assert (m.contacts[-1].address, m.contacts[-1].notes) == ("Huế", "bạn cũ")
+
+def test_26_import_vcard_file(tmp_path):
+    """[CRUD_TC26] Nhập vCard: dòng gấp, quoted-printable, ghép tên từ N, ký tự thoát và nhóm chung."""
+    path = tmp_path / "contacts.vcf"
+    path.write_text(
+        "BEGIN:VCARD\r\nVERSION:3.0\r\nFN:Nguyễn Văn\r\n  An\r\nitem1.TEL;TYPE=CELL:+84 90 111 2233\r\n"
+        "TEL:0999\r\nEMAIL:an@x.com\r\nADR:;;12 Lê Lợi;Huế;;;VN\r\nNOTE:bạn\\, học\\ncũ\r\nCATEGORIES:Bạn\r\nEND:VCARD\r\n"
+        "BEGIN:VCARD\r\nVERSION:2.1\r\nN;CHARSET=UTF-8;ENCODING=QUOTED-PRINTABLE:Tr=E1=BA=A7n;B=C3=\r\n=ACnh;Th=E1=BB=8B\r\n"
+        "TEL:0902\r\nEND:VCARD\r\nBEGIN:VCARD\r\nFN:Không số\r\nEND:VCARD\r\n", encoding="utf-8-sig")
+    m = Member(1, "u", "p", "e")
+    report = import_file(m, str(path), group="Nhập")
+    assert (report.imported, report.rejected, report.errors[0][0]) == (2, 1, 18)
+    an, binh = m.contacts
+    assert (an.name, an.phone, an.email) == ("Nguyễn Văn An", "0084901112233", "an@x.com")
+    assert (an.address, an.notes) == ("12 Lê Lợi, Huế, VN", "bạn, học\ncũ")
+    assert (binh.name, binh.phone) == ("Trần Thị Bình", "0902")
+    assert sorted(g.group_name for g in m.get_groups_of_contact(1)) == ["Bạn", "Nhập"]
+    assert [c.name for c in m.get_contacts_in_group(2)] == ["Nguyễn Văn An", "Trần Thị Bình"]
+
+# --- GROUP 8: EXPORT (3 Cases) ---
+def make_exportable():
+    m = Member(1, "u", "p", "e")
+    m.add_contact("Nguyễn An", "0901", "an@x.com", "12 Lê Lợi, Huế", "bạn; học\ncũ")
+    m.add_contact("Bình", "0902")
+    m.create_group("Bạn"); m.create_group("Công ty")
+    m.add_contact_to_group(1, 1); m.add_contact_to_group(1, 2)
+    return m
+
+def test_27_export_jsonl_streams_with_group_names():
+    """[CRUD_TC27] Xuất JSON Lines theo từng dòng, kèm tên nhóm; định dạng lạ bị từ chối."""
+    m = make_exportable()
+    chunks = export_contacts(m, "jsonl")
+    first = json.loads(next(chunks))  # Sinh dần, không dựng cả file trong bộ nhớ
+    assert (first["name"], first["groups"]) == ("Nguyễn An", ["Bạn", "Công ty"])
+    assert [json.loads(line)["groups"] for line in chunks] == [[]]
+    with pytest.raises(ValueError):
+        export_contacts(m, "xml")
+
+@pytest.mark.parametrize("name", ["out.csv", "out.vcf"])
+def test_28_export_round_trips_through_import(tmp_path, name):
+    """[CRUD_TC28] File CSV/vCard xuất ra nhập lại được đầy đủ thông tin và nhóm."""
+    path = str(tmp_path / name)
+    assert export_file(make_exportable(), path) == 2
+    copy = Member(2, "v", "p", "e")
+    assert import_file(copy, path).imported == 2
+    assert [(c.name, c.phone, c.email, c.address, c.notes) for c in copy.contacts] == [
+        ("Nguyễn An", "0901", "an@x.com", "12 Lê Lợi, Huế", "bạn; học\ncũ"), ("Bình", "0902", "", "", "")]
+    assert [g.group_name for g in copy.get_groups_of_contact(1)] == ["Bạn", "Công ty"]
+    assert not (tmp_path / (name + ".tmp")).exists()
+
+def test_29_export_consistent_with_snapshot():
+    """[CRUD_TC29] Sửa nhóm trong lúc đang xuất không làm lẫn dữ liệu cũ và mới."""
+    m = make_exportable()
+    rows = m.iter_export()
+    assert next(rows)[1] == ["Bạn", "Công ty"]
+    m.rename_group(1, "Bạn cũ")
+    m.add_contact_to_group(2, 1)
+    m.remove_group(2)
+    assert next(rows)[1] == []  # Vẫn theo bản chụp lúc bắt đầu xuất
+    assert [groups for _, groups in m.iter_export()] == [["Bạn cũ"], ["Bạn cũ"]]
+
+# --- GROUP 9: STORAGE BY ID (1 Case) ---
+def test_30_delete_by_id_keeps_insertion_order():
+    """[CRUD_TC30] Liên hệ/nhóm lưu trong dict theo ID: xóa không quét danh sách, thứ tự thêm được giữ."""
+    m = Member(1, "u", "p", "e")
+    m.add_contacts([(f"C{i}", str(i), "", "", "") for i in range(1, 6)])
+    for gid in range(1, 4): m.create_group(f"G{gid}")
+    m.delete_contact(3)
+    m.delete_contact(1)
+    m.remove_group(2)
+    assert [c.contact_id for c in m.contacts] == [2, 4, 5]
+    assert [g.group_id for g in m.groups] == [1, 3]
+    m.contacts.clear()  # contacts / groups là bản sao
+    assert m.contact_count == 3 and list(m.contact_index) == [2, 4, 5]
+    m.add_contact("C6", "6")
+    assert [c.contact_id for c in m.snapshot().contacts] == [2, 4, 5, 6]
+
+# --- GROUP 10: IMPORT ERRORS (1 Case) ---
+def test_31_import_menu_reports_corrupt_file(tmp_path, monkeypatch, capsys):
+    """[CRUD_TC31] File CSV hỏng báo lỗi kèm số dòng (import_file và menu), không làm dừng chương trình."""
+    from main import PhoneBookSystem
+    monkeypatch.chdir(tmp_path)
+    path = tmp_path / "hong.csv"
+    path.write_text("name,phone\nAn,0901\n" + "x" * 200000 + ",0902\nBình,0903\n", encoding="utf-8")
+    with pytest.raises(csv.Error, match="Dòng 3"):
+        import_file(Member(1, "u", "p", "e"), str(path), batch_size=1)
+    app = PhoneBookSystem(storage="json")
+    try:
+        app.current_user = app.find_member("sinhvien")
+        answers = iter([str(path), ""])
+        monkeypatch.setattr("builtins.input", lambda *_: next(answers))
+        capsys.readouterr()
+        app.import_contacts_menu()
+        out = capsys.readouterr().out
+        assert "File không hợp lệ: Dòng 3" in out
+        assert [c.name for c in app.current_user.contacts] == ["Bố"]  # Lô chưa đủ nên chưa thêm gì
+    finally:
+        app.shutdown()
+
+# --- GROUP 11: NULL FIELDS (1 Case) ---
+def test_32_null_address_and_notes_still_load():
+    """[CRUD_TC32] address/notes là null (file JSON cũ hoặc sửa tay) vẫn nạp được; ghi chú mới được dùng chung chuỗi."""
+    import sys
+    from data import DataManager
+    c = DataManager.contact_from_dict({"contact_id": 1, "name": "A", "phone": "1", "address": None, "notes": None})
+    assert c.address is None and c.notes is None
+    note = "".join(["Ghi ", "chú"])
+    c.update_details(notes=note)
+    assert c.notes is sys.intern("Ghi chú")
\ No newline at end of file
@@ -3,7 +3,7 @@ from models import Member
 
 # ============================================================
 # MODULE: GROUP MANAGEMENT (Mã: GROUP)
-# Tổng số Test Case: 15
+# Tổng số Test Case: 18
 # ============================================================
 
 # --- GROUP 1: CREATE & MANAGE GROUP (5 Cases) ---
@@ -111,4 +111,32 @@ def test_15_group_id_auto_increment():
     m.create_group("G1") # ID 1
     m.remove_group(1)    # Xóa
     m.create_group("G2") # Tạo mới
-    assert m.groups[0].group_id == 1 # Code logic hiện tại reset nếu list empty
\ No newline at end of file
+    assert m.groups[0].group_id == 2 # ID đã cấp không bao giờ được dùng lại
+
+# --- GROUP 4: MEMBERSHIP INDEX (3 Cases) ---
+def test_16_index_both_directions():
+    """[GROUP_TC16] Chỉ mục hai chiều contact <-> group đồng bộ."""
+    m = Member(1, "u", "p", "e")
+    m.add_contact("C1", "1"); m.add_contact("C2", "2")
+    m.create_group("G1"); m.create_group("G2")
+    m.add_contact_to_group(1, 1); m.add_contact_to_group(1, 2); m.add_contact_to_group(2, 1)
+    assert m.contact_groups[1] == {1, 2}
+    assert [c.name for c in m.get_contacts_in_group(1)] == ["C1", "C2"]
+    assert m.is_in_group(2, 1) and not m.is_in_group(2, 2)
+
+def test_17_delete_contact_cascades_index():
+    """[GROUP_TC17] Xóa liên hệ dọn sạch chỉ mục của mọi nhóm liên quan."""
+    m = Member(1, "u", "p", "e")
+    m.add_contact("C1", "1"); m.create_group("G1"); m.create_group("G2")
+    m.add_contact_to_group(1, 1); m.add_contact_to_group(1, 2)
+    m.delete_contact(1)
+    assert m.contact_groups == {} and m.group_contacts == {}
+
+def test_18_assign_memberships_rebuilds_index():
+    """[GROUP_TC18] Gán lại danh sách liên kết (khi load) dựng lại chỉ mục."""
+    from models import ContactGroupMembership
+    m = Member(1, "u", "p", "e")
+    m.add_contact("C1", "1"); m.create_group("G1")
+    m.memberships = [ContactGroupMembership(1, 1), ContactGroupMembership(1, 1)]
+    assert len(m.memberships) == 1
+    assert m.group_contacts[1] == {1}
\ No newline at end of file
@@ -3,7 +3,7 @@ from models import Member
 import time
 
 # MODULE: SEARCH & HISTORY (Mã: SEARCH)
-# Tổng số Test Case: 15
+# Tổng số Test Case: 30
 
 # --- GROUP 1: SEARCH (9 Cases) ---
 def test_01_search_exact():
@@ -114,4 +114,145 @@ def test_15_view_invalid_id():
     """[SEARCH_TC15] Xem ID không tồn tại (Không lỗi)."""
     m = Member(1, "u", "p", "e")
     res = m.view_contact_detail(999)
-    assert res is False
\ No newline at end of file
+    assert res is False
+
+# --- GROUP 3: SEARCH INDEX (3 Cases) ---
+def test_16_search_after_rename():
+    """[SEARCH_TC16] Đổi tên -> chỉ mục tìm theo tên mới, không còn tên cũ."""
+    m = Member(1, "u", "p", "e")
+    m.add_contact("Halloween", "1")
+    m.edit_contact_details(1, name="Christmas")
+    assert m.search_contact_by_name("llow") == []
+    assert len(m.search_contact_by_name("stma")) == 1
+
+def test_17_search_after_delete():
+    """[SEARCH_TC17] Liên hệ đã xóa không còn xuất hiện khi tìm."""
+    m = Member(1, "u", "p", "e")
+    m.add_contact("Nguyen A", "1"); m.add_contact("Nguyen B", "2")
+    m.delete_contact(1)
+    res = m.search_contact_by_name(" nguyen ")
+    assert [c.name for c in res] == ["Nguyen B"]
+
+def test_18_search_keeps_list_order():
+    """[SEARCH_TC18] Kết quả trả về theo thứ tự danh bạ."""
+    m = Member(1, "u", "p", "e")
+    for n in ["Anna", "Hanna", "Joanna"]: m.add_contact(n, "1")
+    assert [c.name for c in m.search_contact_by_name("ANNA")] == ["Anna", "Hanna", "Joanna"]
+
+# --- GROUP 4: TYPE-AHEAD (2 Cases) ---
+def test_19_suggest_prefix_sorted_limit():
+    """[SEARCH_TC19] Gợi ý theo tiền tố: sắp xếp A-Z và giới hạn số lượng."""
+    m = Member(1, "u", "p", "e")
+    for n in ["Nam", "nga", "Ngan", "Linh", "Nguyen"]: m.add_contact(n, "1")
+    assert [c.name for c in m.suggest_contacts("NG", limit=2)] == ["nga", "Ngan"]
+    assert m.suggest_contacts("x") == []
+
+def test_20_suggest_follows_edit_delete():
+    """[SEARCH_TC20] Gợi ý cập nhật theo sửa/xóa liên hệ."""
+    m = Member(1, "u", "p", "e")
+    m.add_contact("Alpha", "1"); m.add_contact("Beta", "2")
+    m.edit_contact_details(1, name="Gamma")
+    m.delete_contact(2)
+    assert m.suggest_contacts("a") == [] and m.suggest_contacts("b") == []
+    assert [c.name for c in m.suggest_contacts("g")] == ["Gamma"]
+
+# --- GROUP 5: PHONE LOOKUP (3 Cases) ---
+def test_21_phone_lookup_normalized():
+    """[SEARCH_TC21] Tra ngược SĐT bỏ qua '+84', '0084', số 0 đầu và khoảng trắng."""
+    m = Member(1, "u", "p", "e")
+    m.add_contact("A", "0901112233")
+    for q in ["+84 90 111 2233", "0084901112233", "090 111 2233"]:
+        assert [c.name for c in m.find_contacts_by_phone(q)] == ["A"]
+
+def test_22_phone_lookup_suffix():
+    """[SEARCH_TC22] Tra theo N chữ số cuối."""
+    m = Member(1, "u", "p", "e")
+    m.add_contact("A", "0901112233"); m.add_contact("B", "0907772233"); m.add_contact("C", "0901110000")
+    assert sorted(c.name for c in m.find_contacts_by_phone_suffix("2233")) == ["A", "B"]
+    assert m.find_contacts_by_phone_suffix("") == []
+
+def test_23_phone_lookup_follows_edit_delete():
+    """[SEARCH_TC23] Chỉ mục SĐT cập nhật theo sửa/xóa."""
+    m = Member(1, "u", "p", "e")
+    m.add_contact("A", "111"); m.add_contact("B", "222")
+    m.edit_contact_details(1, phone="333")
+    m.delete_contact(2)
+    assert m.find_contacts_by_phone("111") == [] and m.find_contacts_by_phone("222") == []
+    assert [c.name for c in m.find_contacts_by_phone("333")] == ["A"]
+
+# --- GROUP 6: VIETNAMESE ACCENTS (2 Cases) ---
+def test_24_search_without_accents():
+    """[SEARCH_TC24] Tìm không dấu vẫn ra tên có dấu (kể cả chữ Đ)."""
+    m = Member(1, "u", "p", "e")
+    m.add_contact("Bố", "1"); m.add_contact("Gia Đình", "2")
+    assert [c.name for c in m.search_contact_by_name("bo")] == ["Bố"]
+    assert [c.name for c in m.search_contact_by_name("DINH")] == ["Gia Đình"]
+
+def test_25_search_key_updated_on_edit():
+    """[SEARCH_TC25] Khóa tìm kiếm được tính lại khi đổi tên."""
+    m = Member(1, "u", "p", "e")
+    m.add_contact("Mẹ", "1")
+    m.edit_contact_details(1, name="Nguyễn Thị Hương")
+    assert m.contacts[0].search_key == "nguyen thi huong"
+    assert len(m.search_contact_by_name("huong")) == 1
+
+# --- GROUP 7: FUZZY SEARCH (2 Cases) ---
+def test_26_fuzzy_ranked_by_distance():
+    """[SEARCH_TC26] Tìm gần đúng: gõ sai vẫn ra, gần nhất đứng đầu."""
+    m = Member(1, "u", "p", "e")
+    for n in ["Hoàng", "Hoang Anh", "Hoa", "Xuân"]: m.add_contact(n, "1")
+    res = m.fuzzy_search_contacts("hoamg", max_distance=2)
+    assert [c.name for c in res] == ["Hoàng", "Hoa"]
+
+def test_27_fuzzy_follows_edit_delete():
+    """[SEARCH_TC27] Chỉ mục gần đúng cập nhật theo sửa/xóa."""
+    m = Member(1, "u", "p", "e")
+    m.add_contact("Minh", "1"); m.add_contact("Linh", "2")
+    m.edit_contact_details(1, name="Quang")
+    m.delete_contact(2)
+    assert m.fuzzy_search_contacts("Minh", max_distance=1) == []
+    assert [c.name for c in m.fuzzy_search_contacts("Quan", max_distance=1)] == ["Quang"]
+
+# --- GROUP 8: RECENT STRUCTURE (2 Cases) ---
+def test_28_recent_limit_and_delete():
+    """[SEARCH_TC28] Recent giới hạn số lượng và bỏ liên hệ đã xóa."""
+    m = Member(1, "u", "p", "e")
+    for n in "ABC": m.add_contact(n, "1")
+    for cid in (1, 2, 3): m.view_contact_detail(cid)
+    m.delete_contact(3)
+    assert [c.name for c in m.get_recent_contacts(limit=1)] == ["B"]
+    assert [c.name for c in m.get_recent_contacts()] == ["B", "A"]
+
+def test_29_recent_rebuilt_from_timestamps():
+    """[SEARCH_TC29] Dựng lại Recent từ last_viewed_at khi nạp dữ liệu."""
+    import datetime
+    m = Member(1, "u", "p", "e")
+    m.add_contact("Old", "1"); m.add_contact("New", "2"); m.add_contact("Never", "3")
+    m.contacts[0].last_viewed_at = datetime.datetime(2024, 1, 1)
+    m.contacts[1].last_viewed_at = datetime.datetime(2024, 6, 1)
+    m.rebuild_indexes()
+    assert [c.name for c in m.get_recent_contacts()] == ["New", "Old"]
+
+# --- GROUP 9: FUZZY INDEX BUILD (1 Case) ---
+def test_30_fuzzy_index_built_off_lock(monkeypatch):
+    """[SEARCH_TC30] Lần tìm gần đúng đầu không dựng cây khi giữ khóa: trả kết quả quét toàn bộ, cây dựng ở luồng nền."""
+    import threading
+    import models
+    m = Member(1, "u", "p", "e")
+    for n in ["Hoàng", "Hoa", "Xuân"]: m.add_contact(n, "1")
+    started, release = threading.Event(), threading.Event()
+    real_tree = models.BKTree
+    def slow_tree(items):
+        assert threading.get_ident() not in m.lock.held  # Dựng ngoài khóa của member
+        started.set()
+        release.wait(5)
+        return real_tree(items)
+    monkeypatch.setattr(models, "BKTree", slow_tree)
+    assert [c.name for c in m.fuzzy_search_contacts("hoamg")] == ["Hoàng", "Hoa"]  # Quét dự phòng
+    assert started.wait(5) and m.fuzzy_index is None
+    m.add_contact("Hoàn", "2")  # Luồng ghi không phải chờ cây dựng xong
+    m.delete_contact(3)
+    release.set()
+    assert m.build_fuzzy_index(background=False)
+    assert set(m.fuzzy_index.texts) == {1, 2, 4}  # Thay đổi trong lúc dựng đã được đối chiếu
+    assert [c.name for c in m.fuzzy_search_contacts("hoamg")] == ["Hoàng", "Hoa", "Hoàn"]
\ No newline at end of file
@@ -0,0 +1,218 @@
+import asyncio
+import json
+import pytest
+from data import DataManager
+
+# ============================================================
+# MODULE: JSON/HTTP SERVICE (Mã: API)
+# Tổng số Test Case: 10
+# ============================================================
+
+@pytest.fixture
+def api(tmp_path, monkeypatch):
+    """PhoneBookServer trên PhoneBookSystem có dữ liệu mẫu, chạy trong thư mục tạm."""
+    from main import PhoneBookSystem
+    from server import PhoneBookServer
+    monkeypatch.chdir(tmp_path)
+    system = PhoneBookSystem(storage="json", echo=False)
+    server = PhoneBookServer(system)
+    yield server
+    server.close()
+    system.shutdown()
+    DataManager.configure("json")
+
+async def call(port, method, path, body=None, token=None):
+    """Gửi một yêu cầu (Connection: close). Trả về (mã HTTP, JSON)."""
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    data = json.dumps(body).encode() if body is not None else b""
+    head = f"{method} {path} HTTP/1.1\r\nHost: test\r\nContent-Length: {len(data)}\r\nConnection: close\r\n"
+    if token: head += f"Authorization: Bearer {token}\r\n"
+    writer.write(head.encode() + b"\r\n" + data)
+    raw = await reader.read()
+    writer.close()
+    status, _, payload = raw.partition(b"\r\n\r\n")
+    return int(status.split()[1]), json.loads(payload)
+
+async def login(port, username="sinhvien", password="123", role="member"):
+    status, body = await call(port, "POST", "/login", {"username": username, "password": password, "role": role})
+    assert status == 200
+    return body["token"]
+
+def run(api, scenario):
+    """Mở server ở cổng ngẫu nhiên rồi chạy scenario(port)."""
+    async def main():
+        listener = await api.start("127.0.0.1", 0)
+        try: return await scenario(listener.sockets[0].getsockname()[1])
+        finally:
+            listener.close()
+            await listener.wait_closed()
+    return asyncio.run(main())
+
+# --- GROUP 1: LOGIN & SESSION (2 Cases) ---
+def test_01_login_and_token_required(api):
+    """[API_TC01] Đăng nhập trả token; thiếu/sai token hoặc sai mật khẩu bị từ chối."""
+    async def scenario(port):
+        assert (await call(port, "POST", "/login", {"username": "sinhvien", "password": "sai"}))[0] == 401
+        assert (await call(port, "POST", "/login", {"username": "khongco", "password": "123"}))[0] == 401
+        assert (await call(port, "GET", "/contacts"))[0] == 401
+        assert (await call(port, "GET", "/contacts", token="gia-mao"))[0] == 401
+        token = await login(port)
+        status, contacts = await call(port, "GET", "/contacts", token=token)
+        assert status == 200 and [c["name"] for c in contacts] == ["Bố"]
+    run(api, scenario)
+
+def test_02_logout_revokes_token(api):
+    """[API_TC02] Đăng xuất hủy token; token member không dùng được endpoint admin."""
+    async def scenario(port):
+        token = await login(port)
+        assert (await call(port, "GET", "/admin/members", token=token))[0] == 403
+        assert (await call(port, "POST", "/logout", token=token))[0] == 200
+        assert (await call(port, "GET", "/contacts", token=token))[0] == 401
+    run(api, scenario)
+
+# --- GROUP 2: MEMBER OPERATIONS (3 Cases) ---
+def test_03_contact_crud_and_recent(api):
+    """[API_TC03] Thêm/sửa/xem/xóa liên hệ; xem chi tiết được ghi vào Recent và lưu xuống file."""
+    async def scenario(port):
+        token = await login(port)
+        assert (await call(port, "POST", "/contacts", {"name": "An", "phone": "09a"}, token))[0] == 400
+        status, new = await call(port, "POST", "/contacts", {"name": "An", "phone": "0901", "email": "an@x.com"}, token)
+        assert status == 201 and new["name"] == "An"
+        cid = new["contact_id"]
+        status, edited = await call(port, "PATCH", f"/contacts/{cid}", {"phone": "0999"}, token)
+        assert status == 200 and edited["phone"] == "0999" and edited["name"] == "An"
+        assert (await call(port, "GET", f"/contacts/{cid}", token=token))[0] == 200
+        assert [c["contact_id"] for c in (await call(port, "GET", "/recent", token=token))[1]] == [cid]
+        assert (await call(port, "DELETE", f"/contacts/{cid}", token=token))[0] == 200
+        assert (await call(port, "DELETE", f"/contacts/{cid}", token=token))[0] == 404
+        assert (await call(port, "PATCH", "/contacts/999", {"name": "X"}, token))[0] == 404
+    run(api, scenario)
+    with open("phonebook_data.json", encoding="utf-8") as f:
+        assert [c["name"] for c in json.load(f)["members"][0]["contacts"]] == ["Bố"]
+
+def test_04_search_endpoints(api):
+    """[API_TC04] Tìm theo tên (kèm gợi ý gần đúng), theo phần đầu tên và theo SĐT."""
+    async def scenario(port):
+        token = await login(port)
+        await call(port, "POST", "/contacts", {"name": "Nguyễn Văn An", "phone": "0912345678"}, token)
+        assert [c["name"] for c in (await call(port, "GET", "/search?q=nguyen", token=token))[1]["results"]] == ["Nguyễn Văn An"]
+        status, body = await call(port, "GET", "/search?q=Nguyen%20Van%20Ah", token=token)
+        assert body["results"] == [] and [c["name"] for c in body["suggestions"]] == ["Nguyễn Văn An"]
+        assert [c["name"] for c in (await call(port, "GET", "/search?prefix=ng", token=token))[1]["results"]] == ["Nguyễn Văn An"]
+        assert [c["name"] for c in (await call(port, "GET", "/search?phone=%2B84912345678", token=token))[1]["results"]] == ["Nguyễn Văn An"]
+        assert (await call(port, "GET", "/search", token=token))[0] == 400
+    run(api, scenario)
+
+def test_05_group_endpoints(api):
+    """[API_TC05] Tạo/đổi tên/xóa nhóm, thêm và mời liên hệ ra khỏi nhóm."""
+    async def scenario(port):
+        token = await login(port)
+        status, group = await call(port, "POST", "/groups", {"name": "Bạn bè"}, token)
+        assert status == 201
+        gid = group["group_id"]
+        assert (await call(port, "POST", f"/groups/{gid}/contacts", {"contact_id": 1}, token))[0] == 201
+        assert (await call(port, "POST", f"/groups/{gid}/contacts", {"contact_id": 1}, token))[0] == 409
+        assert (await call(port, "POST", f"/groups/{gid}/contacts", {"contact_id": 99}, token))[0] == 404
+        assert [c["contact_id"] for c in (await call(port, "GET", f"/groups/{gid}/contacts", token=token))[1]] == [1]
+        assert gid in (await call(port, "GET", "/contacts/1", token=token))[1]["groups"]
+        assert (await call(port, "PATCH", f"/groups/{gid}", {"name": "Bạn thân"}, token))[1]["group_name"] == "Bạn thân"
+        assert (await call(port, "DELETE", f"/groups/{gid}/contacts/1", token=token))[0] == 200
+        assert (await call(port, "DELETE", f"/groups/{gid}/contacts/1", token=token))[0] == 404
+        assert (await call(port, "DELETE", f"/groups/{gid}", token=token))[0] == 200
+        assert (await call(port, "GET", f"/groups/{gid}/contacts", token=token))[0] == 404
+    run(api, scenario)
+
+# --- GROUP 3: ADMIN OPERATIONS (1 Case) ---
+def test_06_admin_endpoints(api):
+    """[API_TC06] Admin tạo/xóa member, xem danh bạ member và log theo trang."""
+    async def scenario(port):
+        admin = await login(port, "admin", "123456", "admin")
+        body = {"username": "moi", "password": "pw", "email": "moi@x.com"}
+        status, created = await call(port, "POST", "/admin/members", body, admin)
+        assert status == 201 and created["username"] == "moi"
+        assert (await call(port, "POST", "/admin/members", body, admin))[0] == 409
+        member = await login(port, "moi", "pw")
+        await call(port, "POST", "/contacts", {"name": "Z", "phone": "1"}, member)
+        status, book = await call(port, "GET", f"/admin/members/{created['member_id']}/contacts", token=admin)
+        assert [c["name"] for c in book["contacts"]] == ["Z"]
+        status, logs = await call(port, "GET", "/admin/logs?page=0&size=50", token=admin)
+        assert any("Admin created user moi." in line for line in logs["lines"])
+        assert (await call(port, "DELETE", f"/admin/members/{created['member_id']}", token=admin))[0] == 200
+        assert (await call(port, "GET", "/contacts", token=member))[0] == 401  # Phiên bị hủy theo tài khoản
+        assert [m["username"] for m in (await call(port, "GET", "/admin/members", token=admin))[1]] == ["sinhvien"]
+    run(api, scenario)
+
+# --- GROUP 4: PROTOCOL & CONCURRENCY (3 Cases) ---
+def test_07_keep_alive_and_bad_requests(api):
+    """[API_TC07] Nhiều yêu cầu trên một kết nối; yêu cầu hỏng, sai endpoint, sai phương thức."""
+    async def scenario(port):
+        reader, writer = await asyncio.open_connection("127.0.0.1", port)
+        for _ in range(2):
+            writer.write(b"GET /contacts HTTP/1.1\r\nHost: test\r\n\r\n")
+            assert (await reader.readline()).startswith(b"HTTP/1.1 401")
+            headers = {}
+            while (line := await reader.readline()) != b"\r\n":
+                name, _, value = line.decode().partition(":")
+                headers[name.lower()] = value.strip()
+            assert headers["connection"] == "keep-alive"
+            await reader.readexactly(int(headers["content-length"]))
+        writer.write(b"rac\r\n\r\n")
+        assert (await reader.read()).startswith(b"HTTP/1.1 400")
+        writer.close()
+        assert (await call(port, "GET", "/khong-co"))[0] == 404
+        assert (await call(port, "PUT", "/contacts"))[0] == 405
+        assert (await call(port, "POST", "/login", ["khong", "phai", "object"]))[0] == 400
+    run(api, scenario)
+
+def test_08_concurrent_clients(api):
+    """[API_TC08] Nhiều client đồng thời thêm liên hệ: không mất thay đổi nào, dữ liệu được lưu."""
+    async def client(port, i):
+        token = await login(port)
+        for j in range(5):
+            status, _ = await call(port, "POST", "/contacts", {"name": f"C{i}-{j}", "phone": f"{i}{j}"}, token)
+            assert status == 201
+    async def scenario(port):
+        await asyncio.gather(*(client(port, i) for i in range(10)))
+        return (await call(port, "GET", "/contacts", token=await login(port)))[1]
+    contacts = run(api, scenario)
+    assert len(contacts) == 51 and len({c["contact_id"] for c in contacts}) == 51
+    with open("phonebook_data.json", encoding="utf-8") as f:
+        assert len(json.load(f)["members"][0]["contacts"]) == 51
+
+
+def test_09_member_work_off_event_loop(api, capsys):
+    """[API_TC09] Thao tác trên Member chạy ngoài event loop (member bị khóa không chặn client khác); không in ra stdout."""
+    mem = api.system.find_member("sinhvien")
+    async def scenario(port):
+        token = await login(port)
+        admin = await login(port, "admin", "123456", "admin")
+        mem.lock.acquire_write()  # Giả lập luồng khác đang giữ khóa ghi của member
+        try:
+            pending = asyncio.ensure_future(call(port, "POST", "/contacts", {"name": "An", "phone": "1"}, token))
+            status, _ = await asyncio.wait_for(call(port, "GET", "/admin/members", token=admin), 5)
+            assert status == 200 and not pending.done()
+        finally:
+            mem.lock.release()
+        status, new = await pending
+        assert status == 201
+        assert (await call(port, "GET", f"/contacts/{new['contact_id']}", token=token))[0] == 200
+    run(api, scenario)
+    out = capsys.readouterr().out
+    assert "Đã thêm" not in out and "CHI TIẾT" not in out
+
+def test_10_unexpected_handler_error(api, monkeypatch):
+    """[API_TC10] Handler lỗi ngoài dự kiến: trả 500 và ghi log; dòng yêu cầu quá dài: trả 414."""
+    mem = api.system.find_member("sinhvien")
+    async def scenario(port):
+        token = await login(port)
+        for error in (ValueError("hỏng"), KeyError("hỏng")):
+            def broken(limit=None): raise error
+            monkeypatch.setattr(mem, "get_recent_contacts", broken)
+            assert (await call(port, "GET", "/recent", token=token))[0] == 500
+        reader, writer = await asyncio.open_connection("127.0.0.1", port)
+        writer.write(b"GET /" + b"a" * 70000 + b" HTTP/1.1\r\n\r\n")
+        assert (await reader.read()).startswith(b"HTTP/1.1 414")
+        writer.close()
+        assert (await call(port, "GET", "/contacts", token=token))[0] == 200  # Server vẫn phục vụ
+    run(api, scenario)
+    assert any("API error GET /recent: KeyError" in line for line in api.system.system_log.recent)
\ No newline at end of file
@@ -0,0 +1,440 @@
+import os
+import pytest
+import data
+from data import DataManager, DataLoadError, WriteBehindFlusher
+import hashlib
+from models import Member, Admin
+
+# ============================================================
+# MODULE: STORAGE (Mã: STORE)
+# Tổng số Test Case: 28
+# ============================================================
+
+@pytest.fixture(autouse=True)
+def workdir(tmp_path, monkeypatch):
+    """Mỗi test chạy trong thư mục tạm riêng và trả DataManager về chế độ json sau khi xong."""
+    monkeypatch.chdir(tmp_path)
+    yield tmp_path
+    DataManager.close()
+    DataManager.configure("json")
+
+def make_member():
+    m = Member(101, "sv", "123", "sv@email.com")
+    m.add_contact("Bố", "090111"); m.add_contact("Mẹ", "090222")
+    m.create_group("Gia Đình")
+    m.add_contact_to_group(1, 1)
+    return m
+
+def state(members):
+    """Tóm tắt trạng thái để so sánh."""
+    return [(m.member_id, m.contact_ids.next_id,
+             [(c.contact_id, c.name, c.phone) for c in m.contacts],
+             [(g.group_id, g.group_name) for g in m.groups],
+             [(l.contact_id, l.group_id) for l in m.memberships]) for m in members]
+
+# --- GROUP 1: JSON (1 Case) ---
+def test_01_json_roundtrip():
+    """[STORE_TC01] Lưu rồi đọc lại file JSON giữ nguyên dữ liệu."""
+    m = make_member()
+    DataManager.save_data([Admin(1, "admin", "1")], [m], ["log"], 102)
+    admins, members, logs, meta = DataManager.load_data()
+    assert state(members) == state([m])
+    assert logs == ["log"] and meta["next_member_id"] == 102
+
+# --- GROUP 2: JOURNAL (4 Cases) ---
+def test_02_journal_replay():
+    """[STORE_TC02] Thay đổi sau snapshot được ghi nối vào journal và phát lại khi đọc."""
+    DataManager.configure("journal")
+    m = make_member()
+    DataManager.save_data([], [m], [], 102)      # Chưa có snapshot -> ghi snapshot
+    DataManager.backend.wait()
+    m.edit_contact_details(1, name="Ba")
+    m.delete_contact(2)
+    m.rename_group(1, "Nhà")
+    m.add_contact("Em", "090333")
+    DataManager.save_data([], [m], [], 102)      # Chỉ ghi nối journal
+    assert os.path.getsize(data.JOURNAL_FILE) > 0
+    _, members, _, _ = DataManager.load_data()
+    assert state(members) == state([m])
+
+def test_03_journal_cascade_delete():
+    """[STORE_TC03] Phát lại xóa nhóm cũng xóa liên kết của nhóm."""
+    DataManager.configure("journal")
+    m = make_member()
+    DataManager.save_data([], [m], [], 102)
+    DataManager.backend.wait()
+    m.remove_group(1)
+    DataManager.save_data([], [m], [], 102)
+    _, members, _, _ = DataManager.load_data()
+    assert members[0].memberships == [] and members[0].groups == []
+
+def test_04_journal_compaction():
+    """[STORE_TC04] Journal vượt ngưỡng được nén vào snapshot và xóa đi."""
+    DataManager.configure("journal")
+    DataManager.backend.compact_bytes = 1
+    m = make_member()
+    DataManager.save_data([], [m], [], 102)
+    DataManager.backend.wait()
+    m.add_contact("Em", "090333")
+    DataManager.save_data([], [m], [], 102)      # Ghi nối
+    DataManager.save_data([], [m], [], 102)      # Journal >= 1 byte -> nén
+    DataManager.backend.wait()
+    assert DataManager.backend.segments() == []
+    DataManager.configure("json")
+    _, members, _, _ = DataManager.load_data()
+    assert state(members) == state([m])
+
+def test_05_journal_torn_tail_ignored():
+    """[STORE_TC05] Dòng cuối bị ghi dở (mất điện) được bỏ qua khi phát lại và cắt khỏi file trước lần ghi nối sau."""
+    DataManager.configure("journal")
+    m = make_member()
+    DataManager.save_data([], [m], [], 102)
+    DataManager.backend.wait()
+    m.add_contact("Em", "090333")
+    DataManager.save_data([], [m], [], 102)
+    with open(data.JOURNAL_FILE, "a", encoding="utf-8") as f:
+        f.write('{"op": "contact_del", "member_id": 101, "cont')
+    _, members, _, _ = DataManager.load_data()
+    assert [c.name for c in members[0].contacts] == ["Bố", "Mẹ", "Em"]
+    m.add_contact("Út", "090444")  # Ghi nối sau dòng ghi dở: dòng đó đã được cắt khỏi file
+    DataManager.save_data([], [m], [], 102)
+    _, members, _, _ = DataManager.load_data()
+    assert [c.name for c in members[0].contacts] == ["Bố", "Mẹ", "Em", "Út"]
+
+# --- GROUP 3: WRITE-BEHIND (3 Cases) ---
+def test_06_write_behind_coalesces():
+    """[STORE_TC06] Nhiều lần đánh dấu trong một interval chỉ dẫn tới một lần ghi."""
+    calls = []
+    f = WriteBehindFlusher(lambda: calls.append(1), interval=0.2, batch_size=1000)
+    for _ in range(100): f.mark_dirty()
+    f.close()
+    assert len(calls) == 1
+
+def test_07_write_behind_batch_and_close():
+    """[STORE_TC07] Đủ batch thì ghi ngay; close() ghi nốt phần còn lại."""
+    import threading
+    done = threading.Event()
+    calls = []
+    def flush():
+        calls.append(1); done.set()
+    f = WriteBehindFlusher(flush, interval=60, batch_size=5)
+    for _ in range(5): f.mark_dirty()
+    assert done.wait(5)                          # Không phải đợi hết 60s
+    f.mark_dirty()
+    f.close()
+    assert len(calls) == 2
+
+def test_08_system_write_behind_flushes_on_shutdown():
+    """[STORE_TC08] PhoneBookSystem ở chế độ ghi trễ vẫn lưu đủ khi thoát."""
+    from main import PhoneBookSystem
+    app = PhoneBookSystem(storage="json", flush_interval=60)
+    app.members[0].add_contact("Mới", "0999")
+    app.save_changes()
+    app.shutdown()
+    _, members, _, _ = DataManager.load_data()
+    assert [c.name for c in members[0].contacts] == ["Bố", "Mới"]
+
+# --- GROUP 4: SHARDED (3 Cases) ---
+def test_09_sharded_roundtrip():
+    """[STORE_TC09] Lưu theo shard rồi đọc lại giữ nguyên dữ liệu; không ghi logs.json (log nằm ở file log riêng)."""
+    DataManager.configure("sharded")
+    m1, m2 = make_member(), Member(102, "sv2", "1", "e")
+    DataManager.save_data([Admin(1, "admin", "1")], [m1, m2], [], 103)
+    admins, members, logs, meta = DataManager.load_data()
+    assert state(members) == state([m1, m2])
+    assert admins[0].username == "admin" and logs == [] and meta["next_member_id"] == 103
+    assert not os.path.exists(os.path.join(DataManager.backend.root, "logs.json"))
+
+def test_10_sharded_writes_only_dirty(monkeypatch):
+    """[STORE_TC10] Chỉ shard của member có thay đổi bị ghi lại."""
+    DataManager.configure("sharded")
+    m1, m2 = make_member(), Member(102, "sv2", "1", "e")
+    DataManager.save_data([], [m1, m2], [], 103)
+    written = []
+    real = DataManager.write_snapshot
+    monkeypatch.setattr(DataManager, "write_snapshot",
+                        staticmethod(lambda d, path=None, indent=4: written.append(path) or real(d, path, indent)))
+    m1.edit_contact_details(1, name="Ba")
+    assert m1.dirty and not m2.dirty
+    DataManager.save_data([], [m1, m2], [], 103)
+    assert written == [DataManager.backend.shard_path(101)]
+    assert not m1.dirty
+
+def test_11_sharded_member_create_delete():
+    """[STORE_TC11] Tạo/xóa member cập nhật index và shard."""
+    DataManager.configure("sharded")
+    m1 = make_member()
+    DataManager.save_data([], [m1], [], 102)
+    m2 = Member(102, "sv2", "1", "e")
+    DataManager.record("member", member=DataManager.member_to_dict(m2))
+    DataManager.save_data([], [m1, m2], [], 103)
+    assert os.path.exists(DataManager.backend.shard_path(102))
+    DataManager.record("member_del", member_id=101)
+    DataManager.save_data([], [m2], [], 103)
+    assert not os.path.exists(DataManager.backend.shard_path(101))
+    _, members, _, _ = DataManager.load_data()
+    assert [m.username for m in members] == ["sv2"]
+
+# --- GROUP 5: SQLITE (3 Cases) ---
+def test_12_sqlite_roundtrip():
+    """[STORE_TC12] Lần lưu đầu ghi toàn bộ vào SQLite, đọc lại giữ nguyên dữ liệu; không có bảng logs."""
+    DataManager.configure("sqlite")
+    m1, m2 = make_member(), Member(102, "sv2", "1", "e")
+    DataManager.save_data([Admin(1, "admin", "1")], [m1, m2], [], 103)
+    admins, members, logs, meta = DataManager.load_data()
+    assert state(members) == state([m1, m2])
+    assert admins[0].username == "admin" and logs == [] and meta["next_member_id"] == 103
+    assert DataManager.backend.connect().execute(
+        "SELECT 1 FROM sqlite_master WHERE name = 'logs'").fetchone() is None
+
+def test_13_sqlite_row_level_changes():
+    """[STORE_TC13] Thay đổi sau lần lưu đầu được ghi theo dòng (kể cả xóa dây chuyền)."""
+    DataManager.configure("sqlite")
+    m = make_member()
+    DataManager.save_data([], [m], [], 102)
+    m.edit_contact_details(1, name="Ba")
+    m.delete_contact(2)
+    m.add_contact("Em", "090333")
+    m.remove_group(1)
+    m2 = Member(102, "sv2", "1", "e")
+    DataManager.record("member", member=DataManager.member_to_dict(m2))
+    assert len(DataManager.backend.pending) == 5
+    DataManager.save_data([], [m, m2], [], 103)
+    assert DataManager.backend.pending == []
+    _, members, _, _ = DataManager.load_data()
+    assert state(members) == state([m, m2])
+    rows = DataManager.backend.connect().execute(
+        "SELECT contact_id FROM contacts WHERE member_id = 101 AND phone = '090333'").fetchall()
+    assert rows == [(3,)]
+
+def test_14_migrate_json_sqlite_json():
+    """[STORE_TC14] Công cụ chuyển đổi JSON -> SQLite -> JSON giữ nguyên dữ liệu; log cũ chuyển sang file log."""
+    from migrate import migrate
+    from system_log import SystemLog
+    m = make_member()
+    DataManager.save_data([Admin(1, "admin", "1")], [m], ["log"], 102)
+    assert migrate("json", "sqlite") == (1, 1, 2)
+    os.remove(data.DATA_FILE)
+    assert migrate("sqlite", "json") == (1, 1, 2)
+    admins, members, logs, meta = DataManager.load_data()
+    assert state(members) == state([m]) and logs == [] and meta["next_member_id"] == 102
+    system_log = SystemLog()
+    try: assert list(system_log.recent) == ["log"]
+    finally: system_log.close()
+
+# --- GROUP 6: LAZY LOADING (2 Cases) ---
+@pytest.mark.parametrize("mode", ["sharded", "sqlite"])
+def test_15_lazy_load_accounts_only(mode):
+    """[STORE_TC15] Chế độ lazy chỉ nạp tài khoản; danh bạ được nạp khi dùng lần đầu."""
+    DataManager.configure(mode)
+    m1, m2 = make_member(), Member(102, "sv2", "1", "e")
+    DataManager.save_data([], [m1, m2], [], 103)
+    _, members, _, _ = DataManager.load_data(lazy=True)
+    lazy1, lazy2 = members
+    assert not lazy1.is_loaded and lazy1.contacts == [] and lazy1.contact_count == 2
+    assert lazy1.login("123")
+    lazy1.ensure_loaded()
+    assert lazy1.is_loaded and state([lazy1]) == state([m1])
+    assert not lazy2.is_loaded
+
+def test_16_lazy_unloaded_members_survive_save():
+    """[STORE_TC16] Lưu khi còn member chưa nạp không làm mất dữ liệu; sửa thì tự nạp trước."""
+    DataManager.configure("sharded")
+    m1, m2 = make_member(), Member(102, "sv2", "1", "e")
+    m2.add_contact("A", "0901"); m2.add_contact("B", "0902")
+    DataManager.save_data([], [m1, m2], [], 103)
+    DataManager.configure("sharded")
+    _, members, _, _ = DataManager.load_data(lazy=True)
+    members[0].add_contact("Em", "090333")          # Tự nạp rồi mới thêm
+    assert [c.contact_id for c in members[0].contacts] == [1, 2, 3]
+    DataManager.save_data([], members, [], 103)
+    DataManager.configure("sharded")
+    _, reloaded, _, _ = DataManager.load_data()
+    assert [len(m.contacts) for m in reloaded] == [3, 2]
+
+# --- GROUP 7: STREAMING LOADER (4 Cases) ---
+def test_17_stream_small_chunks(monkeypatch):
+    """[STORE_TC17] Đọc theo khối rất nhỏ (cắt giữa ký tự UTF-8 và giữa số) vẫn cho kết quả đúng."""
+    m1, m2 = make_member(), Member(102, "sv2", "1", "e")
+    m1.view_contact_detail(1)
+    DataManager.save_data([Admin(1, "admin", "1")], [m1, m2], ["nhật ký"], 12345)
+    monkeypatch.setattr(data, "STREAM_CHUNK_SIZE", 3)
+    admins, members, logs, meta = DataManager.load_data()
+    assert state(members) == state([m1, m2])
+    assert members[0].get_recent_contacts()[0].name == "Bố"
+    assert admins[0].username == "admin" and logs == ["nhật ký"] and meta["next_member_id"] == 12345
+
+def test_18_corrupt_file_fails_loudly():
+    """[STORE_TC18] File hỏng gây DataLoadError; hệ thống không tạo dữ liệu mẫu đè lên."""
+    from main import PhoneBookSystem
+    DataManager.save_data([], [make_member()], [], 102)
+    with open(data.DATA_FILE, "r+", encoding="utf-8") as f:
+        content = f.read()
+        f.seek(0); f.write(content[:len(content) // 2]); f.truncate()
+    with pytest.raises(DataLoadError):
+        DataManager.load_data()
+    with pytest.raises(DataLoadError):
+        PhoneBookSystem(storage="json")
+    assert os.path.getsize(data.DATA_FILE) == len(content[:len(content) // 2].encode("utf-8"))
+
+def test_19_stream_progress(monkeypatch):
+    """[STORE_TC19] Tiến độ được báo tăng dần và kết thúc ở 100%."""
+    DataManager.save_data([], [make_member()], [], 102)
+    monkeypatch.setattr(data, "STREAM_CHUNK_SIZE", 64)
+    calls = []
+    DataManager.load_data(progress=lambda done, total: calls.append((done, total)))
+    assert len(calls) > 2 and calls[-1][0] == calls[-1][1] == os.path.getsize(data.DATA_FILE)
+    assert [d for d, _ in calls] == sorted(d for d, _ in calls)
+
+def test_20_journal_replay_member_create_delete():
+    """[STORE_TC20] Phát lại journal trên snapshot đọc theo luồng: tạo/xóa member, giữ member khác."""
+    DataManager.configure("journal")
+    m1, m2 = make_member(), Member(102, "sv2", "1", "e")
+    DataManager.save_data([], [m1, m2], [], 103)
+    DataManager.backend.wait()
+    m3 = Member(103, "sv3", "1", "e")
+    DataManager.record("member", member=DataManager.member_to_dict(m3))
+    m3.add_contact("Em", "090333")
+    DataManager.record("member_del", member_id=102)
+    DataManager.save_data([], [m1, m3], [], 104)
+    _, members, _, meta = DataManager.load_data()
+    assert state(members) == state([m1, m3]) and meta["next_member_id"] == 104
+
+# --- GROUP 8: BINARY SNAPSHOT (3 Cases) ---
+def test_21_binary_roundtrip():
+    """[STORE_TC21] Snapshot nhị phân giữ nguyên dữ liệu, email, thời gian xem và khóa tìm kiếm."""
+    DataManager.configure("binary")
+    m1, m2 = make_member(), Member(102, "sv2", "1", "e")
+    m1.edit_contact_details(1, email="bo@gmail.com")
+    m1.add_contact("Đức", "0903", "duc@gmail.com", "Hà Nội", "Bạn")
+    m1.view_contact_detail(3)
+    m2.is_active = False
+    DataManager.save_data([Admin(1, "admin", "1")], [m1, m2], ["log"], 103)
+    admins, members, logs, meta = DataManager.load_data()
+    assert state(members) == state([m1, m2])
+    duc = members[0].get_contact(3)
+    assert (duc.email, duc.address, duc.notes) == ("duc@gmail.com", "Hà Nội", "Bạn")
+    assert int(duc.viewed_ts) == int(m1.get_contact(3).viewed_ts)
+    assert [c.contact_id for c in members[0].search_contact_by_name("duc")] == [3]
+    assert not members[1].is_active and members[1].login("1") is False
+    assert admins[0].login("1") and logs == ["log"] and meta["next_member_id"] == 103
+
+def test_22_binary_checksum_and_version():
+    """[STORE_TC22] File nhị phân hỏng (sai checksum) hoặc sai phiên bản bị từ chối."""
+    DataManager.configure("binary")
+    DataManager.save_data([], [make_member()], [], 102)
+    with open(data.BINARY_FILE, "r+b") as f:
+        f.seek(-1, os.SEEK_END); last = f.read(1)
+        f.seek(-1, os.SEEK_END); f.write(bytes([last[0] ^ 0xFF]))
+    with pytest.raises(DataLoadError, match="checksum"):
+        DataManager.load_data()
+    with open(data.BINARY_FILE, "r+b") as f:
+        f.seek(4); f.write(b"\x63\x00")
+    with pytest.raises(DataLoadError, match="Phiên bản"):
+        DataManager.load_data()
+
+def test_23_binary_reads_json_then_migrates():
+    """[STORE_TC23] Chưa có file nhị phân thì đọc JSON cũ; công cụ chuyển đổi JSON -> binary."""
+    from migrate import migrate
+    m = make_member()
+    DataManager.save_data([], [m], [], 102)
+    DataManager.configure("binary")
+    _, members, _, _ = DataManager.load_data()
+    assert state(members) == state([m])
+    assert migrate("json", "binary") == (0, 1, 2)
+    os.remove(data.DATA_FILE)
+    _, members, _, _ = DataManager.load_data()
+    assert state(members) == state([m])
+
+# --- GROUP 9: PASSWORD UPGRADE (1 Case) ---
+@pytest.mark.parametrize("mode", ["journal", "sharded", "sqlite"])
+def test_24_password_upgrade_persisted(mode):
+    """[STORE_TC24] Hash mật khẩu được băm lại khi đăng nhập được lưu ở các backend ghi theo thay đổi."""
+    DataManager.configure(mode)
+    legacy = hashlib.sha256(b"1").hexdigest()
+    m, ad = Member(101, "sv", legacy, "e"), Admin(1, "admin", legacy)
+    DataManager.save_data([ad], [m], [], 102)
+    if mode == "journal": DataManager.backend.wait()
+    assert m.login("1") and ad.login("1")
+    DataManager.record("admin", admin={"admin_id": 1, "username": "admin", "password": ad.password})
+    DataManager.save_data([ad], [m], [], 102)
+    DataManager.close()
+    DataManager.configure(mode)
+    admins, members, _, _ = DataManager.load_data()
+    assert members[0].password == m.password and admins[0].password == ad.password
+
+# --- GROUP 10: JOURNAL RECOVERY (1 Case) ---
+def test_25_journal_corrupt_middle_line_fails_loudly():
+    """[STORE_TC25] Dòng hỏng giữa journal báo DataLoadError (không âm thầm bỏ các thay đổi sau nó)."""
+    DataManager.configure("journal")
+    m = make_member()
+    DataManager.save_data([], [m], [], 102)
+    DataManager.backend.wait()
+    m.add_contact("Em", "090333")
+    m.add_contact("Út", "090444")
+    DataManager.save_data([], [m], [], 102)
+    with open(data.JOURNAL_FILE, "rb") as f: lines = f.readlines()
+    lines[0] = lines[0][:10] + b"\n"
+    with open(data.JOURNAL_FILE, "wb") as f: f.writelines(lines)
+    with pytest.raises(DataLoadError, match="dòng 1"):
+        DataManager.load_data()
+
+# --- GROUP 11: WRITE-BEHIND RETRY (1 Case) ---
+def test_26_write_behind_retries_failed_flush(capsys):
+    """[STORE_TC26] Lần ghi nền lỗi được thử lại sau interval dù không có thay đổi mới."""
+    import threading
+    done = threading.Event()
+    calls = []
+    def flush():
+        calls.append(1)
+        if len(calls) == 1: raise OSError("đĩa đầy")
+        done.set()
+    f = WriteBehindFlusher(flush, interval=0.05, batch_size=1)
+    f.mark_dirty()
+    assert done.wait(5)                          # Thử lại mà không cần mark_dirty lần nữa
+    assert f.dirty == 0
+    f.close()
+    assert len(calls) == 2 and "đĩa đầy" in capsys.readouterr().out
+
+# --- GROUP 12: BACKGROUND COMPACTION (1 Case) ---
+def test_27_journal_compaction_builds_off_caller(monkeypatch):
+    """[STORE_TC27] Nén journal: luồng lưu chỉ chụp nhanh member, dict snapshot được dựng ở luồng nén và ghi vào file của backend."""
+    import threading
+    journal = data.Journal("khac.journal", "khac.json", compact_bytes=1)
+    m = make_member()
+    threads = []
+    real = DataManager.contact_to_dict
+    def contact_to_dict(c):
+        threads.append(threading.current_thread().name)
+        return real(c)
+    monkeypatch.setattr(DataManager, "contact_to_dict", staticmethod(contact_to_dict))
+    journal.save([], [m], [], 102)              # Chưa có snapshot -> nén
+    journal.wait()
+    assert threads and set(threads) == {"journal-compactor"}
+    assert os.path.exists("khac.json") and not os.path.exists(data.DATA_FILE)
+    m.add_contact("Em", "090333")
+    journal.on_member_change(m, "contact", {"contact": m.get_contact(3)})
+    journal.save([], [m], [], 102)              # Ghi nối vào journal của backend
+    assert journal.segments() == ["khac.journal"]
+    _, members, _, _ = journal.load()
+    assert state(members) == state([m])
+
+# --- GROUP 13: SHARDED CONTACT COUNT (1 Case) ---
+def test_28_sharded_add_contact_writes_only_shard(monkeypatch):
+    """[STORE_TC28] Thêm/xóa liên hệ chỉ ghi shard của member; số liên hệ trong index được ghi khi đóng store."""
+    DataManager.configure("sharded")
+    m1, m2 = make_member(), Member(102, "sv2", "1", "e")
+    DataManager.save_data([], [m1, m2], [], 103)
+    written = []
+    real = DataManager.write_snapshot
+    monkeypatch.setattr(DataManager, "write_snapshot",
+                        staticmethod(lambda d, path=None, indent=4: written.append(path) or real(d, path, indent)))
+    m1.add_contact("Em", "090333")
+    DataManager.save_data([], [m1, m2], [], 103)
+    m1.delete_contact(1); m1.add_contact("Út", "090444")
+    DataManager.save_data([], [m1, m2], [], 103)
+    assert written == [DataManager.backend.shard_path(101)] * 2
+    DataManager.close()
+    assert written[-1] == os.path.join(DataManager.backend.root, "index.json")
+    _, members, _, _ = DataManager.load_data(lazy=True)
+    assert [m.contact_count for m in members] == [3, 0]
\ No newline at end of file